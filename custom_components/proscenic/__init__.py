@@ -1,79 +1,260 @@
 from __future__ import annotations
 
 from datetime import timedelta
+from pathlib import Path
+from typing import Callable
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.typing import ConfigType
 
-from .api import ProscenicApi, ProscenicConfig
-from .coordinator import ProscenicCoordinator
+from .api import ProscenicApi, ProscenicConfig, create_api
+from .coordinator import PollIntervals, ProscenicCoordinator
+from .discovery import async_get_discovery, async_release_discovery
+from .hub import ProscenicHub
+from .recorder import TrafficRecorder
+from .services import async_setup_services
+from .snapshot import ProscenicSnapshot
 from .const import (
     DOMAIN,
+    DATA_HUB,
+    SHARED_DATA_KEYS,
     CONF_DEVICE_ID,
     CONF_LOCAL_KEY,
     CONF_HOST,
+    CONF_PROTOCOL_VERSION,
     CONF_SCAN_INTERVAL,
+    CONF_SCAN_INTERVAL_CHARGING,
+    CONF_SCAN_INTERVAL_STANDBY,
+    CONF_SCAN_INTERVAL_DOCKED_FULL,
     CONF_REMEMBER_FAN_SPEED,
     CONF_SHOW_RAW_DPS,
     CONF_AUTO_DISCOVER_IP,
+    CONF_PERSISTENT_CONNECTION,
+    CONF_PUSH_UPDATES,
+    CONF_BACKEND,
+    CONF_ACK_WRITES,
+    CONF_BUFFER_COMMANDS,
+    CONF_RECORD_TRAFFIC,
+    CONF_REPLAY_SPEED,
+    BACKEND_REPLAY,
     DEFAULT_SCAN_INTERVAL_SECONDS,
+    DEFAULT_SCAN_INTERVAL_CHARGING_SECONDS,
+    DEFAULT_SCAN_INTERVAL_STANDBY_SECONDS,
+    DEFAULT_SCAN_INTERVAL_DOCKED_FULL_SECONDS,
     DEFAULT_REMEMBER_FAN_SPEED,
     DEFAULT_SHOW_RAW_DPS,
     DEFAULT_AUTO_DISCOVER_IP,
+    DEFAULT_PERSISTENT_CONNECTION,
+    DEFAULT_PUSH_UPDATES,
+    DEFAULT_BACKEND,
+    DEFAULT_ACK_WRITES,
+    DEFAULT_BUFFER_COMMANDS,
+    DEFAULT_RECORD_TRAFFIC,
+    DEFAULT_REPLAY_SPEED,
+    TUYA_PROTOCOL_VERSION,
 )
 
 PLATFORMS: list[str] = ["vacuum", "sensor", "select"]
 
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    async_setup_services(hass)
+    return True
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    device_id = entry.data[CONF_DEVICE_ID]
+    backend = entry.options.get(CONF_BACKEND, DEFAULT_BACKEND)
+    # the replay backend plays a recording: nothing worth restoring
+    snapshot = ProscenicSnapshot(hass, entry.entry_id) if backend != BACKEND_REPLAY else None
+    saved = await snapshot.async_load() if snapshot is not None else None
     cfg = ProscenicConfig(
-        device_id=entry.data[CONF_DEVICE_ID],
+        device_id=device_id,
         local_key=entry.data[CONF_LOCAL_KEY],
         host=entry.data[CONF_HOST],
+        protocol_version=float(entry.data.get(CONF_PROTOCOL_VERSION, TUYA_PROTOCOL_VERSION)),
+        persistent=bool(entry.options.get(CONF_PERSISTENT_CONNECTION, DEFAULT_PERSISTENT_CONNECTION)),
+        backend=backend,
+        recording=hass.config.path(DOMAIN, f"{device_id}.replay.jsonl"),
+        replay_speed=float(entry.options.get(CONF_REPLAY_SPEED, DEFAULT_REPLAY_SPEED)),
     )
-    api = ProscenicApi(cfg)
+    hub = _get_hub(hass)
+    api = create_api(cfg, hub.lane(cfg.device_id))
+    if entry.options.get(CONF_RECORD_TRAFFIC, DEFAULT_RECORD_TRAFFIC):
+        api.recorder = _recorder(hass, device_id)
     coordinator = ProscenicCoordinator(hass, api)
+    coordinator.discovery = await async_get_discovery(hass)
 
     opts = entry.options
-    scan_s = int(opts.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL_SECONDS))
-    coordinator.update_interval = timedelta(seconds=scan_s)
+    coordinator.intervals = _poll_intervals(opts)
     coordinator.auto_discover_ip = bool(opts.get(CONF_AUTO_DISCOVER_IP, DEFAULT_AUTO_DISCOVER_IP))
+    coordinator.ack_writes = bool(opts.get(CONF_ACK_WRITES, DEFAULT_ACK_WRITES))
+    coordinator.buffer_commands = bool(opts.get(CONF_BUFFER_COMMANDS, DEFAULT_BUFFER_COMMANDS))
+    coordinator.set_dp_capture(bool(opts.get(CONF_SHOW_RAW_DPS, DEFAULT_SHOW_RAW_DPS)))
+    if backend != BACKEND_REPLAY:
+        coordinator.endpoint_listener = _endpoint_listener(hass, entry, coordinator)
+    api.push_enabled = bool(opts.get(CONF_PUSH_UPDATES, DEFAULT_PUSH_UPDATES))
 
-    await coordinator.async_config_entry_first_refresh()
+    if saved is not None:
+        # come up from the last known state, the robot may well be offline
+        coordinator.async_restore(saved["raw_dps"])
+        entry.async_create_background_task(
+            hass, coordinator.async_refresh(), f"{DOMAIN} first refresh {device_id}"
+        )
+    else:
+        try:
+            await coordinator.async_config_entry_first_refresh()
+        except Exception:
+            await _close_api(api)
+            _release_shared(hass, cfg.device_id)
+            raise
+    if snapshot is not None:
+        entry.async_on_unload(snapshot.async_attach(coordinator))
 
     hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN][entry.entry_id] = {
         "coordinator": coordinator,
+        # what the update listener last applied: entry.data updates fire it too
+        "options": dict(opts),
+        "backend": cfg.backend,
+        "replay_speed": cfg.replay_speed,
         "remember_fan_speed": bool(opts.get(CONF_REMEMBER_FAN_SPEED, DEFAULT_REMEMBER_FAN_SPEED)),
         "show_raw_dps": bool(opts.get(CONF_SHOW_RAW_DPS, DEFAULT_SHOW_RAW_DPS)),
         "auto_discover_ip": bool(opts.get(CONF_AUTO_DISCOVER_IP, DEFAULT_AUTO_DISCOVER_IP)),
     }
 
     entry.async_on_unload(entry.add_update_listener(_update_listener))
+    entry.async_on_unload(
+        coordinator.discovery.async_subscribe(cfg.device_id, coordinator.async_handle_announce)
+    )
+    entry.async_create_background_task(
+        hass,
+        api.async_listen(coordinator.async_handle_push, coordinator.async_handle_push_health),
+        f"proscenic push {cfg.device_id}",
+    )
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     return True
 
 
+def _recorder(hass: HomeAssistant, device_id: str) -> TrafficRecorder:
+    return TrafficRecorder(Path(hass.config.path(DOMAIN, f"{device_id}.jsonl")), device_id)
+
+
+async def _close_api(api: ProscenicApi) -> None:
+    await api.async_close()
+    if api.recorder is not None:
+        await api.recorder.async_close()
+
+
+@callback
+def _get_hub(hass: HomeAssistant) -> ProscenicHub:
+    """The I/O pool shared by all entries, created with the first one."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    hub = domain_data.get(DATA_HUB)
+    if hub is None:
+        hub = domain_data[DATA_HUB] = ProscenicHub()
+    return hub
+
+
+@callback
+def _release_shared(hass: HomeAssistant, device_id: str) -> None:
+    """Drop the device's lane; stop the shared services after the last entry."""
+    domain_data = hass.data.get(DOMAIN, {})
+    hub: ProscenicHub | None = domain_data.get(DATA_HUB)
+    if hub is not None:
+        hub.release_lane(device_id)
+        if not any(key not in SHARED_DATA_KEYS for key in domain_data):
+            domain_data.pop(DATA_HUB)
+            hub.shutdown()
+    async_release_discovery(hass)
+
+
+def _endpoint_listener(
+    hass: HomeAssistant, entry: ConfigEntry, coordinator: ProscenicCoordinator
+) -> Callable[[str, float], None]:
+    @callback
+    def _changed(host: str, version: float) -> None:
+        """Keep where the robot is and the protocol it speaks across restarts."""
+        data = {**entry.data, CONF_HOST: host, CONF_PROTOCOL_VERSION: version}
+        if data != entry.data:
+            hass.config_entries.async_update_entry(entry, data=data)
+        if version != coordinator.api.protocol_version:
+            # this backend cannot switch: setup picks one that can
+            hass.config_entries.async_schedule_reload(entry.entry_id)
+
+    return _changed
+
+
+def _poll_intervals(opts) -> PollIntervals:
+    def seconds(key: str, default: int) -> timedelta:
+        return timedelta(seconds=int(opts.get(key, default)))
+
+    return PollIntervals(
+        active=seconds(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL_SECONDS),
+        charging=seconds(CONF_SCAN_INTERVAL_CHARGING, DEFAULT_SCAN_INTERVAL_CHARGING_SECONDS),
+        standby=seconds(CONF_SCAN_INTERVAL_STANDBY, DEFAULT_SCAN_INTERVAL_STANDBY_SECONDS),
+        docked_full=seconds(CONF_SCAN_INTERVAL_DOCKED_FULL, DEFAULT_SCAN_INTERVAL_DOCKED_FULL_SECONDS),
+    )
+
+
 async def _update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
     data = hass.data[DOMAIN][entry.entry_id]
     coordinator: ProscenicCoordinator = data["coordinator"]
 
     opts = entry.options
-    scan_s = int(opts.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL_SECONDS))
-    coordinator.update_interval = timedelta(seconds=scan_s)
+    if opts == data["options"]:
+        # entry.data written back (host, protocol version): nothing to apply
+        return
+    data["options"] = dict(opts)
+    backend = opts.get(CONF_BACKEND, DEFAULT_BACKEND)
+    if backend != data["backend"] or (
+        backend == BACKEND_REPLAY
+        and float(opts.get(CONF_REPLAY_SPEED, DEFAULT_REPLAY_SPEED)) != data["replay_speed"]
+    ):
+        # the transport cannot be swapped in place
+        hass.config_entries.async_schedule_reload(entry.entry_id)
+        return
+
+    coordinator.intervals = _poll_intervals(opts)
 
     coordinator.auto_discover_ip = bool(opts.get(CONF_AUTO_DISCOVER_IP, DEFAULT_AUTO_DISCOVER_IP))
+    coordinator.ack_writes = bool(opts.get(CONF_ACK_WRITES, DEFAULT_ACK_WRITES))
+    coordinator.buffer_commands = bool(opts.get(CONF_BUFFER_COMMANDS, DEFAULT_BUFFER_COMMANDS))
+    coordinator.api.set_persistent(bool(opts.get(CONF_PERSISTENT_CONNECTION, DEFAULT_PERSISTENT_CONNECTION)))
+    coordinator.api.push_enabled = bool(opts.get(CONF_PUSH_UPDATES, DEFAULT_PUSH_UPDATES))
+
+    api = coordinator.api
+    if opts.get(CONF_RECORD_TRAFFIC, DEFAULT_RECORD_TRAFFIC):
+        if api.recorder is None:
+            api.recorder = _recorder(hass, api.device_id)
+    elif api.recorder is not None:
+        recorder, api.recorder = api.recorder, None
+        await recorder.async_close()
 
     data["remember_fan_speed"] = bool(opts.get(CONF_REMEMBER_FAN_SPEED, DEFAULT_REMEMBER_FAN_SPEED))
     data["show_raw_dps"] = bool(opts.get(CONF_SHOW_RAW_DPS, DEFAULT_SHOW_RAW_DPS))
+    coordinator.set_dp_capture(data["show_raw_dps"])
     data["auto_discover_ip"] = bool(opts.get(CONF_AUTO_DISCOVER_IP, DEFAULT_AUTO_DISCOVER_IP))
 
+    # entities only write state for fields they depend on: options are not one
+    coordinator.async_update_all_listeners()
     await coordinator.async_request_refresh()
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    await ProscenicSnapshot(hass, entry.entry_id).async_remove()
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id, None)
+        data = hass.data[DOMAIN].pop(entry.entry_id, None)
+        if data:
+            await _close_api(data["coordinator"].api)
+        _release_shared(hass, entry.data[CONF_DEVICE_ID])
     return unload_ok
\ No newline at end of file
@@ -1,12 +1,144 @@
 from __future__ import annotations
 
 import asyncio
+import functools
+import logging
+import select
+import socket
+import time
+from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Any, Optional
+from typing import Any, Awaitable, Callable, Iterable, Optional
 
 import tinytuya
 
-from .const import TUYA_PROTOCOL_VERSION
+from .hub import DeviceLane, ProscenicHub
+from .metrics import (
+    COUNT_ABANDONED,
+    COUNT_ERROR,
+    COUNT_RETRY,
+    COUNT_TIMEOUT,
+    OP_ACK,
+    OP_CLOSE,
+    OP_CONNECT,
+    OP_HEARTBEAT,
+    OP_QUERY,
+    OP_RECEIVE,
+    OP_SET_DPS,
+    OP_STATUS,
+    ProscenicMetrics,
+)
+from .recorder import KIND_PUSH, KIND_QUERY, KIND_SET, KIND_STATUS, RX, TX, TrafficRecorder
+from .tuya import TUYA_PORT, TuyaClient, TuyaDecodeError, TuyaProtocolError, TuyaTimeoutError
+
+from .const import (
+    ACK_ATTEMPTS,
+    ACK_TIMEOUT,
+    BACKEND_NATIVE,
+    BACKEND_REPLAY,
+    BACKEND_TINYTUYA,
+    DEFAULT_BACKEND,
+    DEFAULT_PERSISTENT_CONNECTION,
+    DEFAULT_REPLAY_SPEED,
+    IO_ATTEMPTS,
+    IO_DEADLINE,
+    IO_RETRY_DELAY,
+    IO_SOCKET_TIMEOUT,
+    PUSH_HEARTBEAT_INTERVAL,
+    PUSH_RECEIVE_TIMEOUT,
+    PROTOCOL_VERSIONS,
+    PUSH_RETRY_DELAY,
+    SESSION_KEY_MIN_VERSION,
+    TRIGGER_DPS,
+    TUYA_PROTOCOL_VERSION,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# returned by _receive_push when there is no open socket to listen on
+_NOT_CONNECTED = object()
+# ... when nothing arrived (the heartbeat was only sent, or a command read the
+# frame first): says nothing about the channel either way
+_NOTHING = object()
+# ... for the device's empty reply to a heartbeat
+_HEARTBEAT_REPLY = object()
+
+# the push channel counts as healthy this long after the last frame or heartbeat reply
+PUSH_HEALTH_WINDOW = 2 * PUSH_HEARTBEAT_INTERVAL
+
+# tinytuya error codes meaning the device did not answer (timeout, unreachable)
+_TINYTUYA_TIMEOUT_ERRORS = frozenset({"902", "905"})
+# ... answered with something that does not decode (key or protocol version)
+_TINYTUYA_DECODE_ERRORS = frozenset({"904", "914"})
+# ... refused the connection
+_TINYTUYA_CONNECT_ERROR = "901"
+
+
+class ProscenicApiError(Exception):
+    """Raised when the device cannot be reached or answers with an error."""
+
+    timeout = False
+
+
+class ProscenicTimeoutError(ProscenicApiError):
+    """The device did not answer in time (as opposed to answering with an error)."""
+
+    timeout = True
+
+
+class ProscenicDecodeError(ProscenicApiError):
+    """The device answered, but not in a way we can decode: wrong local key or protocol version."""
+
+
+class ProscenicAckError(ProscenicTimeoutError):
+    """The device did not echo some DPs of an acknowledged write."""
+
+    def __init__(self, message: str, missing: dict[int, Any], echoed: dict[str, Any]) -> None:
+        super().__init__(message)
+        self.missing = missing
+        self.echoed = echoed
+
+
+@dataclass(frozen=True, slots=True)
+class IoBudget:
+    """Time limits of one device operation (seconds)."""
+
+    socket_timeout: float  # connect, and each reply
+    attempts: int  # tinytuya connect / send attempts; the native client does not retry
+    deadline: float  # the whole call, waiting for the device's lane included
+
+
+IO_BUDGETS: dict[str, IoBudget] = {
+    OP_STATUS: IoBudget(IO_SOCKET_TIMEOUT, IO_ATTEMPTS, IO_DEADLINE),
+    OP_QUERY: IoBudget(IO_SOCKET_TIMEOUT, IO_ATTEMPTS, IO_DEADLINE),
+    OP_SET_DPS: IoBudget(IO_SOCKET_TIMEOUT, IO_ATTEMPTS, IO_DEADLINE),
+    # only reads a frame that already arrived
+    OP_RECEIVE: IoBudget(PUSH_RECEIVE_TIMEOUT, 1, PUSH_RECEIVE_TIMEOUT + IO_SOCKET_TIMEOUT),
+    OP_HEARTBEAT: IoBudget(IO_SOCKET_TIMEOUT, 1, 2 * IO_SOCKET_TIMEOUT),
+    OP_CLOSE: IoBudget(IO_SOCKET_TIMEOUT, 1, IO_SOCKET_TIMEOUT),
+}
+
+
+class _PendingAck:
+    """DPs of an acknowledged write still waiting for the device's echo."""
+
+    __slots__ = ("pending", "echoed", "done")
+
+    def __init__(self, dps: dict[int, Any]) -> None:
+        self.pending = {str(dp): value for dp, value in dps.items()}
+        self.echoed: dict[str, Any] = {}
+        self.done: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+
+    def feed(self, dps: dict[str, Any]) -> None:
+        for key, value in dps.items():
+            if key not in self.pending:
+                continue
+            # an action DP may be reported with the robot's resulting value
+            if value == self.pending[key] or int(key) in TRIGGER_DPS:
+                del self.pending[key]
+                self.echoed[key] = value
+        if not self.pending and not self.done.done():
+            self.done.set_result(None)
 
 
 @dataclass
@@ -15,64 +147,693 @@ class ProscenicConfig:
     local_key: str
     host: str
     protocol_version: float = TUYA_PROTOCOL_VERSION
+    persistent: bool = DEFAULT_PERSISTENT_CONNECTION
+    backend: str = DEFAULT_BACKEND
+    port: int = TUYA_PORT
+    # replay backend: the recording to play and how much faster than recorded
+    recording: Optional[str] = None
+    replay_speed: float = DEFAULT_REPLAY_SPEED
 
 
-class ProscenicApi:
-    """Async wrapper over tinytuya."""
+class ProscenicApi(ABC):
+    """
+    Async device API shared by the backends.
+
+    Subclasses implement the transport; the push-channel bookkeeping used by
+    the coordinator lives here.
+    """
 
     def __init__(self, cfg: ProscenicConfig) -> None:
         self._cfg = cfg
+        self.push_enabled: bool = True
+        self._push_ok_at: Optional[float] = None
+        self._on_dps: Optional[Callable[[dict[str, Any]], None]] = None
+        self._acks: list[_PendingAck] = []
+        self.metrics = ProscenicMetrics()
+        # logs every DP frame in and out when set
+        self.recorder: Optional[TrafficRecorder] = None
+
+    @property
+    def device_id(self) -> str:
+        return self._cfg.device_id
+
+    @property
+    def host(self) -> str:
+        return self._cfg.host
+
+    @property
+    def persistent(self) -> bool:
+        return self._cfg.persistent
+
+    @property
+    def protocol_version(self) -> float:
+        return self._cfg.protocol_version
+
+    def set_protocol_version(self, version: float) -> bool:
+        """Speak version from now on; False if this backend cannot (the entry must be rebuilt)."""
+        return version == self._cfg.protocol_version
+
+    @abstractmethod
+    async def detect_protocol_version(self) -> Optional[float]:
+        """
+        Find the protocol version the device answers in (PROTOCOL_VERSIONS, in
+        order); None if it answers in none (wrong local key), ProscenicApiError
+        if it cannot be reached, TimeoutError past PROBE_DEADLINE.
+        """
+        raise NotImplementedError
+
+    @property
+    def push_healthy(self) -> bool:
+        """True while the push channel has recently proven the socket alive."""
+        if self._push_ok_at is None:
+            return False
+        return time.monotonic() - self._push_ok_at < PUSH_HEALTH_WINDOW
+
+    @abstractmethod
+    def update_host(self, host: str) -> None:
+        raise NotImplementedError
+
+    def set_persistent(self, persistent: bool) -> None:
+        self._cfg.persistent = persistent
+
+    @abstractmethod
+    async def status(self) -> dict[str, Any]:
+        raise NotImplementedError
+
+    async def query_dps(self, dps: Iterable[int]) -> dict[str, Any]:
+        """
+        Read a subset of DPs (keys as strings, like status()["dps"]).
+
+        Backends that can ask the device for just those DPs override this;
+        the fallback reads everything and filters.
+        """
+        wanted = {str(dp) for dp in dps}
+        reported = (await self.status() or {}).get("dps") or {}
+        return {k: v for k, v in reported.items() if k in wanted}
+
+    async def set_dp(self, dp: int, value: Any) -> None:
+        await self.set_dps({dp: value})
+
+    @abstractmethod
+    async def set_dps(self, dps: dict[int, Any]) -> None:
+        """Write several DPs in one CONTROL frame."""
+        raise NotImplementedError
+
+    async def set_dps_acked(
+        self, dps: dict[int, Any], timeout: float = ACK_TIMEOUT, attempts: int = ACK_ATTEMPTS
+    ) -> dict[str, Any]:
+        """
+        Write DPs and wait until the device reports them back; returns the echo.
+
+        The echo is the status frame a Tuya device sends after applying a
+        CONTROL (the reply itself with tinytuya, a push with the native
+        client), so no status query is needed. Settings still unconfirmed
+        after timeout are sent again, up to attempts sends in all. Action DPs
+        (TRIGGER_DPS) are only sent again when the send itself failed:
+        repeating a delivered action would toggle it back. Raises
+        ProscenicAckError with whatever is still unconfirmed, or the send
+        error if no attempt reached the device at all.
+        """
+        missing = dict(dps)
+        echoed: dict[str, Any] = {}
+        last_error = "no echo"
+        delivered = False
+        with self.metrics.timed(OP_ACK):
+            for attempt in range(1, attempts + 1):
+                if attempt > 1:
+                    self.metrics.count(COUNT_RETRY, OP_ACK)
+                ack = _PendingAck(missing)
+                self._acks.append(ack)
+                sent = False
+                try:
+                    # the send counts against the timeout too: a blocking
+                    # backend may hold it for a whole socket timeout
+                    async with asyncio.timeout(timeout):
+                        await self.set_dps(missing)
+                        sent = delivered = True
+                        await ack.done
+                    echoed.update(ack.echoed)
+                    return echoed
+                except ProscenicApiError as exc:
+                    _LOGGER.debug("Proscenic %s: write %s failed: %s", self.device_id, missing, exc)
+                    last_error = str(exc)
+                    send_error = exc
+                except TimeoutError:
+                    if not sent:
+                        # the send itself timed out: it may well have arrived,
+                        # so it counts as delivered (and actions are not repeated)
+                        sent = delivered = True
+                        last_error = "no reply"
+                    else:
+                        last_error = "no echo"
+                finally:
+                    self._acks.remove(ack)
+                echoed.update(ack.echoed)
+                missing = {
+                    dp: value
+                    for dp, value in missing.items()
+                    if str(dp) in ack.pending and not (sent and dp in TRIGGER_DPS)
+                }
+                if not missing:
+                    break
+            if not delivered:
+                # never got through: the robot is unreachable, not ignoring us
+                raise send_error
+            unconfirmed = {dp: value for dp, value in dps.items() if str(dp) not in echoed}
+            raise ProscenicAckError(
+                f"{self.host} did not confirm {unconfirmed} after {attempt} attempt(s): {last_error}",
+                unconfirmed,
+                echoed,
+            )
+
+    def _record(self, direction: str, kind: str, dps: Optional[dict[Any, Any]]) -> None:
+        if self.recorder is not None and dps:
+            self.recorder.record(direction, kind, dps)
+
+    def _emit(self, dps: dict[str, Any]) -> None:
+        """Hand DPs reported by the device to pending acks and the push listener."""
+        self._record(RX, KIND_PUSH, dps)
+        for ack in self._acks:
+            ack.feed(dps)
+        if self.push_enabled and self._on_dps is not None:
+            self._on_dps(dps)
+
+    @abstractmethod
+    async def async_listen(
+        self,
+        on_dps: Callable[[dict[str, Any]], None],
+        on_health: Optional[Callable[[bool], None]] = None,
+    ) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def async_close(self) -> None:
+        raise NotImplementedError
+
+
+class TinyTuyaApi(ProscenicApi):
+    """
+    Async wrapper over tinytuya.
+
+    Device I/O runs on the device's lane of the shared hub pool, so calls are
+    serialized per device and never compete for HA's default executor. Every
+    call runs with its operation's IoBudget; one still blocked at the deadline
+    is abandoned and its socket shut down, so the worker comes back quickly.
+    In persistent mode one TCP socket is kept open across calls and
+    reconnected when it goes stale.
+    """
+
+    def __init__(self, cfg: ProscenicConfig, lane: Optional[DeviceLane] = None) -> None:
+        super().__init__(cfg)
+        # standalone use (scripts): a private one-worker hub
+        self._own_hub = ProscenicHub(max_workers=1) if lane is None else None
+        self._lane = lane if lane is not None else self._own_hub.lane(cfg.device_id)
         self._dev = self._build_device(cfg.host)
+        self._heartbeat_at: float = 0.0
 
     def _build_device(self, host: str):
-        dev = tinytuya.OutletDevice(self._cfg.device_id, host, self._cfg.local_key)
+        dev = tinytuya.OutletDevice(self._cfg.device_id, host, self._cfg.local_key, port=self._cfg.port)
         try:
             dev.set_version(self._cfg.protocol_version)
         except Exception:
             dev.version = self._cfg.protocol_version  # type: ignore[attr-defined]
+        dev.set_socketPersistent(self._keeps_socket)
+        self._time_connects(dev)
         return dev
 
     @property
-    def device_id(self) -> str:
-        return self._cfg.device_id
+    def _keeps_socket(self) -> bool:
+        # 3.4+: a new socket means a new session key negotiation, so keep it
+        return self._cfg.persistent or self._cfg.protocol_version >= SESSION_KEY_MIN_VERSION
 
-    @property
-    def host(self) -> str:
-        return self._cfg.host
+    def _time_connects(self, dev) -> None:
+        """Record how long tinytuya takes to open a socket (3.4+: with the key negotiation)."""
+        get_socket = getattr(dev, "_get_socket", None)
+        if get_socket is None:
+            return
+
+        def timed_get_socket(renew):
+            if dev.socket is not None and not renew:
+                return get_socket(renew)
+            start = time.monotonic()
+            try:
+                return get_socket(renew)
+            finally:
+                self.metrics.record(OP_CONNECT, time.monotonic() - start)
+
+        dev._get_socket = timed_get_socket
 
     def update_host(self, host: str) -> None:
         """Rebuild underlying tinytuya device with a new host."""
+        old = self._dev
         self._cfg.host = host
         self._dev = self._build_device(host)
+        # the old socket may be in use by a pool worker: close it in the lane
+        self._lane.run_soon(old.close)
+
+    def set_protocol_version(self, version: float) -> bool:
+        if version != self._cfg.protocol_version:
+            self._cfg.protocol_version = version
+            self.update_host(self._cfg.host)
+        return True
+
+    async def detect_protocol_version(self) -> Optional[float]:
+        def probe() -> Optional[float]:
+            # devices take one connection at a time: let go of ours first
+            self._dev.close()
+            return probe_versions(self._cfg)
+
+        # on the lane, so no call of ours reconnects in between
+        return await self._lane.run_sync(probe, deadline=PROBE_DEADLINE)
+
+    def set_persistent(self, persistent: bool) -> None:
+        """Switch between one long-lived socket and a connection per call."""
+        if persistent == self._cfg.persistent:
+            return
+        self._cfg.persistent = persistent
+        self._lane.run_soon(self._dev.set_socketPersistent, self._keeps_socket)
+
+    async def _run(self, op: str, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run a blocking call on the lane within the budget of op."""
+        budget = IO_BUDGETS[op]
+        dev = self._dev
+
+        def call() -> Any:
+            dev.set_socketTimeout(budget.socket_timeout)
+            dev.set_socketRetryLimit(budget.attempts)
+            dev.set_socketRetryDelay(IO_RETRY_DELAY)
+            return fn(*args)
+
+        try:
+            return await self._lane.run_sync(
+                call, deadline=budget.deadline, on_abandon=lambda: self._abort(dev, op)
+            )
+        except TimeoutError:
+            raise ProscenicTimeoutError(
+                f"{op} on {self._cfg.host} exceeded its {budget.deadline:g}s deadline"
+            ) from None
+
+    def _abort(self, dev, op: str) -> None:
+        """On the loop: make the worker still blocked in dev give up now."""
+        self.metrics.count(COUNT_ABANDONED, op)
+        _LOGGER.debug("Proscenic %s: %s abandoned at its deadline", self._cfg.device_id, op)
+        # no further connect / send attempts, and the current recv returns
+        dev.socketRetryLimit = 0
+        sock = dev.socket
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _invoke(self, name: str, *args: Any) -> Any:
+        """Run a tinytuya call on the worker thread, reconnecting once on failure."""
+        dev = self._dev
+        result = getattr(dev, name)(*args)
+        if _is_error(result) and self._keeps_socket and str(result.get("Err")) not in _TINYTUYA_DECODE_ERRORS:
+            # the persistent socket may have been dropped by the device: start over
+            self.metrics.count(COUNT_RETRY, name)
+            dev.close()
+            result = getattr(dev, name)(*args)
+        if _is_error(result):
+            code = str(result.get("Err"))
+            if code in _TINYTUYA_TIMEOUT_ERRORS:
+                err: type[ProscenicApiError] = ProscenicTimeoutError
+            elif code in _TINYTUYA_DECODE_ERRORS:
+                err = ProscenicDecodeError
+            else:
+                err = ProscenicApiError
+            raise err(f"{result.get('Error')} (Err {code})")
+        return result
 
     async def status(self) -> dict[str, Any]:
-        return await asyncio.to_thread(self._dev.status)
+        with self.metrics.timed(OP_STATUS):
+            result = await self._run(OP_STATUS, self._invoke, "status")
+        self._record(RX, KIND_STATUS, result.get("dps") if isinstance(result, dict) else None)
+        return result
 
-    async def set_dp(self, dp: int, value: Any) -> None:
-        await asyncio.to_thread(self._dev.set_value, dp, value)
+    def _query_dps(self, dps: list[int]) -> dict[str, Any]:
+        """UPDATEDPS on the persistent socket, then read the status frames it triggers."""
+        dev = self._dev
+        wanted = {str(dp) for dp in dps}
+        got: dict[str, Any] = {}
+        result = self._invoke("updatedps", dps)
+        deadline = time.monotonic() + dev.connection_timeout
+        while True:
+            if _is_error(result):
+                break
+            if isinstance(result, dict) and result.get("dps"):
+                got.update((k, v) for k, v in result["dps"].items() if k in wanted)
+            if wanted <= got.keys() or time.monotonic() >= deadline:
+                break
+            result = dev.receive()
+            if result is None:
+                # receive timed out: the device has nothing more to say
+                break
+        if not got:
+            raise ProscenicTimeoutError(f"{self._cfg.host} did not report DPs {sorted(wanted)}")
+        return got
 
+    async def query_dps(self, dps: Iterable[int]) -> dict[str, Any]:
+        if not self._keeps_socket:
+            # tinytuya closes a one-shot socket before the values arrive
+            return await super().query_dps(dps)
+        with self.metrics.timed(OP_QUERY):
+            got = await self._run(OP_QUERY, self._query_dps, list(dps))
+        self._record(RX, KIND_QUERY, got)
+        return got
 
-async def discover_ip_by_device_id(device_id: str, timeout_s: int = 8) -> Optional[str]:
+    async def set_dps(self, dps: dict[int, Any]) -> None:
+        self._record(TX, KIND_SET, dps)
+        with self.metrics.timed(OP_SET_DPS):
+            result = await self._run(OP_SET_DPS, self._invoke, "set_multiple_values", dps)
+        # on a persistent socket the reply is the device's echo of the new values
+        if isinstance(result, dict) and result.get("dps"):
+            self._emit(result["dps"])
+
+    def _receive_push(self) -> Any:
+        """Read an unsolicited frame once the loop saw the socket readable."""
+        dev = self._dev
+        sock = dev.socket
+        if sock is None:
+            # let the next status()/set_dp() (re)open the connection
+            return _NOT_CONNECTED
+        if not select.select([sock], [], [], 0)[0]:
+            # a command running in between already read what arrived
+            return _NOTHING
+        result = dev.receive()
+        if result is None:
+            # tinytuya returns None for an empty frame as for no frame at all
+            return _HEARTBEAT_REPLY if dev.raw_recv else _NOTHING
+        return result
+
+    def _heartbeat(self) -> Any:
+        # the device drops idle connections without a heartbeat; the reply is
+        # read by the next _receive_push
+        if self._dev.socket is None:
+            return _NOT_CONNECTED
+        self._heartbeat_at = time.monotonic()
+        self._dev.heartbeat(nowait=True)
+        return _NOTHING
+
+    async def _wait_readable(self, sock: Any, timeout: float) -> bool:
+        """Wait on the event loop (not in a worker) for data on the socket."""
+        loop = asyncio.get_running_loop()
+        ready: asyncio.Future[None] = loop.create_future()
+        fd = sock.fileno()
+        loop.add_reader(fd, lambda: ready.done() or ready.set_result(None))
+        try:
+            async with asyncio.timeout(max(timeout, 0)):
+                await ready
+            return True
+        except TimeoutError:
+            return False
+        finally:
+            loop.remove_reader(fd)
+
+    async def _receive_or_heartbeat(self) -> Any:
+        sock = self._dev.socket
+        if sock is None:
+            return _NOT_CONNECTED
+        now = time.monotonic()
+        due = self._heartbeat_at + PUSH_HEARTBEAT_INTERVAL - now
+        # wake up when the channel turns unhealthy too, not only to heartbeat
+        wait = due
+        if self._push_ok_at is not None and self._push_ok_at + PUSH_HEALTH_WINDOW > now:
+            wait = min(due, self._push_ok_at + PUSH_HEALTH_WINDOW - now)
+        if await self._wait_readable(sock, wait):
+            return await self._run(OP_RECEIVE, self._receive_push)
+        if time.monotonic() < self._heartbeat_at + PUSH_HEARTBEAT_INTERVAL:
+            return _NOTHING
+        return await self._run(OP_HEARTBEAT, self._heartbeat)
+
+    async def async_listen(
+        self,
+        on_dps: Callable[[dict[str, Any]], None],
+        on_health: Optional[Callable[[bool], None]] = None,
+    ) -> None:
+        """
+        Receive loop for DP updates the device sends on its own.
+
+        Runs until cancelled, handing every decoded DP dict to on_dps on the
+        event loop. on_health is told whenever the channel goes up or down.
+        Only active in persistent mode; otherwise it idles. The socket is
+        watched from the event loop, so a quiet channel holds no pool worker.
+        """
+        self._on_dps = on_dps
+        healthy = False
+        while True:
+            if not (self._cfg.persistent and self.push_enabled):
+                result = _NOT_CONNECTED
+            else:
+                try:
+                    result = await self._receive_or_heartbeat()
+                except Exception as exc:
+                    _LOGGER.debug("Proscenic push receive failed: %s", exc)
+                    result = _NOT_CONNECTED
+
+            if result is _NOT_CONNECTED or _is_error(result):
+                self._push_ok_at = None
+            elif result is not _NOTHING:
+                # a frame or a heartbeat reply arrived: the channel is alive.
+                # A silent device lets push_healthy expire on its own.
+                self._push_ok_at = time.monotonic()
+
+            if healthy != self.push_healthy:
+                healthy = not healthy
+                if on_health is not None:
+                    on_health(healthy)
+
+            if result is _NOT_CONNECTED or _is_error(result):
+                await asyncio.sleep(PUSH_RETRY_DELAY)
+                continue
+
+            dps = result.get("dps") if isinstance(result, dict) else None
+            if dps:
+                self._emit(dps)
+
+    async def async_close(self) -> None:
+        """Close the socket (and the private pool, if any)."""
+        try:
+            await self._run(OP_CLOSE, self._dev.close)
+        except ProscenicApiError as exc:
+            # the lane is still held by an abandoned call, whose socket is already shut down
+            _LOGGER.debug("Proscenic close: %s", exc)
+        finally:
+            if self._own_hub is not None:
+                self._own_hub.shutdown()
+
+
+class NativeApi(ProscenicApi):
     """
-    Best-effort LAN discovery via tinytuya.deviceScan, matching gwId/id == device_id.
+    Pure-asyncio backend built on tuya.TuyaClient (protocol 3.3 only).
+
+    The connection is always persistent and pushed frames arrive through the
+    protocol callback, so there is no worker thread and no receive polling;
+    async_listen only keeps the connection alive with heartbeats.
+    """
+
+    def __init__(self, cfg: ProscenicConfig, lane: Optional[DeviceLane] = None) -> None:
+        super().__init__(cfg)
+        self._client = self._build_client(cfg.host)
+        # no pool needed, the lane only serializes and accounts the calls
+        self._lane = lane
+
+    async def _call(
+        self, op: str, fn: Callable[..., Awaitable[Any]], *args: Any, timed: bool = True
+    ) -> Any:
+        """
+        Run a client call within the budget of op and map its errors.
+
+        Unlike a worker thread the call is really cancelled at the deadline
+        (the client drops the connection, see TuyaClient._request).
+        """
+        budget = IO_BUDGETS[op]
+        call = functools.partial(fn, *args, timeout=budget.socket_timeout)
+        start = time.monotonic()
+        try:
+            async with asyncio.timeout(budget.deadline) as deadline:
+                if self._lane is None:
+                    return await call()
+                return await self._lane.run(call)
+        except (TimeoutError, TuyaTimeoutError) as exc:
+            if deadline.expired():
+                self.metrics.count(COUNT_ABANDONED, op)
+                exc = TimeoutError(f"{op} on {self._cfg.host} exceeded its {budget.deadline:g}s deadline")
+            if timed:
+                self.metrics.count(COUNT_TIMEOUT, op)
+            raise ProscenicTimeoutError(str(exc)) from exc
+        except (OSError, TuyaProtocolError) as exc:
+            if timed:
+                self.metrics.count(COUNT_ERROR, op)
+            err = ProscenicDecodeError if isinstance(exc, TuyaDecodeError) else ProscenicApiError
+            raise err(str(exc)) from exc
+        finally:
+            if timed:
+                self.metrics.record(op, time.monotonic() - start)
+
+    def _build_client(self, host: str) -> TuyaClient:
+        return TuyaClient(
+            self._cfg.device_id,
+            self._cfg.local_key,
+            host,
+            port=self._cfg.port,
+            on_dps=self._handle_push,
+            on_connect=lambda seconds: self.metrics.record(OP_CONNECT, seconds),
+        )
+
+    def update_host(self, host: str) -> None:
+        self._client.close()
+        self._cfg.host = host
+        self._client = self._build_client(host)
+
+    async def detect_protocol_version(self) -> Optional[float]:
+        self._client.close()
+        # the probe blocks: on the lane like the tinytuya backend's calls, so
+        # nothing of ours talks to the device until it is over
+        if self._lane is not None:
+            return await self._lane.run_sync(probe_versions, self._cfg, deadline=PROBE_DEADLINE)
+        hub = ProscenicHub(max_workers=1)
+        try:
+            return await hub.lane(self.device_id).run_sync(probe_versions, self._cfg, deadline=PROBE_DEADLINE)
+        finally:
+            hub.shutdown()
+
+    def _handle_push(self, dps: dict[str, Any]) -> None:
+        self._push_ok_at = time.monotonic()
+        self._emit(dps)
+
+    async def status(self) -> dict[str, Any]:
+        result = await self._call(OP_STATUS, self._client.status)
+        self._record(RX, KIND_STATUS, result.get("dps"))
+        return result
+
+    async def query_dps(self, dps: Iterable[int]) -> dict[str, Any]:
+        got = await self._call(OP_QUERY, self._client.query_dps, list(dps))
+        self._record(RX, KIND_QUERY, got)
+        return got
+
+    async def set_dps(self, dps: dict[int, Any]) -> None:
+        self._record(TX, KIND_SET, dps)
+        await self._call(OP_SET_DPS, self._client.set_dps, dps)
+
+    async def async_listen(
+        self,
+        on_dps: Callable[[dict[str, Any]], None],
+        on_health: Optional[Callable[[bool], None]] = None,
+    ) -> None:
+        """Keep the connection up with heartbeats; pushes arrive via _handle_push."""
+        self._on_dps = on_dps
+        healthy = False
+        while True:
+            if self.push_enabled:
+                try:
+                    await self._call(OP_HEARTBEAT, self._client.heartbeat, timed=False)
+                    self._push_ok_at = time.monotonic()
+                except ProscenicApiError as exc:
+                    _LOGGER.debug("Proscenic heartbeat failed: %s", exc)
+                    self._push_ok_at = None
+            else:
+                self._push_ok_at = None
+
+            if healthy != self.push_healthy:
+                healthy = not healthy
+                if on_health is not None:
+                    on_health(healthy)
+
+            await asyncio.sleep(PUSH_HEARTBEAT_INTERVAL if healthy else PUSH_RETRY_DELAY)
+
+    async def async_close(self) -> None:
+        self._client.close()
+
+
+def create_api(cfg: ProscenicConfig, lane: Optional[DeviceLane] = None) -> ProscenicApi:
+    """Build the API for the configured backend, on lane of the shared hub if given."""
+    if cfg.backend == BACKEND_REPLAY:
+        from .replay import ReplayApi  # imports this module
+
+        return ReplayApi(cfg)
+    if cfg.backend == BACKEND_NATIVE:
+        if cfg.protocol_version == 3.3:
+            return NativeApi(cfg, lane)
+        _LOGGER.warning(
+            "Proscenic: native backend only speaks protocol 3.3, using tinytuya for %s",
+            cfg.protocol_version,
+        )
+    elif cfg.backend != BACKEND_TINYTUYA:
+        _LOGGER.warning("Proscenic: unknown backend %r, using tinytuya", cfg.backend)
+    return TinyTuyaApi(cfg, lane)
+
+
+def _is_error(result: Any) -> bool:
+    return isinstance(result, dict) and "Err" in result
+
+
+# a probe gives each version one connection attempt of IO_SOCKET_TIMEOUT
+# (3.4+ may wait for the key negotiation twice as long)
+PROBE_DEADLINE = len(PROTOCOL_VERSIONS) * (2 * IO_SOCKET_TIMEOUT + 1)
+
+
+def probe_versions(cfg: ProscenicConfig, versions: Iterable[float] = PROTOCOL_VERSIONS) -> Optional[float]:
+    """
+    Blocking: a status query in each of versions until one decodes.
+
+    None if none does (wrong local key); ProscenicApiError if the device
+    refuses the connection.
+    """
+    for version in versions:
+        dev = tinytuya.OutletDevice(
+            cfg.device_id,
+            cfg.host,
+            cfg.local_key,
+            port=cfg.port,
+            version=version,
+            connection_timeout=IO_SOCKET_TIMEOUT,
+            connection_retry_limit=1,
+            connection_retry_delay=0,
+        )
+        try:
+            result = dev.status()
+        finally:
+            dev.close()
+        if isinstance(result, dict) and "dps" in result:
+            return version
+        if _is_error(result) and str(result.get("Err")) == _TINYTUYA_CONNECT_ERROR:
+            # nothing to learn from a device that is not there
+            raise ProscenicApiError(f"{cfg.host}: {result.get('Error')} (Err {_TINYTUYA_CONNECT_ERROR})")
+        _LOGGER.debug("Proscenic %s: no answer in protocol %s (%s)", cfg.device_id, version, result)
+    return None
+
+
+async def scan_devices(timeout_s: int = 8) -> dict[str, tuple[str, Optional[str]]]:
+    """
+    Best-effort LAN discovery via tinytuya.deviceScan: device id -> (ip, protocol version).
     """
 
     def _scan() -> dict[str, Any]:
-        return tinytuya.deviceScan(maxretry=2, color=False)
+        # listen for broadcasts only: polling every device found could keep
+        # the executor thread busy long after timeout_s
+        return tinytuya.deviceScan(maxretry=2, color=False, poll=False)
 
     try:
         data = await asyncio.wait_for(asyncio.to_thread(_scan), timeout=timeout_s)
     except Exception:
-        return None
+        return {}
 
-    if not data:
-        return None
-
-    for ip_key, info in data.items():
+    found: dict[str, tuple[str, Optional[str]]] = {}
+    for ip_key, info in (data or {}).items():
         if not isinstance(info, dict):
             continue
         gwid = info.get("gwId") or info.get("id")
-        if gwid == device_id:
-            return info.get("ip") or ip_key
+        if gwid:
+            version = info.get("version")
+            found[str(gwid)] = (info.get("ip") or ip_key, str(version) if version is not None else None)
+    return found
+
 
-    return None
\ No newline at end of file
+async def discover_ip_by_device_id(device_id: str, timeout_s: int = 8) -> Optional[str]:
+    """
+    Best-effort LAN discovery via tinytuya.deviceScan, matching gwId/id == device_id.
+    """
+    found = (await scan_devices(timeout_s)).get(device_id)
+    return found[0] if found else None
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import random
+import time
+from typing import Optional
+
+from .const import (
+    BREAKER_BASE_DELAY,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_JITTER,
+    BREAKER_MAX_DELAY,
+)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Poll gate for a device that stopped answering.
+
+    closed: every poll goes out. After `threshold` consecutive failures the
+    breaker opens and polls are refused without I/O until the backoff delay
+    has passed; the next poll is then let through as a probe (half-open).
+    A successful probe closes the breaker, a failed one reopens it with the
+    delay doubled (plus jitter, so robots that dropped together do not come
+    back in lockstep).
+    """
+
+    def __init__(
+        self,
+        threshold: int = BREAKER_FAILURE_THRESHOLD,
+        base_delay: float = BREAKER_BASE_DELAY,
+        max_delay: float = BREAKER_MAX_DELAY,
+        jitter: float = BREAKER_JITTER,
+    ) -> None:
+        self.threshold = threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.last_error: Optional[str] = None
+        self._open_until = 0.0
+
+    @property
+    def retry_in(self) -> float:
+        """Seconds until an open breaker lets the next probe through."""
+        if self.state != STATE_OPEN:
+            return 0.0
+        return max(0.0, self._open_until - time.monotonic())
+
+    def allow(self) -> bool:
+        """Whether a poll may go out now (moves open -> half-open when due)."""
+        if self.state == STATE_OPEN:
+            if time.monotonic() < self._open_until:
+                return False
+            self.state = STATE_HALF_OPEN
+        return True
+
+    def record_success(self) -> bool:
+        """Returns True if this closed an open/half-open breaker."""
+        recovered = self.state != STATE_CLOSED
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.last_error = None
+        return recovered
+
+    def record_failure(self, err: object) -> bool:
+        """Returns True if this (re)opened the breaker."""
+        self.failures += 1
+        self.last_error = str(err)
+        if self.state != STATE_HALF_OPEN and self.failures < self.threshold:
+            return False
+        delay = min(self.max_delay, self.base_delay * 2**self.trips)
+        delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        self.trips += 1
+        self.state = STATE_OPEN
+        self._open_until = time.monotonic() + delay
+        return True
+
+    def as_dict(self) -> dict[str, object]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "trips": self.trips,
+            "retry_in": round(self.retry_in, 1),
+            "last_error": self.last_error,
+        }
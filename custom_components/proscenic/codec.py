@@ -0,0 +1,205 @@
+"""
+Table-driven DP decoding.
+
+Each supported model gets a tuple of DpSpec rows (DP id, value type, scale,
+ProscenicState field). The model is read from DP_DEVICE_MODEL; models without
+a table of their own use the 850T one, which is what every robot seen so far
+reports. Supporting another model means adding a table to MODEL_CODECS.
+"""
+
+from __future__ import annotations
+
+import logging
+import operator
+from dataclasses import dataclass, fields
+from typing import Any, Optional
+
+from .const import (
+    DP_BATTERY,
+    DP_BRUSH_HEALTH,
+    DP_CLEAN_AREA,
+    DP_CLEAN_TIME,
+    DP_CURRENT_STATE,
+    DP_DEVICE_MODEL,
+    DP_FAN_SPEED,
+    DP_FAULT,
+    DP_FILTER_HEALTH,
+    DP_RESET_FILTER,
+    DP_SENSOR_HEALTH,
+    DP_SIDE_BRUSH_HEALTH,
+    DP_SWEEP_OR_MOP,
+    DP_WATER_SPEED,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+@dataclass(slots=True)
+class ProscenicState:
+    raw_dps: dict[str, Any]
+    battery: Optional[int] = None
+    fault: Optional[int] = None
+    current_state: Optional[int] = None
+    fan_speed: Optional[str] = None
+    water_speed: Optional[str] = None
+    clean_area: Optional[float] = None
+    clean_time: Optional[int] = None
+    mop_equipped: Optional[bool] = None
+    device_model: Optional[str] = None
+    sensor_health: Optional[int] = None
+    filter_health: Optional[int] = None
+    side_brush_health: Optional[int] = None
+    brush_health: Optional[int] = None
+    reset_filter: Optional[Any] = None
+
+
+_FIELD_NAMES = tuple(f.name for f in fields(ProscenicState) if f.name != "raw_dps")
+STATE_FIELDS = frozenset(_FIELD_NAMES)
+# positional copy of the decoded fields, much cheaper than copy.copy() on slots
+_field_values = operator.attrgetter(*_FIELD_NAMES)
+# raw_dps as a "field": any DP changed, decoded or not
+FIELD_RAW_DPS = "raw_dps"
+ALL_FIELDS = STATE_FIELDS | {FIELD_RAW_DPS}
+
+
+def changed_fields(old: Optional[ProscenicState], new: Optional[ProscenicState]) -> frozenset[str]:
+    """The fields of new whose value differs from old (all of them without an old state)."""
+    if old is new:
+        return frozenset()
+    if old is None or new is None:
+        return ALL_FIELDS
+    changed = {
+        name for name, a, b in zip(_FIELD_NAMES, _field_values(old), _field_values(new)) if a != b
+    }
+    if old.raw_dps is not new.raw_dps and old.raw_dps != new.raw_dps:
+        changed.add(FIELD_RAW_DPS)
+    return frozenset(changed)
+
+
+@dataclass(frozen=True, slots=True)
+class DpSpec:
+    """
+    How one DP maps onto a ProscenicState field.
+
+    kind is "int", "float", "str", "bool" or "raw". As in Tuya's DP schema,
+    scale is a decimal exponent (a float DP reports value / 10**scale);
+    factor converts units on top of that. For "bool", off_value (when set) is
+    the one raw value meaning False, anything else is True.
+    """
+
+    dp: int
+    field: str
+    kind: str = "int"
+    scale: int = 0
+    factor: int = 1
+    off_value: Any = None
+
+    def convert(self, value: Any) -> Any:
+        kind = self.kind
+        if kind == "int":
+            return int(value) * self.factor
+        if kind == "float":
+            return float(value) / 10**self.scale * self.factor
+        if kind == "str":
+            return str(value)
+        if kind == "bool":
+            if self.off_value is not None:
+                return str(value) != str(self.off_value)
+            return bool(value)
+        return value
+
+
+CODEC_850T: tuple[DpSpec, ...] = (
+    DpSpec(DP_BATTERY, "battery"),
+    DpSpec(DP_FAULT, "fault"),
+    DpSpec(DP_CURRENT_STATE, "current_state"),
+    DpSpec(DP_FAN_SPEED, "fan_speed", "str"),
+    DpSpec(DP_WATER_SPEED, "water_speed", "str"),
+    DpSpec(DP_CLEAN_AREA, "clean_area", "float", scale=1),  # tenths of m²
+    DpSpec(DP_CLEAN_TIME, "clean_time", factor=60),  # minutes -> seconds
+    DpSpec(DP_SWEEP_OR_MOP, "mop_equipped", "bool", off_value="sweep"),
+    DpSpec(DP_DEVICE_MODEL, "device_model", "str"),
+    DpSpec(DP_SENSOR_HEALTH, "sensor_health"),
+    DpSpec(DP_FILTER_HEALTH, "filter_health"),
+    DpSpec(DP_SIDE_BRUSH_HEALTH, "side_brush_health"),
+    DpSpec(DP_BRUSH_HEALTH, "brush_health"),
+    DpSpec(DP_RESET_FILTER, "reset_filter", "raw"),
+)
+
+# DP_DEVICE_MODEL value -> codec table
+MODEL_CODECS: dict[str, tuple[DpSpec, ...]] = {
+    "850T": CODEC_850T,
+}
+DEFAULT_CODEC = CODEC_850T
+
+
+class DpCodec:
+    """Decoder for one table, indexed by the string DP keys Tuya uses."""
+
+    def __init__(self, specs: tuple[DpSpec, ...]) -> None:
+        for spec in specs:
+            if spec.field not in STATE_FIELDS:
+                raise ValueError(f"DP {spec.dp}: unknown state field {spec.field!r}")
+        self._specs: dict[str, DpSpec] = {str(spec.dp): spec for spec in specs}
+
+    def _apply(self, st: ProscenicState, key: str, value: Any) -> None:
+        spec = self._specs.get(key)
+        if spec is None:
+            return
+        if value is None or value is _MISSING:
+            setattr(st, spec.field, None)
+            return
+        try:
+            setattr(st, spec.field, spec.convert(value))
+        except (TypeError, ValueError):
+            _LOGGER.debug("Proscenic: cannot decode DP %s=%r as %s", key, value, spec.kind)
+            setattr(st, spec.field, None)
+
+    def decode(self, raw: dict[str, Any]) -> ProscenicState:
+        """Decode every DP of raw."""
+        st = ProscenicState(raw_dps=raw)
+        for key in self._specs.keys() & raw.keys():
+            self._apply(st, key, raw[key])
+        return st
+
+    def update(self, previous: ProscenicState, raw: dict[str, Any]) -> ProscenicState:
+        """
+        Decode raw reusing previous: only DPs whose raw value changed are
+        converted again, and previous itself is returned when none did.
+        """
+        old = previous.raw_dps
+        changed = [k for k, v in raw.items() if old.get(k, _MISSING) != v]
+        changed.extend(k for k in old.keys() - raw.keys())
+        if not changed:
+            return previous
+        st = ProscenicState(raw, *_field_values(previous))
+        for key in changed:
+            self._apply(st, key, raw.get(key, _MISSING))
+        return st
+
+
+_CODECS: dict[Optional[str], DpCodec] = {}
+
+
+def codec_for(model: Optional[str]) -> DpCodec:
+    """The (cached) codec for a DP_DEVICE_MODEL value."""
+    codec = _CODECS.get(model)
+    if codec is None:
+        specs = MODEL_CODECS.get(model) if model is not None else None
+        if specs is None:
+            if model is not None:
+                _LOGGER.debug("Proscenic: no DP table for model %s, using the 850T one", model)
+            specs = DEFAULT_CODEC
+        codec = _CODECS[model] = DpCodec(specs)
+    return codec
+
+
+def decode_dps(raw: dict[str, Any], previous: Optional[ProscenicState] = None) -> ProscenicState:
+    """Decode raw with the codec of the model it reports, incrementally if possible."""
+    model = raw.get(str(DP_DEVICE_MODEL))
+    codec = codec_for(None if model is None else str(model))
+    if previous is None or previous.raw_dps.get(str(DP_DEVICE_MODEL)) != model:
+        return codec.decode(raw)
+    return codec.update(previous, raw)
@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Collection, Optional
+
+from .api import ProscenicAckError, ProscenicApiError
+from .breaker import STATE_OPEN
+from .const import (
+    COMMAND_BUFFER_SIZE,
+    COMMAND_BUFFER_TTL,
+    COMMAND_BUFFERED,
+    COMMAND_EXPIRED,
+    COMMAND_FAILED,
+    COMMAND_REFRESH_DPS,
+    COMMAND_REPLAYED,
+    COMMAND_SUPERSEDED,
+    EVENT_COMMAND,
+    TRIGGER_DPS,
+)
+
+if TYPE_CHECKING:
+    from .coordinator import ProscenicCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(slots=True, eq=False)
+class BufferedCommand:
+    """A batch of DP writes waiting for the robot to come back."""
+
+    dps: dict[int, Any]
+    queued_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def expires_at(self) -> float:
+        return self.queued_at + COMMAND_BUFFER_TTL
+
+
+class ProscenicCommandQueue:
+    """
+    Per-device DP write queue.
+
+    Writes that arrive while a batch is in flight are merged into the next
+    one (last value per DP wins) and writes that would not change a setting
+    are dropped. Each batch is applied optimistically to the coordinator
+    state and goes out as a single set_dps frame; only action writes with
+    no push channel to report their effect trigger a (partial) refresh.
+    With acknowledged writes on, a batch is done once the device echoed it,
+    and one it never confirms fails with ProscenicAckError.
+
+    With the offline buffer on, a batch the robot cannot receive is kept
+    (for COMMAND_BUFFER_TTL, at most COMMAND_BUFFER_SIZE batches) instead of
+    failing, and replayed in order once the robot shows up again. A later
+    write of the same DP supersedes the buffered one. Every step is
+    reported with an EVENT_COMMAND event.
+    """
+
+    def __init__(self, coordinator: ProscenicCoordinator) -> None:
+        self._coordinator = coordinator
+        self._pending: dict[int, Any] = {}
+        # pending DPs sent even if the device already reports the value
+        self._forced: set[int] = set()
+        self._waiters: list[asyncio.Future[None]] = []
+        self._task: Optional[asyncio.Task[None]] = None
+        # batches sent one at a time, live or replayed
+        self._send_lock = asyncio.Lock()
+        self._buffer: list[BufferedCommand] = []
+        self._replay_task: Optional[asyncio.Task[None]] = None
+        self._expiry_timer: Optional[asyncio.TimerHandle] = None
+
+    async def async_write(self, dps: dict[int, Any], force: bool = False) -> None:
+        """
+        Queue DP writes and wait until the batch carrying them was sent (or buffered).
+
+        force sends them even if the device already reports these values.
+        """
+        if self._buffer:
+            self._supersede(dps)
+        self._pending.update(dps)
+        if force:
+            self._forced.update(dps)
+        else:
+            self._forced.difference_update(dps)
+        fut: asyncio.Future[None] = self._coordinator.hass.loop.create_future()
+        self._waiters.append(fut)
+        if self._task is None or self._task.done():
+            self._task = self._coordinator.hass.async_create_task(self._flush())
+        await fut
+
+    def _effective(self, batch: dict[int, Any], forced: Collection[int] = ()) -> dict[int, Any]:
+        """Drop setting writes whose value the device already reports."""
+        st = self._coordinator.data
+        raw = st.raw_dps if st else {}
+        return {
+            dp: value
+            for dp, value in batch.items()
+            if dp in TRIGGER_DPS or dp in forced or raw.get(str(dp)) != value
+        }
+
+    async def _send(self, dps: dict[int, Any]) -> None:
+        coordinator = self._coordinator
+        async with self._send_lock:
+            coordinator.async_apply_optimistic(dps)
+            try:
+                if coordinator.ack_writes:
+                    # the echo is what the device now reports, pushes or not
+                    coordinator.async_merge_reported(await coordinator.api.set_dps_acked(dps))
+                else:
+                    await coordinator.api.set_dps(dps)
+            except ProscenicAckError as exc:
+                coordinator.async_merge_reported(exc.echoed)
+                coordinator.async_rollback_optimistic(exc.missing)
+                raise
+            except Exception:
+                coordinator.async_rollback_optimistic(dps)
+                raise
+        if not coordinator.push_active and not TRIGGER_DPS.isdisjoint(dps):
+            # the robot's reaction (DP 38 etc.) only shows up with a read
+            await coordinator.async_refresh_dps({*COMMAND_REFRESH_DPS, *dps})
+
+    async def _send_or_buffer(self, dps: dict[int, Any]) -> None:
+        coordinator = self._coordinator
+        offline = coordinator.breaker.state == STATE_OPEN
+        if coordinator.buffer_commands and (offline or self._buffer):
+            # known offline, or older commands still waiting: keep the order
+            self._buffer_command(dps)
+            if not offline:
+                self.async_device_available()
+            return
+        try:
+            await self._send(dps)
+        except ProscenicAckError:
+            # delivered but not confirmed: sending it again could repeat it
+            raise
+        except ProscenicApiError as exc:
+            if not coordinator.buffer_commands:
+                raise
+            _LOGGER.debug("Proscenic: write %s failed (%s), buffering it", dps, exc)
+            self._buffer_command(dps)
+
+    async def _flush(self) -> None:
+        while self._pending:
+            # let writes issued in the same loop iteration join this batch
+            await asyncio.sleep(0)
+            batch, self._pending = self._pending, {}
+            forced, self._forced = self._forced, set()
+            waiters, self._waiters = self._waiters, []
+
+            dps = self._effective(batch, forced)
+            try:
+                if dps:
+                    await self._send_or_buffer(dps)
+                else:
+                    _LOGGER.debug("Proscenic: dropping no-op write %s", batch)
+            except Exception as exc:
+                for fut in waiters:
+                    if not fut.done():
+                        fut.set_exception(exc)
+            else:
+                for fut in waiters:
+                    if not fut.done():
+                        fut.set_result(None)
+
+    # offline buffer
+
+    @property
+    def buffered(self) -> int:
+        return len(self._buffer)
+
+    def _buffer_command(self, dps: dict[int, Any]) -> None:
+        if len(self._buffer) >= COMMAND_BUFFER_SIZE:
+            self._fire(COMMAND_EXPIRED, self._buffer.pop(0), reason="overflow")
+        cmd = BufferedCommand(dict(dps))
+        self._buffer.append(cmd)
+        _LOGGER.info(
+            "Proscenic: %s non raggiungibile, comando %s in coda per %ss",
+            self._coordinator.api.host,
+            dps,
+            COMMAND_BUFFER_TTL,
+        )
+        self._fire(COMMAND_BUFFERED, cmd)
+        self._schedule_expiry()
+
+    def _supersede(self, dps: dict[int, Any]) -> None:
+        """Drop buffered values of DPs that are being written again."""
+        for cmd in list(self._buffer):
+            dropped = {dp: cmd.dps.pop(dp) for dp in dps if dp in cmd.dps}
+            if not dropped:
+                continue
+            self._fire(COMMAND_SUPERSEDED, BufferedCommand(dropped, cmd.queued_at))
+            if not cmd.dps:
+                self._buffer.remove(cmd)
+
+    def async_device_available(self) -> None:
+        """The robot answered (poll, push or announcement): replay the buffer."""
+        if self._buffer and (self._replay_task is None or self._replay_task.done()):
+            self._replay_task = self._coordinator.hass.async_create_task(self._replay())
+
+    async def _replay(self) -> None:
+        while self._buffer:
+            cmd = self._buffer[0]
+            if time.monotonic() >= cmd.expires_at:
+                self._buffer.pop(0)
+                self._fire(COMMAND_EXPIRED, cmd, reason="ttl")
+                continue
+            dps = self._effective(cmd.dps)
+            try:
+                if dps:
+                    await self._send(dps)
+            except ProscenicAckError as exc:
+                # delivered but not confirmed: replaying again could repeat it
+                self._remove(cmd)
+                self._fire(COMMAND_FAILED, cmd, reason=str(exc))
+                continue
+            except ProscenicApiError as exc:
+                # still unreachable: wait for the next sign of life
+                _LOGGER.debug("Proscenic: replay of %s failed (%s)", cmd.dps, exc)
+                return
+            self._remove(cmd)
+            self._fire(COMMAND_REPLAYED, cmd)
+
+    def _remove(self, cmd: BufferedCommand) -> None:
+        # superseding may have dropped it while it was being sent
+        self._buffer = [c for c in self._buffer if c is not cmd]
+
+    def _schedule_expiry(self) -> None:
+        if self._expiry_timer is not None:
+            self._expiry_timer.cancel()
+            self._expiry_timer = None
+        if self._buffer:
+            delay = max(0.0, min(c.expires_at for c in self._buffer) - time.monotonic())
+            self._expiry_timer = self._coordinator.hass.loop.call_later(delay, self._async_expire)
+
+    def _async_expire(self) -> None:
+        self._expiry_timer = None
+        now = time.monotonic()
+        for cmd in [c for c in self._buffer if now >= c.expires_at]:
+            self._remove(cmd)
+            self._fire(COMMAND_EXPIRED, cmd, reason="ttl")
+        self._schedule_expiry()
+
+    def async_shutdown(self) -> None:
+        """Entry unloaded: what is still buffered will never be sent."""
+        if self._expiry_timer is not None:
+            self._expiry_timer.cancel()
+            self._expiry_timer = None
+        buffer, self._buffer = self._buffer, []
+        for cmd in buffer:
+            self._fire(COMMAND_EXPIRED, cmd, reason="unloaded")
+
+    def _fire(self, result: str, cmd: BufferedCommand, reason: Optional[str] = None) -> None:
+        data: dict[str, Any] = {
+            "device_id": self._coordinator.api.device_id,
+            "result": result,
+            "dps": {str(dp): value for dp, value in cmd.dps.items()},
+            "age": round(time.monotonic() - cmd.queued_at, 1),
+        }
+        if reason is not None:
+            data["reason"] = reason
+        self._coordinator.hass.bus.async_fire(EVENT_COMMAND, data)
+
+    def as_dict(self) -> list[dict[str, Any]]:
+        now = time.monotonic()
+        return [
+            {
+                "dps": {str(dp): value for dp, value in cmd.dps.items()},
+                "age": round(now - cmd.queued_at, 1),
+                "expires_in": round(max(0.0, cmd.expires_at - now), 1),
+            }
+            for cmd in self._buffer
+        ]
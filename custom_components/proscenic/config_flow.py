@@ -1,32 +1,83 @@
 from __future__ import annotations
 
+import asyncio
+from pathlib import Path
+
 import voluptuous as vol
 
 from homeassistant import config_entries
 from homeassistant.const import CONF_NAME
+from homeassistant.helpers import selector
 
-from .api import discover_ip_by_device_id
+from .discovery import async_discover_devices, async_discover_ip
+from .importer import (
+    ImportedDevice,
+    async_verify,
+    devices_from_export,
+    parse_export,
+    set_announced,
+)
 from .const import (
     DOMAIN,
     DEFAULT_NAME,
+    DISCOVERY_WAIT,
+    IMPORT_INVALID_KEY,
+    IMPORT_OK,
+    MANUAL_PROBE_DEADLINE,
     CONF_DEVICE_ID,
     CONF_LOCAL_KEY,
     CONF_HOST,
+    CONF_PROTOCOL_VERSION,
     CONF_SCAN_INTERVAL,
+    CONF_SCAN_INTERVAL_CHARGING,
+    CONF_SCAN_INTERVAL_STANDBY,
+    CONF_SCAN_INTERVAL_DOCKED_FULL,
     CONF_REMEMBER_FAN_SPEED,
     CONF_SHOW_RAW_DPS,
     CONF_AUTO_DISCOVER_IP,
+    CONF_PERSISTENT_CONNECTION,
+    CONF_PUSH_UPDATES,
+    CONF_BACKEND,
+    CONF_ACK_WRITES,
+    CONF_BUFFER_COMMANDS,
+    CONF_RECORD_TRAFFIC,
+    CONF_REPLAY_SPEED,
+    BACKEND_TINYTUYA,
+    BACKEND_NATIVE,
+    BACKEND_REPLAY,
     DEFAULT_SCAN_INTERVAL_SECONDS,
+    DEFAULT_SCAN_INTERVAL_CHARGING_SECONDS,
+    DEFAULT_SCAN_INTERVAL_STANDBY_SECONDS,
+    DEFAULT_SCAN_INTERVAL_DOCKED_FULL_SECONDS,
     DEFAULT_REMEMBER_FAN_SPEED,
     DEFAULT_SHOW_RAW_DPS,
     DEFAULT_AUTO_DISCOVER_IP,
+    DEFAULT_PERSISTENT_CONNECTION,
+    DEFAULT_PUSH_UPDATES,
+    DEFAULT_BACKEND,
+    DEFAULT_ACK_WRITES,
+    DEFAULT_BUFFER_COMMANDS,
+    DEFAULT_RECORD_TRAFFIC,
+    DEFAULT_REPLAY_SPEED,
 )
 
 
+CONF_DEVICES_JSON = "devices_json"
+# flows started by a devices.json import, one per verified robot
+SOURCE_BULK_IMPORT = "bulk_import"
+
+
 class ProscenicConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     VERSION = 1
 
+    def __init__(self) -> None:
+        # devices.json import: probed robots, the verified ones added on confirmation
+        self._imported: list[ImportedDevice] = []
+
     async def async_step_user(self, user_input=None):
+        return self.async_show_menu(step_id="user", menu_options=["manual", "devices_json"])
+
+    async def async_step_manual(self, user_input=None):
         errors: dict[str, str] = {}
 
         if user_input is not None:
@@ -35,24 +86,24 @@ class ProscenicConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
             # Best-effort discovery
             if not host:
-                host = await discover_ip_by_device_id(device_id)
+                host = await async_discover_ip(self.hass, device_id, DISCOVERY_WAIT)
                 if not host:
                     errors["base"] = "cannot_discover_ip"
-                else:
-                    user_input[CONF_HOST] = host
 
             if not errors:
                 await self.async_set_unique_id(device_id)
                 self._abort_if_unique_id_configured()
 
-                title = user_input.get(CONF_NAME, DEFAULT_NAME)
-                data = {
-                    CONF_DEVICE_ID: user_input[CONF_DEVICE_ID],
-                    CONF_LOCAL_KEY: user_input[CONF_LOCAL_KEY],
-                    CONF_HOST: user_input[CONF_HOST],
-                    CONF_NAME: title,
-                }
-                return self.async_create_entry(title=title, data=data)
+                device = ImportedDevice(
+                    device_id, user_input[CONF_LOCAL_KEY], user_input.get(CONF_NAME, DEFAULT_NAME), host=host
+                )
+                # time-boxed: a robot that is offline or slow to answer is
+                # added anyway, its protocol is detected later
+                await async_verify([device], deadline=MANUAL_PROBE_DEADLINE)
+                if device.result == IMPORT_INVALID_KEY:
+                    errors["base"] = "invalid_key"
+                else:
+                    return self.async_create_entry(title=device.name, data=_entry_data(device))
 
         schema = vol.Schema(
             {
@@ -62,13 +113,109 @@ class ProscenicConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 vol.Optional(CONF_NAME, default=DEFAULT_NAME): str,
             }
         )
-        return self.async_show_form(step_id="user", data_schema=schema, errors=errors)
+        return self.async_show_form(step_id="manual", data_schema=schema, errors=errors)
+
+    async def async_step_devices_json(self, user_input=None):
+        """Add every Proscenic robot of a tinytuya / tuya-uncover devices.json at once."""
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            text = user_input[CONF_DEVICES_JSON].strip()
+            try:
+                if not text.startswith(("[", "{")):
+                    # a path, relative to the config directory
+                    text = await self.hass.async_add_executor_job(self._read_export, text)
+                devices = devices_from_export(parse_export(text))
+            except PermissionError:
+                errors["base"] = "path_not_allowed"
+            except (OSError, ValueError):
+                errors["base"] = "invalid_devices_json"
+            else:
+                configured = self._async_current_ids()
+                new = [d for d in devices if d.device_id not in configured]
+                if not devices:
+                    errors["base"] = "no_devices"
+                elif not new:
+                    return self.async_abort(reason="already_configured")
+                else:
+                    return await self._async_import(new)
+
+        schema = vol.Schema(
+            {vol.Required(CONF_DEVICES_JSON): selector.TextSelector(selector.TextSelectorConfig(multiline=True))}
+        )
+        return self.async_show_form(step_id="devices_json", data_schema=schema, errors=errors)
+
+    def _read_export(self, name: str) -> str:
+        """Read an export from the config directory (or an allowlisted one); blocking."""
+        config_dir = Path(self.hass.config.config_dir).resolve()
+        path = (config_dir / name).resolve()
+        if not path.is_relative_to(config_dir) and not self.hass.config.is_allowed_path(str(path)):
+            raise PermissionError(f"{path} is outside the configuration directory")
+        return path.read_text("utf-8")
+
+    async def _async_import(self, devices: list[ImportedDevice]):
+        # one scan for all of them, then every key checked at once
+        found = await async_discover_devices(self.hass, [d.device_id for d in devices], DISCOVERY_WAIT)
+        for device in devices:
+            if (dev := found.get(device.device_id)) is not None:
+                set_announced(device, dev.ip, dev.version)
+        await async_verify(devices)
+        self._imported = devices
+        return await self.async_step_devices_summary()
+
+    async def async_step_devices_summary(self, user_input=None):
+        """What the import found; confirming adds every verified robot."""
+        verified = [d for d in self._imported if d.result == IMPORT_OK]
+        skipped = "\n".join(f"- {d.name}: {d.result}" for d in self._imported if d.result != IMPORT_OK) or "-"
+        if not verified:
+            return self.async_abort(reason="no_devices_verified", description_placeholders={"skipped": skipped})
+        if user_input is None:
+            return self.async_show_form(
+                step_id="devices_summary",
+                data_schema=vol.Schema({}),
+                description_placeholders={
+                    "added": "\n".join(f"- {d.name} ({d.host}, {d.version})" for d in verified),
+                    "skipped": skipped,
+                },
+            )
+
+        # the others in flows of their own, the first one in this flow
+        first, *others = verified
+        await asyncio.gather(
+            *(
+                self.hass.config_entries.flow.async_init(
+                    DOMAIN, context={"source": SOURCE_BULK_IMPORT}, data=_entry_data(device)
+                )
+                for device in others
+            )
+        )
+        await self.async_set_unique_id(first.device_id)
+        self._abort_if_unique_id_configured()
+        return self.async_create_entry(title=first.name, data=_entry_data(first))
+
+    async def async_step_bulk_import(self, import_data):
+        """One robot of a devices.json import, already verified."""
+        await self.async_set_unique_id(import_data[CONF_DEVICE_ID])
+        self._abort_if_unique_id_configured()
+        return self.async_create_entry(title=import_data[CONF_NAME], data=import_data)
 
     @staticmethod
     def async_get_options_flow(config_entry: config_entries.ConfigEntry):
         return ProscenicOptionsFlowHandler(config_entry)
 
 
+def _entry_data(device: ImportedDevice) -> dict:
+    data = {
+        CONF_DEVICE_ID: device.device_id,
+        CONF_LOCAL_KEY: device.local_key,
+        CONF_HOST: device.host,
+        CONF_NAME: device.name,
+    }
+    if device.version is not None:
+        data[CONF_PROTOCOL_VERSION] = device.version
+    return data
+
+
 class ProscenicOptionsFlowHandler(config_entries.OptionsFlow):
     def __init__(self, entry: config_entries.ConfigEntry) -> None:
         self.entry = entry
@@ -84,6 +231,18 @@ class ProscenicOptionsFlowHandler(config_entries.OptionsFlow):
                     CONF_SCAN_INTERVAL,
                     default=opts.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL_SECONDS),
                 ): vol.All(vol.Coerce(int), vol.Range(min=5, max=60)),
+                vol.Optional(
+                    CONF_SCAN_INTERVAL_CHARGING,
+                    default=opts.get(CONF_SCAN_INTERVAL_CHARGING, DEFAULT_SCAN_INTERVAL_CHARGING_SECONDS),
+                ): vol.All(vol.Coerce(int), vol.Range(min=5, max=600)),
+                vol.Optional(
+                    CONF_SCAN_INTERVAL_STANDBY,
+                    default=opts.get(CONF_SCAN_INTERVAL_STANDBY, DEFAULT_SCAN_INTERVAL_STANDBY_SECONDS),
+                ): vol.All(vol.Coerce(int), vol.Range(min=5, max=600)),
+                vol.Optional(
+                    CONF_SCAN_INTERVAL_DOCKED_FULL,
+                    default=opts.get(CONF_SCAN_INTERVAL_DOCKED_FULL, DEFAULT_SCAN_INTERVAL_DOCKED_FULL_SECONDS),
+                ): vol.All(vol.Coerce(int), vol.Range(min=5, max=3600)),
                 vol.Optional(
                     CONF_REMEMBER_FAN_SPEED,
                     default=opts.get(CONF_REMEMBER_FAN_SPEED, DEFAULT_REMEMBER_FAN_SPEED),
@@ -96,6 +255,34 @@ class ProscenicOptionsFlowHandler(config_entries.OptionsFlow):
                     CONF_AUTO_DISCOVER_IP,
                     default=opts.get(CONF_AUTO_DISCOVER_IP, DEFAULT_AUTO_DISCOVER_IP),
                 ): bool,
+                vol.Optional(
+                    CONF_PERSISTENT_CONNECTION,
+                    default=opts.get(CONF_PERSISTENT_CONNECTION, DEFAULT_PERSISTENT_CONNECTION),
+                ): bool,
+                vol.Optional(
+                    CONF_PUSH_UPDATES,
+                    default=opts.get(CONF_PUSH_UPDATES, DEFAULT_PUSH_UPDATES),
+                ): bool,
+                vol.Optional(
+                    CONF_BACKEND,
+                    default=opts.get(CONF_BACKEND, DEFAULT_BACKEND),
+                ): vol.In([BACKEND_TINYTUYA, BACKEND_NATIVE, BACKEND_REPLAY]),
+                vol.Optional(
+                    CONF_ACK_WRITES,
+                    default=opts.get(CONF_ACK_WRITES, DEFAULT_ACK_WRITES),
+                ): bool,
+                vol.Optional(
+                    CONF_BUFFER_COMMANDS,
+                    default=opts.get(CONF_BUFFER_COMMANDS, DEFAULT_BUFFER_COMMANDS),
+                ): bool,
+                vol.Optional(
+                    CONF_RECORD_TRAFFIC,
+                    default=opts.get(CONF_RECORD_TRAFFIC, DEFAULT_RECORD_TRAFFIC),
+                ): bool,
+                vol.Optional(
+                    CONF_REPLAY_SPEED,
+                    default=opts.get(CONF_REPLAY_SPEED, DEFAULT_REPLAY_SPEED),
+                ): vol.All(vol.Coerce(float), vol.Range(min=0.1, max=1000)),
             }
         )
         return self.async_show_form(step_id="init", data_schema=schema)
\ No newline at end of file
@@ -4,28 +4,174 @@ DOMAIN = "proscenic"
 MANUFACTURER = "Proscenic"
 DEFAULT_NAME = "Proscenic"
 
-# Tuya protocol
+# Tuya protocol: the default, and the versions tried (in order) when the
+# robot does not answer in it. From 3.4 on every connection negotiates a
+# session key, so the socket is kept open to reuse it.
 TUYA_PROTOCOL_VERSION = 3.3
+PROTOCOL_VERSIONS = (3.3, 3.4, 3.5, 3.1)
+SESSION_KEY_MIN_VERSION = 3.4
+
+# hass.data[DOMAIN] keys shared by all entries (the rest are entry ids)
+DATA_DISCOVERY = "discovery"
+DATA_HUB = "hub"
+SHARED_DATA_KEYS = frozenset({DATA_DISCOVERY, DATA_HUB})
+
+# samples kept per operation for the rolling latency percentiles
+METRICS_WINDOW = 256
+
+# worker threads of the I/O pool shared by all entries (blocking backends only)
+HUB_MAX_WORKERS = 4
+
+# API backends
+BACKEND_TINYTUYA = "tinytuya"
+BACKEND_NATIVE = "native"
+# plays a traffic recording back instead of talking to a robot (development)
+BACKEND_REPLAY = "replay"
 
 # Config keys (entry.data)
 CONF_DEVICE_ID = "device_id"
 CONF_LOCAL_KEY = "local_key"
 CONF_HOST = "host"
+# detected protocol version (entry.data, written back like a rediscovered host)
+CONF_PROTOCOL_VERSION = "protocol_version"
 CONF_NAME = "name"
 
 # Options (entry.options)
 CONF_SCAN_INTERVAL = "scan_interval"
+CONF_SCAN_INTERVAL_CHARGING = "scan_interval_charging"
+CONF_SCAN_INTERVAL_STANDBY = "scan_interval_standby"
+CONF_SCAN_INTERVAL_DOCKED_FULL = "scan_interval_docked_full"
 CONF_REMEMBER_FAN_SPEED = "remember_fan_speed"
 CONF_SHOW_RAW_DPS = "show_raw_dps"
 CONF_AUTO_DISCOVER_IP = "auto_discover_ip"
+CONF_PERSISTENT_CONNECTION = "persistent_connection"
+CONF_PUSH_UPDATES = "push_updates"
+CONF_BACKEND = "backend"
+CONF_ACK_WRITES = "ack_writes"
+CONF_BUFFER_COMMANDS = "buffer_commands"
+CONF_RECORD_TRAFFIC = "record_traffic"
+CONF_REPLAY_SPEED = "replay_speed"
 
 DEFAULT_SCAN_INTERVAL_SECONDS = 10
+DEFAULT_SCAN_INTERVAL_CHARGING_SECONDS = 60
+DEFAULT_SCAN_INTERVAL_STANDBY_SECONDS = 60
+DEFAULT_SCAN_INTERVAL_DOCKED_FULL_SECONDS = 600
 DEFAULT_REMEMBER_FAN_SPEED = False
 DEFAULT_SHOW_RAW_DPS = False
 DEFAULT_AUTO_DISCOVER_IP = True
+DEFAULT_PERSISTENT_CONNECTION = True
+DEFAULT_PUSH_UPDATES = True
+DEFAULT_BACKEND = BACKEND_TINYTUYA
+DEFAULT_ACK_WRITES = False
+DEFAULT_BUFFER_COMMANDS = False
+DEFAULT_RECORD_TRAFFIC = False
+DEFAULT_REPLAY_SPEED = 1.0
+
+# seconds to wait for the device to report the new cleaning mode (pushed or
+# read back) before re-asserting the fan speed anyway
+REMEMBER_FAN_SPEED_ECHO_TIMEOUT = 6
+
+# seconds an optimistic DP value is kept while waiting for the device to confirm it
+OPTIMISTIC_TIMEOUT = 15
+
+# Acknowledged writes: seconds to wait for the device's echo of a write, and
+# how many times in total a write is sent before giving up
+ACK_TIMEOUT = 3
+ACK_ATTEMPTS = 3
+
+# Offline command buffer: commands kept while the robot is unreachable, and
+# seconds a command stays valid before it is dropped as expired
+COMMAND_BUFFER_SIZE = 10
+COMMAND_BUFFER_TTL = 300
+
+# Event fired for every buffered command, with "result" one of the below
+EVENT_COMMAND = f"{DOMAIN}_command"
+COMMAND_BUFFERED = "buffered"
+COMMAND_REPLAYED = "replayed"
+COMMAND_SUPERSEDED = "superseded"
+COMMAND_EXPIRED = "expired"
+COMMAND_FAILED = "failed"
+
+# Traffic recordings, in <config>/proscenic/: <device_id>.jsonl is written
+# when recording, <device_id>.replay.jsonl is read by the replay backend.
+# Rotated past RECORDER_MAX_BYTES, written every RECORDER_FLUSH_INTERVAL s.
+RECORDER_MAX_BYTES = 5 * 1024 * 1024
+RECORDER_FLUSH_INTERVAL = 5
 
-# seconds
-REMEMBER_FAN_SPEED_DELAY = 6
+# show_raw_dps: DP changes kept in memory, for diagnostics and the
+# proscenic.dp_history service (per-DP sensors are created disabled)
+DP_HISTORY_SIZE = 200
+
+# seconds between two saves of the last known state (restored at startup)
+SNAPSHOT_SAVE_DELAY = 60
+
+# Services
+SERVICE_PROFILE = "profile"
+SERVICE_DP_HISTORY = "dp_history"
+ATTR_CYCLES = "cycles"
+# proscenic.profile: coordinator cycles captured by default and at most;
+# reports go to <config>/proscenic/profile_<device_id>_<time>.txt
+DEFAULT_PROFILE_CYCLES = 10
+MAX_PROFILE_CYCLES = 100
+
+SERVICE_FLEET_COMMAND = "fleet_command"
+ATTR_COMMAND = "command"
+ATTR_FAN_SPEED = "fan_speed"
+ATTR_MAX_CONCURRENCY = "max_concurrency"
+ATTR_TIMEOUT = "timeout"
+# proscenic.fleet_command: commands (the vacuum entity's methods), robots
+# commanded at once and seconds each robot gets, its refresh included
+FLEET_COMMANDS = ("start", "pause", "stop", "return_to_base", "clean_spot", "set_fan_speed")
+DEFAULT_FLEET_CONCURRENCY = 8
+MAX_FLEET_CONCURRENCY = 64
+DEFAULT_FLEET_TIMEOUT = 30
+# per-robot "result" in the response
+FLEET_OK = "ok"
+FLEET_BUFFERED = "buffered"
+FLEET_UNAVAILABLE = "unavailable"
+FLEET_TIMEOUT = "timeout"
+FLEET_ERROR = "error"
+
+# Bulk import from a devices.json export: robots probed at the same time,
+# and why a robot was not added
+IMPORT_CONCURRENCY = 8
+# seconds the single-robot form waits for the key check before adding it anyway
+MANUAL_PROBE_DEADLINE = 5
+IMPORT_OK = "ok"
+IMPORT_NOT_FOUND = "not_found"
+IMPORT_UNREACHABLE = "unreachable"
+IMPORT_INVALID_KEY = "invalid_key"
+
+# Push channel (seconds): the socket is watched from the event loop; reading a
+# frame that arrived holds the device's pool worker for at most PUSH_RECEIVE_TIMEOUT.
+PUSH_RECEIVE_TIMEOUT = 1.0
+PUSH_HEARTBEAT_INTERVAL = 10
+PUSH_RETRY_DELAY = 5
+# safety-net poll while the push channel is healthy
+PUSH_FALLBACK_SCAN_INTERVAL = 300
+
+# LAN discovery (seconds): devices broadcast every few seconds, so an entry not
+# refreshed for DISCOVERY_TTL means the device is gone
+DISCOVERY_TTL = 300
+DISCOVERY_WAIT = 8
+
+# Circuit breaker for unreachable devices: after BREAKER_FAILURE_THRESHOLD
+# failed polls stop polling for BREAKER_BASE_DELAY seconds, doubling (with
+# +/- BREAKER_JITTER) on every failed probe up to BREAKER_MAX_DELAY.
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_BASE_DELAY = 30
+BREAKER_MAX_DELAY = 900
+BREAKER_JITTER = 0.2
+# minimum seconds between two active (tinytuya) rediscovery scans
+REDISCOVERY_MIN_INTERVAL = 600
+
+# Device I/O budgets (seconds), see IO_BUDGETS in api.py: socket timeout of a
+# connect / reply, connect and send attempts, pause between attempts, and the
+# hard deadline of a whole call, waiting for the device's lane included.
+IO_SOCKET_TIMEOUT = 3.0
+IO_ATTEMPTS = 2
+IO_RETRY_DELAY = 0.5
+IO_DEADLINE = 10.0
 
 # DPS (850T)
 DP_POWER = 1
@@ -45,4 +191,22 @@ DP_BRUSH_HEALTH = 48
 DP_SWEEP_OR_MOP = 49
 DP_RESET_FILTER = 52
 DP_DEVICE_MODEL = 58
-DP_WATER_SPEED = 60
\ No newline at end of file
+DP_WATER_SPEED = 60
+
+# DPs whose write is an action (re-sending the same value toggles or repeats
+# it), so the command queue never drops them as no-ops
+TRIGGER_DPS = frozenset({DP_CLEANING_MODE, DP_DIRECTION_CONTROL, DP_RESET_FILTER})
+
+# DP_CURRENT_STATE values (see CurrentState in vacuum.py), grouped for polling;
+# anything else (cleaning, returning, unknown) is polled at the active rate
+STATE_CHARGING = 5
+STATES_STANDBY = (0, 7)  # stand by, pause
+# Partial refreshes (UPDATEDPS): what a cleaning robot changes from poll to poll,
+# and what an action write makes it report. While cleaning, polls only ask
+# for FAST_LANE_DPS and do a full status every FULL_POLL_EVERY polls.
+FAST_LANE_DPS = (DP_FAULT, DP_CURRENT_STATE, DP_BATTERY, DP_CLEAN_AREA, DP_CLEAN_TIME)
+COMMAND_REFRESH_DPS = (DP_FAULT, DP_CURRENT_STATE, DP_BATTERY)
+FULL_POLL_EVERY = 6
+# partial polls failing in a row (the full status working) before the
+# device is taken not to support them
+PARTIAL_FAILURE_LIMIT = 3
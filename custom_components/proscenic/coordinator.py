@@ -1,65 +1,418 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import time
+from collections import deque
+from contextlib import AbstractContextManager, nullcontext
 from dataclasses import dataclass
-from typing import Any, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Iterable, Optional
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
-from .api import ProscenicApi, discover_ip_by_device_id
+from .api import ProscenicApi, ProscenicApiError, ProscenicDecodeError, discover_ip_by_device_id
+from .breaker import STATE_OPEN, CircuitBreaker
+from .codec import ALL_FIELDS, ProscenicState, changed_fields, decode_dps
+from .commands import ProscenicCommandQueue
+from .discovery import DiscoveredDevice, ProscenicDiscovery
+from .metrics import OP_DISCOVERY, OP_POLL
+from .profiler import STAGE_DECODE, STAGE_ENTITIES, STAGE_FETCH, PollProfiler
 from .const import (
-    DP_BATTERY,
-    DP_BRUSH_HEALTH,
-    DP_CLEAN_AREA,
-    DP_CLEAN_TIME,
-    DP_CURRENT_STATE,
-    DP_DEVICE_MODEL,
-    DP_FAULT,
-    DP_FAN_SPEED,
-    DP_FILTER_HEALTH,
-    DP_RESET_FILTER,
-    DP_SENSOR_HEALTH,
-    DP_SIDE_BRUSH_HEALTH,
-    DP_SWEEP_OR_MOP,
-    DP_WATER_SPEED,
+    DEFAULT_SCAN_INTERVAL_SECONDS,
+    DEFAULT_SCAN_INTERVAL_CHARGING_SECONDS,
+    DEFAULT_SCAN_INTERVAL_STANDBY_SECONDS,
+    DEFAULT_SCAN_INTERVAL_DOCKED_FULL_SECONDS,
+    DP_HISTORY_SIZE,
+    FAST_LANE_DPS,
+    FULL_POLL_EVERY,
+    OPTIMISTIC_TIMEOUT,
+    PARTIAL_FAILURE_LIMIT,
+    PROTOCOL_VERSIONS,
+    PUSH_FALLBACK_SCAN_INTERVAL,
+    REDISCOVERY_MIN_INTERVAL,
+    STATE_CHARGING,
+    STATES_STANDBY,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
+# stage timer while nothing is being profiled
+_NO_STAGE = nullcontext()
+
+# changes published next to the decoded fields (see changed_fields): whether
+# the robot is up / takes commands, and the offline command buffer
+FIELD_AVAILABLE = "available"
+FIELD_BUFFER = "buffered_commands"
+# restored at startup, not confirmed by the robot yet
+FIELD_STALE = "stale"
+EVERYTHING = ALL_FIELDS | {FIELD_AVAILABLE, FIELD_BUFFER, FIELD_STALE}
+
 
 @dataclass
-class ProscenicState:
-    raw_dps: dict[str, Any]
-    battery: Optional[int] = None
-    fault: Optional[int] = None
-    current_state: Optional[int] = None
-    fan_speed: Optional[str] = None
-    water_speed: Optional[str] = None
-    clean_area: Optional[float] = None
-    clean_time: Optional[int] = None
-    mop_equipped: Optional[bool] = None
-    device_model: Optional[str] = None
-    sensor_health: Optional[int] = None
-    filter_health: Optional[int] = None
-    side_brush_health: Optional[int] = None
-    brush_health: Optional[int] = None
-    reset_filter: Optional[Any] = None
+class PollIntervals:
+    """Polling interval per robot activity."""
+
+    active: timedelta = timedelta(seconds=DEFAULT_SCAN_INTERVAL_SECONDS)
+    charging: timedelta = timedelta(seconds=DEFAULT_SCAN_INTERVAL_CHARGING_SECONDS)
+    standby: timedelta = timedelta(seconds=DEFAULT_SCAN_INTERVAL_STANDBY_SECONDS)
+    docked_full: timedelta = timedelta(seconds=DEFAULT_SCAN_INTERVAL_DOCKED_FULL_SECONDS)
+
+    def for_state(self, st: Optional[ProscenicState]) -> timedelta:
+        # unknown state or an active fault: keep a close eye on it
+        if st is None or st.current_state is None or st.fault:
+            return self.active
+        if st.current_state == STATE_CHARGING:
+            if st.battery is not None and st.battery >= 100:
+                return self.docked_full
+            return self.charging
+        if st.current_state in STATES_STANDBY:
+            return self.standby
+        return self.active
+
+    @staticmethod
+    def is_active(st: Optional[ProscenicState]) -> bool:
+        """True while the robot is out cleaning or heading back."""
+        return (
+            st is not None
+            and st.current_state is not None
+            and st.current_state != STATE_CHARGING
+            and st.current_state not in STATES_STANDBY
+        )
 
 
 class ProscenicCoordinator(DataUpdateCoordinator[ProscenicState]):
     def __init__(self, hass: HomeAssistant, api: ProscenicApi) -> None:
-        super().__init__(hass=hass, logger=_LOGGER, name="proscenic")
+        super().__init__(
+            hass=hass,
+            logger=_LOGGER,
+            name="proscenic",
+            update_interval=timedelta(seconds=DEFAULT_SCAN_INTERVAL_SECONDS),
+        )
         self.api = api
         self.auto_discover_ip: bool = True
+        # wait for the device to echo every write (see ProscenicApi.set_dps_acked)
+        self.ack_writes: bool = False
+        # keep commands for an unreachable robot and replay them (see ProscenicCommandQueue)
+        self.buffer_commands: bool = False
+        # shared broadcast listener; None falls back to a tinytuya scan
+        self.discovery: Optional[ProscenicDiscovery] = None
+        self.breaker = CircuitBreaker()
+        self._scan_at: Optional[float] = None
+        self._detect_at: Optional[float] = None
+        # told (host, protocol version) when the robot moved or speaks another
+        # version, to write them back into the config entry
+        self.endpoint_listener: Optional[Callable[[str, float], None]] = None
+        # polling intervals while we depend on polling alone
+        self.intervals = PollIntervals()
+        self.commands = ProscenicCommandQueue(self)
+        self._echo_waiters: list[tuple[str, Any, asyncio.Future[None]]] = []
+        # DP key -> (optimistic value, value before the write, deadline)
+        self._optimistic: dict[str, tuple[Any, Any, float]] = {}
+        self._optimistic_timer: Optional[asyncio.TimerHandle] = None
+        # fast lane: partial polls since the last full one, and whether the
+        # device answers partial queries at all
+        self._partial_polls = 0
+        self._partial_supported = True
+        # partial polls in a row that failed while a full status worked
+        self._partial_failures = 0
+        # proscenic.profile: attached for its cycles, the last finished one kept
+        self.profiler: Optional[PollProfiler] = None
+        self.last_profile: Optional[PollProfiler] = None
+        self._profile_done: Optional[asyncio.Future[None]] = None
+        # what the last listener notification changed, and what it showed
+        self.changed_fields: frozenset[str] = EVERYTHING
+        self._notified: Optional[ProscenicState] = None
+        self._notified_available: Optional[tuple[bool, bool]] = None
+        self._notified_buffered: Optional[int] = None
+        self._notified_stale: Optional[bool] = None
+        # state restored from the last run, until the first successful poll
+        self.stale = False
+        # show_raw_dps: (time.time(), source, DPs) of the last changes the device reported
+        self.dp_history: Optional[deque[tuple[float, str, dict[str, Any]]]] = None
+
+    @property
+    def push_active(self) -> bool:
+        """True when DP changes reach us as pushes (so echoes can be awaited)."""
+        return self.api.push_enabled and self.api.push_healthy
+
+    @property
+    def accepts_commands(self) -> bool:
+        """Whether command entities stay usable: the robot is up or its commands are buffered."""
+        return self.last_update_success or (self.buffer_commands and self.data is not None)
+
+    @callback
+    def async_restore(self, raw_dps: dict[str, Any]) -> None:
+        """Start from the DPs saved by the last run, marked stale until a poll succeeds."""
+        self.data = self._decode(raw_dps)
+        self.stale = True
+        self._apply_update_interval(self.data)
+
+    async def async_shutdown(self) -> None:
+        self.commands.async_shutdown()
+        if self._profile_done is not None and not self._profile_done.done():
+            # unloaded mid-profile: write what was captured
+            self._profile_done.set_result(None)
+        await super().async_shutdown()
+
+    @callback
+    def async_start_profile(self, profiler: PollProfiler) -> None:
+        """Profile the next profiler.cycles refreshes, the first one right away."""
+        self.profiler = profiler
+        self._profile_done = self.hass.loop.create_future()
+        self.hass.async_create_background_task(
+            self._async_profile(profiler), f"proscenic profile {self.api.device_id}"
+        )
+
+    async def _async_profile(self, profiler: PollProfiler) -> None:
+        await self.async_request_refresh()
+        try:
+            await self._profile_done
+        finally:
+            self.profiler = None
+        self.last_profile = profiler
+        try:
+            path = await self.hass.async_add_executor_job(profiler.write)
+        except OSError as exc:
+            _LOGGER.warning("Proscenic: cannot write profile %s: %s", profiler.path, exc)
+            return
+        _LOGGER.info("Proscenic: profile of %d cycle(s) written to %s", profiler.done, path)
+
+    def _stage(self, name: str) -> AbstractContextManager[None]:
+        return _NO_STAGE if self.profiler is None else self.profiler.stage(name)
+
+    async def _async_refresh(self, *args: Any, **kwargs: Any) -> None:
+        profiler = self.profiler
+        if profiler is None:
+            await super()._async_refresh(*args, **kwargs)
+            return
+        with profiler.cycle():
+            await super()._async_refresh(*args, **kwargs)
+        if profiler.complete and self._profile_done is not None and not self._profile_done.done():
+            self._profile_done.set_result(None)
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Notify the entities, publishing in changed_fields what changed since the last time."""
+        available = (self.last_update_success, self.accepts_commands)
+        buffered = self.commands.buffered
+        changed = changed_fields(self._notified, self.data)
+        if available != self._notified_available:
+            changed |= {FIELD_AVAILABLE}
+        if buffered != self._notified_buffered:
+            changed |= {FIELD_BUFFER}
+        if self.stale != self._notified_stale:
+            changed |= {FIELD_STALE}
+        self.changed_fields = changed
+        self._notified = self.data
+        self._notified_available = available
+        self._notified_buffered = buffered
+        self._notified_stale = self.stale
+        # the entities' state writes
+        with self._stage(STAGE_ENTITIES):
+            super().async_update_listeners()
+
+    @callback
+    def async_update_all_listeners(self) -> None:
+        """Make every entity write its state again (its options changed)."""
+        self._notified = None
+        self._notified_available = None
+        self._notified_buffered = None
+        self._notified_stale = None
+        self.async_update_listeners()
+
+    @callback
+    def async_dp_echo(self, dp: int, value: Any) -> asyncio.Future[None]:
+        """Future resolved when the device reports dp == value, pushed or read."""
+        fut: asyncio.Future[None] = self.hass.loop.create_future()
+        self._echo_waiters.append((str(dp), value, fut))
+        return fut
+
+    @callback
+    def async_apply_optimistic(self, dps: dict[int, Any]) -> None:
+        """
+        Show written DPs right away, before the device confirms them.
+
+        The values stay until the device reports the DP (a push always wins,
+        a poll wins once the deadline passed) or until the write fails.
+        """
+        if self.data is None:
+            return
+        raw = dict(self.data.raw_dps)
+        deadline = time.monotonic() + OPTIMISTIC_TIMEOUT
+        for dp, value in dps.items():
+            key = str(dp)
+            previous = self._optimistic[key][1] if key in self._optimistic else raw.get(key)
+            self._optimistic[key] = (value, previous, deadline)
+            raw[key] = value
+        if self._optimistic_timer is not None:
+            self._optimistic_timer.cancel()
+        self._optimistic_timer = self.hass.loop.call_later(OPTIMISTIC_TIMEOUT, self._async_expire_optimistic)
+        self._async_show(self._decode(raw))
+
+    @callback
+    def async_rollback_optimistic(self, dps: dict[int, Any]) -> None:
+        """Undo optimistic values of a write that did not reach the device."""
+        if self.data is None:
+            return
+        raw = dict(self.data.raw_dps)
+        for dp in dps:
+            entry = self._optimistic.pop(str(dp), None)
+            if entry is not None:
+                _restore(raw, str(dp), entry[1])
+        self._async_show(self._decode(raw))
+
+    @callback
+    def _async_expire_optimistic(self) -> None:
+        self._optimistic_timer = None
+        if self.data is None or not self._optimistic:
+            return
+        raw = dict(self.data.raw_dps)
+        now = time.monotonic()
+        for key, (_, previous, deadline) in list(self._optimistic.items()):
+            if now >= deadline:
+                # never confirmed: show what the device last reported
+                del self._optimistic[key]
+                _restore(raw, key, previous)
+        if self._optimistic:
+            self._optimistic_timer = self.hass.loop.call_later(
+                max(d for _, _, d in self._optimistic.values()) - now, self._async_expire_optimistic
+            )
+        if raw != self.data.raw_dps:
+            self._async_show(self._decode(raw))
+
+    @callback
+    def _async_show(self, st: ProscenicState) -> None:
+        """
+        Publish a state the device did not report: unlike async_set_updated_data
+        this leaves availability and the poll schedule alone.
+        """
+        self.data = st
+        self.async_update_listeners()
+
+    def _reconcile_optimistic(self, reported: dict[str, Any], raw: dict[str, Any], pushed: bool) -> None:
+        """Confirm or roll back optimistic DPs the device just reported on."""
+        now = time.monotonic()
+        for key, (value, _, deadline) in list(self._optimistic.items()):
+            if key not in reported:
+                continue
+            if pushed or reported[key] == value or now >= deadline:
+                del self._optimistic[key]
+            else:
+                # a poll that raced the write: keep showing the new value for now
+                raw[key] = value
+
+    def _apply_update_interval(self, st: Optional[ProscenicState]) -> None:
+        """
+        Pick the next poll interval from what the robot is doing, stretched to
+        a safety-net interval while the push channel is healthy.
+        """
+        if self.breaker.state == STATE_OPEN:
+            # nothing to do until the breaker lets the next probe through
+            self.update_interval = timedelta(seconds=max(1.0, self.breaker.retry_in))
+            return
+        interval = self.intervals.for_state(st)
+        if self.push_active:
+            interval = max(interval, timedelta(seconds=PUSH_FALLBACK_SCAN_INTERVAL))
+        self.update_interval = interval
+
+    @callback
+    def async_handle_push(self, dps: dict[str, Any]) -> None:
+        """Merge DPs pushed by the device and notify listeners right away."""
+        if self.data is None:
+            # nothing to merge into yet: the first poll will bring the full set
+            return
+        st = self._merge(dps, pushed=True)
+        self._apply_update_interval(st)
+        self.async_set_updated_data(st)
+        self.commands.async_device_available()
+        self._async_resolve_echoes(dps)
+
+    @callback
+    def _async_resolve_echoes(self, reported: dict[str, Any]) -> None:
+        if not self._echo_waiters:
+            return
+        for key, value, fut in self._echo_waiters:
+            if not fut.done() and key in reported and reported[key] == value:
+                fut.set_result(None)
+        self._echo_waiters = [w for w in self._echo_waiters if not w[2].done()]
+
+    @callback
+    def async_handle_push_health(self, healthy: bool) -> None:
+        """Fall back to regular polling as soon as the push channel drops."""
+        self._apply_update_interval(self.data)
+        if not healthy:
+            self.hass.async_create_task(self.async_request_refresh())
+
+    async def async_refresh_dps(self, dps: Iterable[int]) -> None:
+        """Re-read only dps and merge them into the current state."""
+        if self.data is None or not self._partial_supported:
+            await self.async_request_refresh()
+            return
+        try:
+            reported = await self.api.query_dps(dps)
+        except ProscenicApiError as exc:
+            _LOGGER.debug("Proscenic: partial refresh failed (%s), doing a full one", exc)
+            await self.async_request_refresh()
+            return
+        self.async_merge_reported(reported)
+
+    @callback
+    def async_merge_reported(self, dps: dict[str, Any]) -> None:
+        """Merge DPs the device reported outside a poll (partial read, write echo)."""
+        if self.data is None:
+            return
+        st = self._merge(dps)
+        self._apply_update_interval(st)
+        self.async_set_updated_data(st)
+        self._async_resolve_echoes(dps)
 
     async def _async_update_data(self) -> ProscenicState:
+        breaker = self.breaker
+        if not breaker.allow():
+            # open breaker: refuse without touching the network
+            self._apply_update_interval(None)
+            raise UpdateFailed(f"device unreachable, next attempt in {breaker.retry_in:.0f}s")
+        try:
+            with self.api.metrics.timed(OP_POLL):
+                st = await self._poll()
+        except UpdateFailed as err:
+            if breaker.record_failure(err):
+                _LOGGER.warning(
+                    "Proscenic: %s non raggiungibile, prossimo tentativo tra %.0fs",
+                    self.api.host,
+                    breaker.retry_in,
+                )
+                # consecutive failures do not notify listeners: the breaker entity needs it
+                self.async_update_listeners()
+            self._apply_update_interval(None)
+            raise
+        self.api.metrics.mark_success()
+        self.stale = False
+        if breaker.record_success():
+            _LOGGER.info("Proscenic: %s di nuovo raggiungibile", self.api.host)
+        self._apply_update_interval(st)
+        self.commands.async_device_available()
+        # DPs still optimistic were reported with another value
+        self._async_resolve_echoes({k: v for k, v in st.raw_dps.items() if k not in self._optimistic})
+        return st
+
+    async def _poll(self) -> ProscenicState:
         try:
             return await self._fetch_once()
+        except ProscenicDecodeError as exc:
+            # it answered, but not in the protocol version we speak
+            if await self._async_detect_version():
+                try:
+                    return await self._fetch_once()
+                except Exception as exc2:
+                    raise UpdateFailed(str(exc2)) from exc2
+            raise UpdateFailed(str(exc)) from exc
         except Exception as exc:
             # Enterprise: se abilitato, prova rediscovery IP e ritenta una volta
             if self.auto_discover_ip:
-                new_ip = await discover_ip_by_device_id(self.api.device_id, timeout_s=6)
+                new_ip = await self._async_rediscover_ip()
                 if new_ip and new_ip != self.api.host:
                     _LOGGER.warning(
                         "Proscenic: IP cambiato %s -> %s, ricostruisco il device e ritento",
@@ -67,6 +420,7 @@ class ProscenicCoordinator(DataUpdateCoordinator[ProscenicState]):
                         new_ip,
                     )
                     self.api.update_host(new_ip)
+                    self._async_endpoint_changed()
                     try:
                         return await self._fetch_once()
                     except Exception as exc2:
@@ -74,72 +428,162 @@ class ProscenicCoordinator(DataUpdateCoordinator[ProscenicState]):
 
             raise UpdateFailed(str(exc)) from exc
 
-    async def _fetch_once(self) -> ProscenicState:
-        payload = await self.api.status()
-        dps = (payload or {}).get("dps", {}) or {}
-
-        def get(dp: int) -> Any:
-            return dps.get(str(dp))
+    async def _async_rediscover_ip(self) -> Optional[str]:
+        if self.discovery is not None and self.discovery.listening:
+            found = self.discovery.lookup(self.api.device_id)
+            return found.ip if found else None
+        # an active scan floods the LAN: at most one per REDISCOVERY_MIN_INTERVAL
+        now = time.monotonic()
+        if self._scan_at is not None and now - self._scan_at < REDISCOVERY_MIN_INTERVAL:
+            return None
+        self._scan_at = now
+        with self.api.metrics.timed(OP_DISCOVERY):
+            return await discover_ip_by_device_id(self.api.device_id, timeout_s=6)
 
-        st = ProscenicState(raw_dps=dps)
+    async def _async_detect_version(self) -> bool:
+        """Probe the protocol versions; True if the poll is worth retrying."""
+        # a probe tries every version in turn: at most one per REDISCOVERY_MIN_INTERVAL
+        now = time.monotonic()
+        if self._detect_at is not None and now - self._detect_at < REDISCOVERY_MIN_INTERVAL:
+            return False
+        self._detect_at = now
+        try:
+            version = await self.api.detect_protocol_version()
+        except (ProscenicApiError, TimeoutError) as exc:
+            _LOGGER.debug("Proscenic: protocol version probe failed: %s", exc)
+            return False
+        if version is None:
+            _LOGGER.warning(
+                "Proscenic: %s non risponde in nessuna versione del protocollo, local key errata?",
+                self.api.host,
+            )
+            return False
+        return self._async_use_version(version)
 
-        v = get(DP_BATTERY)
-        if v is not None:
-            st.battery = int(v)
+    @callback
+    def _async_use_version(self, version: float) -> bool:
+        """Speak version from now on; False if the entry has to be reloaded for it."""
+        if version == self.api.protocol_version:
+            return True
+        _LOGGER.warning("Proscenic: %s usa il protocollo %s (non %s)", self.api.host, version, self.api.protocol_version)
+        in_place = self.api.set_protocol_version(version)
+        self._async_endpoint_changed(version)
+        return in_place
 
-        v = get(DP_FAULT)
-        if v is not None:
-            st.fault = int(v)
+    @callback
+    def _async_endpoint_changed(self, version: Optional[float] = None) -> None:
+        if self.endpoint_listener is not None:
+            self.endpoint_listener(self.api.host, self.api.protocol_version if version is None else version)
 
-        v = get(DP_CURRENT_STATE)
-        if v is not None:
-            st.current_state = int(v)
+    @callback
+    def async_handle_announce(self, device: DiscoveredDevice) -> None:
+        """Follow the device to a new IP or protocol version as soon as it announces one."""
+        version = _announced_version(device.version)
+        if version is not None and version != self.api.protocol_version:
+            if not self._async_use_version(version):
+                return
+            self.hass.async_create_task(self.async_request_refresh())
+        if not self.auto_discover_ip or device.ip == self.api.host:
+            # it is on the LAN, at the address we know
+            self.commands.async_device_available()
+            return
+        _LOGGER.warning("Proscenic: IP cambiato %s -> %s (annunciato dal device)", self.api.host, device.ip)
+        self.api.update_host(device.ip)
+        self._async_endpoint_changed()
+        self.hass.async_create_task(self.async_request_refresh())
 
-        v = get(DP_FAN_SPEED)
-        if v is not None:
-            st.fan_speed = str(v)
+    async def _fetch_once(self) -> ProscenicState:
+        partial_failed = False
+        if (
+            self._partial_supported
+            and self._partial_polls < FULL_POLL_EVERY - 1
+            and PollIntervals.is_active(self.data)
+        ):
+            # while cleaning only state, battery and progress move
+            try:
+                with self._stage(STAGE_FETCH):
+                    dps = await self.api.query_dps(FAST_LANE_DPS)
+            except ProscenicApiError as exc:
+                _LOGGER.debug("Proscenic: partial poll failed (%s), falling back to status", exc)
+                partial_failed = True
+            else:
+                self._partial_polls += 1
+                self._partial_failures = 0
+                return self._merge(dps)
 
-        v = get(DP_WATER_SPEED)
-        if v is not None:
-            st.water_speed = str(v)
+        with self._stage(STAGE_FETCH):
+            payload = await self.api.status()
+        if partial_failed:
+            # the device answers a full query but not UPDATEDPS: after a few
+            # in a row (a lost packet is not enough), stop asking
+            self._partial_failures += 1
+            if self._partial_failures >= PARTIAL_FAILURE_LIMIT:
+                _LOGGER.info("Proscenic: device does not support partial DP queries, polling full status")
+                self._partial_supported = False
+        self._partial_polls = 0
+        dps = (payload or {}).get("dps", {}) or {}
+        return self._merge(dps, full=True)
 
-        v = get(DP_CLEAN_AREA)
-        if v is not None:
-            try:
-                st.clean_area = float(v) / 10.0
-            except Exception:
-                st.clean_area = None
+    def set_dp_capture(self, enabled: bool) -> None:
+        """Start (keeping what was captured) or stop keeping the DP changes."""
+        if not enabled:
+            self.dp_history = None
+        elif self.dp_history is None:
+            self.dp_history = deque(maxlen=DP_HISTORY_SIZE)
 
-        v = get(DP_CLEAN_TIME)
-        if v is not None:
-            st.clean_time = int(v) * 60
+    def dp_history_as_list(self) -> list[dict[str, Any]]:
+        return [
+            {"time": datetime.fromtimestamp(t, timezone.utc).isoformat(), "source": source, "dps": dps}
+            for t, source, dps in self.dp_history or ()
+        ]
 
-        v = get(DP_SWEEP_OR_MOP)
-        if v is not None:
-            st.mop_equipped = (str(v) != "sweep")
+    def _capture(self, dps: dict[str, Any], pushed: bool) -> None:
+        prev = self.data.raw_dps if self.data is not None else {}
+        delta = {k: v for k, v in dps.items() if k not in prev or prev[k] != v}
+        if delta:
+            self.dp_history.append((time.time(), "push" if pushed else "poll", delta))
 
-        v = get(DP_DEVICE_MODEL)
-        if v is not None:
-            st.device_model = str(v)
+    def _merge(self, dps: dict[str, Any], pushed: bool = False, full: bool = False) -> ProscenicState:
+        """
+        Build a new state from the raw DPs of a full status poll (full), or
+        from the previous raw DPs updated with dps.
 
-        v = get(DP_SENSOR_HEALTH)
-        if v is not None:
-            st.sensor_health = int(v)
+        Pushed frames and partial queries only carry some DPs, so they are
+        merged; a full poll replaces the raw DPs, dropping any the robot no
+        longer reports.
+        """
+        if self.dp_history is not None:
+            self._capture(dps, pushed)
+        raw = dict(dps) if full else dps
+        if self.data is not None:
+            prev = self.data.raw_dps
+            if not self._optimistic and (
+                dps == prev if full else all(k in prev and prev[k] == v for k, v in dps.items())
+            ):
+                # nothing new (the usual poll of an idle robot)
+                return self.data
+            if not full:
+                raw = {**prev, **dps}
+        if self._optimistic:
+            self._reconcile_optimistic(dps, raw, pushed)
+        return self._decode(raw)
 
-        v = get(DP_FILTER_HEALTH)
-        if v is not None:
-            st.filter_health = int(v)
+    def _decode(self, raw: dict[str, Any]) -> ProscenicState:
+        # only DPs that differ from the current state get decoded again
+        with self._stage(STAGE_DECODE):
+            return decode_dps(raw, self.data)
 
-        v = get(DP_SIDE_BRUSH_HEALTH)
-        if v is not None:
-            st.side_brush_health = int(v)
 
-        v = get(DP_BRUSH_HEALTH)
-        if v is not None:
-            st.brush_health = int(v)
+def _announced_version(version: Optional[str]) -> Optional[float]:
+    try:
+        parsed = float(version) if version else None
+    except ValueError:
+        return None
+    return parsed if parsed in PROTOCOL_VERSIONS else None
 
-        v = get(DP_RESET_FILTER)
-        if v is not None:
-            st.reset_filter = v
 
-        return st
\ No newline at end of file
+def _restore(raw: dict[str, Any], key: str, value: Any) -> None:
+    if value is None:
+        raw.pop(key, None)
+    else:
+        raw[key] = value
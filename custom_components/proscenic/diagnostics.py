@@ -1,12 +1,13 @@
 from __future__ import annotations
 
+from dataclasses import asdict
 from typing import Any
 
 from homeassistant.components.diagnostics import async_redact_data
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
 
-from .const import DOMAIN, CONF_LOCAL_KEY
+from .const import DOMAIN, CONF_LOCAL_KEY, DATA_HUB
 
 
 TO_REDACT = {CONF_LOCAL_KEY}
@@ -25,11 +26,32 @@ async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigE
         "state": None,
     }
 
+    if coordinator:
+        diag["breaker"] = coordinator.breaker.as_dict()
+        diag["stale"] = coordinator.stale
+        diag["metrics"] = coordinator.api.metrics.as_dict()
+        diag["command_buffer"] = coordinator.commands.as_dict()
+        if coordinator.dp_history is not None:
+            diag["dp_history"] = coordinator.dp_history_as_list()
+        recorder = coordinator.api.recorder
+        if recorder is not None:
+            diag["recorder"] = {"path": str(recorder.path), "frames": recorder.frames}
+        # proscenic.profile: the running one, else the last report
+        profiler = coordinator.profiler or coordinator.last_profile
+        if profiler is not None:
+            diag["profile"] = profiler.as_dict()
+
+    hub = hass.data.get(DOMAIN, {}).get(DATA_HUB)
+    if hub is not None:
+        # shared by all entries: the whole fleet, this device included
+        diag["hub"] = hub.stats()
+
     if coordinator and coordinator.data:
         diag["state"] = {
             "host": coordinator.api.host,
+            "protocol_version": coordinator.api.protocol_version,
             "device_id": coordinator.api.device_id,
-            "parsed": coordinator.data.__dict__,
+            "parsed": {k: v for k, v in asdict(coordinator.data).items() if k != "raw_dps"},
             "raw_dps": coordinator.data.raw_dps,
         }
 
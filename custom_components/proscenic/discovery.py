@@ -0,0 +1,241 @@
+"""
+LAN discovery shared by all entries.
+
+One listener per Home Assistant instance receives the UDP broadcasts Tuya
+devices send every few seconds and keeps the last announced IP/version of
+each device id. Rediscovery is then a dict lookup, and an IP change is seen
+as soon as the device announces its new address.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import socket
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+
+from .api import discover_ip_by_device_id, scan_devices
+from .const import DATA_DISCOVERY, DISCOVERY_TTL, DOMAIN
+from .tuya import BROADCAST_PORTS, decode_broadcast
+
+_LOGGER = logging.getLogger(__name__)
+
+# other Tuya integrations may listen on the same ports
+_REUSE_PORT = hasattr(socket, "SO_REUSEPORT")
+
+
+@dataclass(slots=True)
+class DiscoveredDevice:
+    device_id: str
+    ip: str
+    version: Optional[str]
+    seen_at: float
+
+
+class _BroadcastProtocol(asyncio.DatagramProtocol):
+    def __init__(self, discovery: ProscenicDiscovery) -> None:
+        self._discovery = discovery
+
+    def datagram_received(self, data: bytes, addr: tuple) -> None:
+        self._discovery._datagram_received(data, addr)
+
+    def error_received(self, exc: Exception) -> None:
+        _LOGGER.debug("Proscenic discovery socket error: %s", exc)
+
+
+class ProscenicDiscovery:
+    """Cache of device id -> last announcement, fed by the broadcast listener."""
+
+    def __init__(self, ttl: float = DISCOVERY_TTL) -> None:
+        self.ttl = ttl
+        self._devices: dict[str, DiscoveredDevice] = {}
+        self._subscribers: dict[str, list[Callable[[DiscoveredDevice], None]]] = {}
+        self._waiters: dict[str, list[asyncio.Future[Optional[DiscoveredDevice]]]] = {}
+        self._transports: list[asyncio.DatagramTransport] = []
+        # entries and config flows using it (see async_get_discovery)
+        self.users = 0
+        self._started = False
+        self._start_lock = asyncio.Lock()
+
+    @property
+    def listening(self) -> bool:
+        return bool(self._transports)
+
+    async def async_start(self, ports: tuple[int, ...] = BROADCAST_PORTS, host: str = "0.0.0.0") -> None:
+        """Bind the broadcast ports; callers arriving meanwhile wait for the first start."""
+        async with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+            await self._async_bind(ports, host)
+
+    async def _async_bind(self, ports: tuple[int, ...], host: str) -> None:
+        loop = asyncio.get_running_loop()
+        for port in ports:
+            try:
+                transport, _ = await loop.create_datagram_endpoint(
+                    lambda: _BroadcastProtocol(self),
+                    local_addr=(host, port),
+                    reuse_port=_REUSE_PORT,
+                    allow_broadcast=True,
+                )
+            except OSError as exc:
+                _LOGGER.warning("Proscenic: cannot listen for Tuya broadcasts on UDP %s: %s", port, exc)
+                continue
+            self._transports.append(transport)  # type: ignore[arg-type]
+
+    @callback
+    def async_stop(self) -> None:
+        self._started = False
+        transports, self._transports = self._transports, []
+        for transport in transports:
+            transport.close()
+        for waiters in self._waiters.values():
+            for fut in waiters:
+                if not fut.done():
+                    fut.set_result(None)
+        self._waiters.clear()
+
+    def lookup(self, device_id: str) -> Optional[DiscoveredDevice]:
+        """The device's last announcement, unless older than the TTL."""
+        dev = self._devices.get(device_id)
+        if dev is not None and time.monotonic() - dev.seen_at > self.ttl:
+            del self._devices[device_id]
+            return None
+        return dev
+
+    @callback
+    def async_subscribe(self, device_id: str, cb: Callable[[DiscoveredDevice], None]) -> CALLBACK_TYPE:
+        """Call cb when the device first shows up or announces a new IP/version."""
+        self._subscribers.setdefault(device_id, []).append(cb)
+
+        @callback
+        def _unsubscribe() -> None:
+            subscribers = self._subscribers.get(device_id)
+            if subscribers and cb in subscribers:
+                subscribers.remove(cb)
+
+        return _unsubscribe
+
+    async def async_wait_for(self, device_id: str, timeout: float) -> Optional[DiscoveredDevice]:
+        """The cached announcement, or the next one within timeout."""
+        dev = self.lookup(device_id)
+        if dev is not None or not self.listening:
+            return dev
+        fut: asyncio.Future[Optional[DiscoveredDevice]] = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(device_id, []).append(fut)
+        try:
+            async with asyncio.timeout(timeout):
+                return await fut
+        except TimeoutError:
+            return None
+        finally:
+            waiters = self._waiters.get(device_id)
+            if waiters and fut in waiters:
+                waiters.remove(fut)
+
+    def _datagram_received(self, data: bytes, addr: tuple) -> None:
+        info = decode_broadcast(data)
+        if info is None:
+            return
+        device_id = str(info["gwId"])
+        ip = str(info.get("ip") or addr[0])
+        version = str(info["version"]) if info.get("version") is not None else None
+        now = time.monotonic()
+
+        dev = self._devices.get(device_id)
+        if dev is not None and dev.ip == ip and dev.version == version:
+            # the usual case: the same announcement every few seconds
+            dev.seen_at = now
+            return
+        dev = self._devices[device_id] = DiscoveredDevice(device_id, ip, version, now)
+        _LOGGER.debug("Proscenic discovery: %s at %s (protocol %s)", device_id, ip, version)
+
+        for fut in self._waiters.pop(device_id, ()):
+            if not fut.done():
+                fut.set_result(dev)
+        for cb in list(self._subscribers.get(device_id, ())):
+            cb(dev)
+
+
+async def async_get_discovery(hass: HomeAssistant) -> ProscenicDiscovery:
+    """
+    The integration-wide discovery listener, started on first use and
+    listening once this returns. Every call is paired with an
+    async_release_discovery.
+    """
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    discovery: Optional[ProscenicDiscovery] = domain_data.get(DATA_DISCOVERY)
+    if discovery is None:
+        discovery = domain_data[DATA_DISCOVERY] = ProscenicDiscovery()
+        started = discovery
+
+        @callback
+        def _stop(_: Event) -> None:
+            started.async_stop()
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _stop)
+    discovery.users += 1
+    try:
+        await discovery.async_start()
+    except BaseException:
+        async_release_discovery(hass)
+        raise
+    return discovery
+
+
+@callback
+def async_release_discovery(hass: HomeAssistant) -> None:
+    """Stop the listener once its last user (entry or config flow) let go of it."""
+    domain_data = hass.data.get(DOMAIN, {})
+    discovery: Optional[ProscenicDiscovery] = domain_data.get(DATA_DISCOVERY)
+    if discovery is None:
+        return
+    discovery.users -= 1
+    if discovery.users <= 0:
+        domain_data.pop(DATA_DISCOVERY)
+        discovery.async_stop()
+
+
+async def async_discover_ip(hass: HomeAssistant, device_id: str, timeout: float) -> Optional[str]:
+    """
+    IP of device_id from the shared listener (waiting for its next broadcast
+    if needed); falls back to a tinytuya scan when the ports are unavailable.
+    """
+    discovery = await async_get_discovery(hass)
+    try:
+        if not discovery.listening:
+            return await discover_ip_by_device_id(device_id, timeout_s=int(timeout))
+        dev = await discovery.async_wait_for(device_id, timeout)
+        return dev.ip if dev else None
+    finally:
+        async_release_discovery(hass)
+
+
+async def async_discover_devices(
+    hass: HomeAssistant, device_ids: Iterable[str], timeout: float
+) -> dict[str, DiscoveredDevice]:
+    """
+    The devices of device_ids found on the LAN within timeout, in one go: the
+    shared listener waits for all of them at once, the fallback is one scan.
+    """
+    wanted = set(device_ids)
+    discovery = await async_get_discovery(hass)
+    try:
+        if not discovery.listening:
+            now = time.monotonic()
+            return {
+                device_id: DiscoveredDevice(device_id, ip, version, now)
+                for device_id, (ip, version) in (await scan_devices(int(timeout))).items()
+                if device_id in wanted
+            }
+        ordered = sorted(wanted)
+        found = await asyncio.gather(*(discovery.async_wait_for(device_id, timeout) for device_id in ordered))
+        return {device_id: dev for device_id, dev in zip(ordered, found) if dev is not None}
+    finally:
+        async_release_discovery(hass)
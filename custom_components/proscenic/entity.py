@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from typing import Any, Optional
+
+from homeassistant.core import callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .api import ProscenicAckError
+from .coordinator import ProscenicCoordinator
+
+
+class ProscenicEntity(CoordinatorEntity[ProscenicCoordinator]):
+    """
+    Coordinator entity that only writes state when something it shows changed.
+
+    _depends_on lists the fields the entity is built from: ProscenicState
+    fields, FIELD_RAW_DPS, and the coordinator's FIELD_AVAILABLE and
+    FIELD_BUFFER. Updates that change none of them (see
+    ProscenicCoordinator.changed_fields) are skipped without recomputing
+    anything; None means every update. Attributes come from
+    _build_attributes and are kept until the next state write.
+    """
+
+    _depends_on: Optional[frozenset[str]] = None
+
+    def __init__(self, coordinator: ProscenicCoordinator) -> None:
+        super().__init__(coordinator)
+        self._attributes: Optional[dict[str, Any]] = None
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        depends_on = self._depends_on
+        if depends_on is not None and depends_on.isdisjoint(self.coordinator.changed_fields):
+            return
+        self._attributes = None
+        super()._handle_coordinator_update()
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        if self._attributes is None:
+            self._attributes = self._build_attributes()
+        return self._attributes
+
+    def _build_attributes(self) -> dict[str, Any]:
+        return {}
+
+    async def _async_write(self, dps: dict[int, Any], force: bool = False) -> None:
+        """Write DPs through the command queue (see ProscenicCommandQueue.async_write)."""
+        try:
+            await self.coordinator.commands.async_write(dps, force)
+        except ProscenicAckError as exc:
+            raise HomeAssistantError(
+                f"Proscenic {self.coordinator.api.device_id} did not confirm the command: {exc}"
+            ) from exc
@@ -0,0 +1,192 @@
+"""
+I/O runtime shared by every Proscenic entry.
+
+One bounded thread pool runs the blocking (tinytuya) device calls of all
+robots. Each device gets a lane that serializes its own calls, so a device
+holds at most one worker and waits in the pool's FIFO queue like everybody
+else: a slow robot delays itself, not the fleet, and the thread count stays
+fixed however many robots are configured.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from .const import HUB_MAX_WORKERS
+
+_T = TypeVar("_T")
+
+
+class DeviceLane:
+    """Serialized access to the hub for one device, with its call statistics."""
+
+    def __init__(self, hub: ProscenicHub, device_id: str) -> None:
+        self.hub = hub
+        self.device_id = device_id
+        self._lock = asyncio.Lock()
+        self._background: set[asyncio.Task[Any]] = set()
+        self.calls = 0
+        self.queued = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.busy_total = 0.0
+        self.pool_busy_total = 0.0
+        # calls given up at their deadline: still running / ever
+        self.abandoned = 0
+        self.abandoned_total = 0
+
+    async def run_sync(
+        self,
+        fn: Callable[..., _T],
+        *args: Any,
+        deadline: Optional[float] = None,
+        on_abandon: Optional[Callable[[], None]] = None,
+    ) -> _T:
+        """
+        Run a blocking call on the shared pool, after this device's previous calls.
+
+        deadline (seconds, waiting included) raises TimeoutError in the caller.
+        A worker thread cannot be interrupted, so if fn is still running then
+        on_abandon is called on the loop to make it fail fast (e.g. by shutting
+        its socket down), and the lane and pool slot stay taken until it returns:
+        the device's next call never overlaps the abandoned one.
+        """
+        loop = asyncio.get_running_loop()
+        expires = None if deadline is None else loop.time() + deadline
+        queued_at = time.monotonic()
+        self.queued += 1
+        try:
+            async with asyncio.timeout_at(expires):
+                await self._acquire()
+        finally:
+            self.queued -= 1
+        started = time.monotonic()
+        self._record_wait(started - queued_at)
+        try:
+            fut = loop.run_in_executor(self.hub._executor, functools.partial(fn, *args))
+        except BaseException:
+            # pool already shut down
+            self._release(started)
+            raise
+        try:
+            async with asyncio.timeout_at(expires):
+                return await asyncio.shield(fut)
+        finally:
+            if fut.done():
+                self._release(started)
+            else:
+                self.abandoned += 1
+                self.abandoned_total += 1
+                if on_abandon is not None:
+                    on_abandon()
+                fut.add_done_callback(lambda f: self._release_abandoned(f, started))
+
+    async def _acquire(self) -> None:
+        await self._lock.acquire()
+        try:
+            await self.hub._slots.acquire()
+        except BaseException:
+            self._lock.release()
+            raise
+
+    def _release(self, started: float) -> None:
+        elapsed = time.monotonic() - started
+        self.busy_total += elapsed
+        self.pool_busy_total += elapsed
+        self.hub._slots.release()
+        self._lock.release()
+
+    def _release_abandoned(self, fut: asyncio.Future[Any], started: float) -> None:
+        self.abandoned -= 1
+        if not fut.cancelled():
+            fut.exception()  # nobody awaits it any more: retrieve to keep asyncio quiet
+        self._release(started)
+
+    async def run(self, fn: Callable[..., Awaitable[_T]], *args: Any) -> _T:
+        """Serialize and account an async (non-blocking) call; no pool slot needed."""
+        queued_at = time.monotonic()
+        self.queued += 1
+        try:
+            async with self._lock:
+                started = time.monotonic()
+                self._record_wait(started - queued_at)
+                try:
+                    return await fn(*args)
+                finally:
+                    self.busy_total += time.monotonic() - started
+        finally:
+            self.queued -= 1
+
+    def run_soon(self, fn: Callable[..., Any], *args: Any) -> None:
+        """Fire-and-forget run_sync (e.g. closing a socket from a sync method)."""
+        task = asyncio.get_running_loop().create_task(self.run_sync(fn, *args))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def _record_wait(self, wait: float) -> None:
+        self.calls += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "queued": self.queued,
+            "wait_avg_ms": round(self.wait_total / self.calls * 1000, 2) if self.calls else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 2),
+            "busy_s": round(self.busy_total, 3),
+            "abandoned": self.abandoned,
+            "abandoned_total": self.abandoned_total,
+        }
+
+
+class ProscenicHub:
+    """The shared pool and the lanes of the devices using it."""
+
+    def __init__(self, max_workers: int = HUB_MAX_WORKERS) -> None:
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="proscenic_io")
+        # asyncio.Semaphore wakes waiters in FIFO order: with one waiter per
+        # lane this hands the pool out round-robin across devices
+        self._slots = asyncio.Semaphore(max_workers)
+        self._lanes: dict[str, DeviceLane] = {}
+        self._started_at = time.monotonic()
+
+    def lane(self, device_id: str) -> DeviceLane:
+        lane = self._lanes.get(device_id)
+        if lane is None:
+            lane = self._lanes[device_id] = DeviceLane(self, device_id)
+        return lane
+
+    def release_lane(self, device_id: str) -> None:
+        self._lanes.pop(device_id, None)
+
+    @property
+    def devices(self) -> int:
+        return len(self._lanes)
+
+    def stats(self) -> dict[str, Any]:
+        """Fleet-wide view: pool usage plus per-device lane statistics."""
+        lanes = {device_id: lane.stats() for device_id, lane in self._lanes.items()}
+        uptime = max(time.monotonic() - self._started_at, 1e-9)
+        busy = sum(lane.pool_busy_total for lane in self._lanes.values())
+        calls = sum(lane.calls for lane in self._lanes.values())
+        return {
+            "devices": len(lanes),
+            "max_workers": self.max_workers,
+            "calls": calls,
+            "queued": sum(lane.queued for lane in self._lanes.values()),
+            # workers still blocked in calls their caller gave up on
+            "abandoned": sum(lane.abandoned for lane in self._lanes.values()),
+            "wait_max_ms": max((s["wait_max_ms"] for s in lanes.values()), default=0.0),
+            # share of the pool's capacity spent in blocking calls since start
+            "utilization": round(busy / (uptime * self.max_workers), 4),
+            "lanes": lanes,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,146 @@
+"""
+Bulk import of the robots listed in a devices.json export.
+
+tinytuya's wizard (devices.json) and tuya-uncover both export the devices
+of a Tuya account with their local keys, in slightly different shapes.
+devices_from_export picks out the Proscenic robots; the caller locates
+them with one LAN scan, and async_verify then checks every local key at
+once with a status probe per robot (at most IMPORT_CONCURRENCY at a time,
+each within PROBE_DEADLINE, on the lanes of a private hub), which also
+finds the protocol version the robot speaks.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+from .api import PROBE_DEADLINE, ProscenicApiError, ProscenicConfig, probe_versions
+from .hub import ProscenicHub
+from .const import (
+    IMPORT_CONCURRENCY,
+    IMPORT_INVALID_KEY,
+    IMPORT_NOT_FOUND,
+    IMPORT_OK,
+    IMPORT_UNREACHABLE,
+    MANUFACTURER,
+    PROTOCOL_VERSIONS,
+)
+
+# Tuya category of robot vacuums
+_CATEGORY_ROBOT_VACUUM = "sd"
+
+
+@dataclass(slots=True)
+class ImportedDevice:
+    device_id: str
+    local_key: str
+    name: str
+    host: Optional[str] = None
+    # exported or announced version, probed first; the one that answered after async_verify
+    version: Optional[float] = None
+    # IMPORT_* once verified
+    result: Optional[str] = None
+
+
+def parse_export(text: str) -> list[dict[str, Any]]:
+    """The device records of a devices.json export; ValueError if it is not one."""
+    data = json.loads(text)
+    if isinstance(data, dict):
+        # tuya-uncover and the cloud API wrap the list
+        data = data.get("devices", data.get("result"))
+    if not isinstance(data, list):
+        raise ValueError("not a list of devices")
+    return [record for record in data if isinstance(record, dict)]
+
+
+def _field(record: dict[str, Any], *names: str) -> Optional[str]:
+    for name in names:
+        value = record.get(name)
+        if value not in (None, ""):
+            return str(value)
+    return None
+
+
+def _version(value: Optional[str]) -> Optional[float]:
+    try:
+        version = float(value) if value else None
+    except ValueError:
+        return None
+    return version if version in PROTOCOL_VERSIONS else None
+
+
+def is_proscenic(record: dict[str, Any]) -> bool:
+    """A Proscenic product, or a robot vacuum (what the Proscenic app exports)."""
+    brand = MANUFACTURER.lower()
+    for name in ("product_name", "productName", "model", "name"):
+        if brand in str(record.get(name) or "").lower():
+            return True
+    return record.get("category") == _CATEGORY_ROBOT_VACUUM
+
+
+def devices_from_export(records: Iterable[dict[str, Any]]) -> list[ImportedDevice]:
+    """The Proscenic robots of an export, once each; records without a local key are skipped."""
+    devices: dict[str, ImportedDevice] = {}
+    for record in records:
+        device_id = _field(record, "id", "devId", "gwId", "device_id")
+        local_key = _field(record, "key", "local_key", "localKey")
+        if not device_id or not local_key or device_id in devices or not is_proscenic(record):
+            continue
+        devices[device_id] = ImportedDevice(
+            device_id,
+            local_key,
+            _field(record, "name", "product_name", "productName") or MANUFACTURER,
+            # last known address, if the export has one: the LAN scan comes first
+            host=_field(record, "ip"),
+            version=_version(_field(record, "version", "ver")),
+        )
+    return list(devices.values())
+
+
+def set_announced(device: ImportedDevice, host: str, version: Optional[str]) -> None:
+    device.host = host
+    device.version = _version(version) or device.version
+
+
+async def async_verify(
+    devices: Iterable[ImportedDevice], concurrency: int = IMPORT_CONCURRENCY, deadline: float = PROBE_DEADLINE
+) -> None:
+    """
+    Probe every device's key and protocol version at once; sets result (and
+    version). A probe still running at deadline counts as unreachable.
+    """
+    # robots being set up are not on the shared hub yet; the semaphore starts
+    # each deadline once the probe gets a worker
+    hub = ProscenicHub(max_workers=concurrency)
+    limit = asyncio.Semaphore(concurrency)
+
+    async def verify(device: ImportedDevice) -> None:
+        if not device.host:
+            device.result = IMPORT_NOT_FOUND
+            return
+        versions = PROTOCOL_VERSIONS
+        if device.version is not None:
+            versions = (device.version, *(v for v in PROTOCOL_VERSIONS if v != device.version))
+        cfg = ProscenicConfig(device.device_id, device.local_key, device.host)
+        async with limit:
+            try:
+                version = await hub.lane(device.device_id).run_sync(
+                    probe_versions, cfg, versions, deadline=deadline
+                )
+            except (ProscenicApiError, TimeoutError):
+                device.result = IMPORT_UNREACHABLE
+                return
+        if version is None:
+            device.result = IMPORT_INVALID_KEY
+        else:
+            device.version = version
+            device.result = IMPORT_OK
+
+    try:
+        await asyncio.gather(*(verify(device) for device in devices))
+    finally:
+        # probes abandoned at their deadline end on their own socket timeouts
+        hub.shutdown()
@@ -0,0 +1,134 @@
+"""
+Per-device operation metrics.
+
+Durations are kept in fixed-size rolling windows (recent behaviour is what
+matters for a degrading link), counters are totals since setup. Recording
+is a deque append, percentiles are only computed when read (diagnostics,
+sensors).
+"""
+
+from __future__ import annotations
+
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+from .const import METRICS_WINDOW
+
+# operations timed by the API and coordinator
+OP_CONNECT = "connect"
+OP_STATUS = "status"
+OP_QUERY = "query_dps"
+OP_SET_DPS = "set_dps"
+OP_POLL = "poll"
+OP_DISCOVERY = "discovery"
+# set_dps until the device echoed the values, retries included
+OP_ACK = "ack_write"
+# push channel and teardown: budgeted and counted, not timed
+OP_RECEIVE = "receive"
+OP_HEARTBEAT = "heartbeat"
+OP_CLOSE = "close"
+
+# counters
+COUNT_TIMEOUT = "timeouts"
+COUNT_RETRY = "retries"
+COUNT_ERROR = "errors"
+# calls given up at their deadline
+COUNT_ABANDONED = "abandoned"
+
+
+class RollingStats:
+    """The last `size` durations of one operation, plus all-time totals."""
+
+    __slots__ = ("_samples", "count", "total", "max")
+
+    def __init__(self, size: int = METRICS_WINDOW) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+    def as_dict(self) -> dict[str, Any]:
+        def ms(v: Optional[float]) -> Optional[float]:
+            return None if v is None else round(v * 1000, 1)
+
+        return {
+            "count": self.count,
+            "window": len(self._samples),
+            "p50_ms": ms(self.percentile(0.5)),
+            "p90_ms": ms(self.percentile(0.9)),
+            "p99_ms": ms(self.percentile(0.99)),
+            "max_ms": ms(self.max) if self.count else None,
+            "mean_ms": ms(self.total / self.count) if self.count else None,
+        }
+
+
+class ProscenicMetrics:
+    """Durations and error counters of one device."""
+
+    def __init__(self) -> None:
+        self.ops: dict[str, RollingStats] = {}
+        self.counters: dict[str, int] = {}
+        self.last_success_at: Optional[float] = None  # time.time()
+
+    def record(self, op: str, seconds: float) -> None:
+        stats = self.ops.get(op)
+        if stats is None:
+            stats = self.ops[op] = RollingStats()
+        stats.add(seconds)
+
+    def count(self, name: str, op: Optional[str] = None) -> None:
+        """Bump a counter, overall and (if given) for one operation."""
+        self.counters[name] = self.counters.get(name, 0) + 1
+        if op is not None:
+            key = f"{op}.{name}"
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    @contextmanager
+    def timed(self, op: str) -> Iterator[None]:
+        """Record the duration of the block; failures are timed and counted too."""
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as exc:
+            timeout = isinstance(exc, TimeoutError) or getattr(exc, "timeout", False)
+            self.count(COUNT_TIMEOUT if timeout else COUNT_ERROR, op)
+            raise
+        finally:
+            self.record(op, time.monotonic() - start)
+
+    def mark_success(self) -> None:
+        self.last_success_at = time.time()
+
+    @property
+    def seconds_since_success(self) -> Optional[float]:
+        if self.last_success_at is None:
+            return None
+        return max(0.0, time.time() - self.last_success_at)
+
+    def p50_ms(self, op: str) -> Optional[float]:
+        stats = self.ops.get(op)
+        value = stats.percentile(0.5) if stats else None
+        return None if value is None else round(value * 1000, 1)
+
+    def as_dict(self) -> dict[str, Any]:
+        since = self.seconds_since_success
+        return {
+            "operations": {op: stats.as_dict() for op, stats in sorted(self.ops.items())},
+            "counters": dict(sorted(self.counters.items())),
+            "seconds_since_success": None if since is None else round(since, 1),
+        }
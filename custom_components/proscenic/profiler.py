@@ -0,0 +1,138 @@
+"""
+On-demand profiling of coordinator cycles (proscenic.profile service).
+
+A PollProfiler runs cProfile over the next N coordinator refreshes and
+times the stages of each one: the device I/O, merging and decoding the
+DPs, and the entity state writes. The report (stage table, then the
+functions by cumulative time) is written as text next to a .prof file
+for snakeviz / pstats. cProfile sees the whole event loop thread, so
+whatever else runs while a cycle awaits the device shows up too; the
+stage table only covers this integration.
+
+While no profiler is attached the coordinator does a None check and
+nothing else.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import io
+import pstats
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+from .metrics import RollingStats
+
+# poll pipeline stages
+STAGE_CYCLE = "cycle"
+STAGE_FETCH = "fetch"
+STAGE_DECODE = "decode"
+STAGE_ENTITIES = "entities"
+
+# functions listed in the report
+REPORT_FUNCTIONS = 60
+
+
+class PollProfiler:
+    """cProfile and stage timings of the next `cycles` coordinator refreshes."""
+
+    def __init__(self, path: Path, cycles: int) -> None:
+        self.path = path
+        self.cycles = cycles
+        self.done = 0
+        # cycles another profiler (another entry, HA's profiler) held cProfile
+        self.unprofiled = 0
+        self.started = time.time()
+        self.stages: dict[str, RollingStats] = {}
+        self._profile = cProfile.Profile()
+        self._in_cycle = False
+
+    @property
+    def complete(self) -> bool:
+        return self.done >= self.cycles
+
+    @contextmanager
+    def cycle(self) -> Iterator[None]:
+        if self._in_cycle:
+            # a refresh started from inside a refresh: part of the outer one
+            yield
+            return
+        try:
+            self._profile.enable()
+            profiled = True
+        except ValueError:
+            # only one profiler can be active per thread
+            profiled = False
+            self.unprofiled += 1
+        self._in_cycle = True
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(STAGE_CYCLE, time.perf_counter() - start)
+            self._in_cycle = False
+            if profiled:
+                self._profile.disable()
+            self.done += 1
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a pipeline stage; pushes between cycles are not counted."""
+        if not self._in_cycle:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(name, time.perf_counter() - start)
+
+    def _add(self, name: str, seconds: float) -> None:
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = RollingStats()
+        stats.add(seconds)
+
+    def report(self) -> str:
+        out = io.StringIO()
+        out.write(
+            f"Proscenic profile, {self.done} cycle(s) from "
+            f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started))}"
+        )
+        if self.unprofiled:
+            out.write(f", {self.unprofiled} without cProfile (another profiler was active)")
+        out.write("\n\nstage          count   mean_ms    p90_ms    max_ms\n")
+        for name in (STAGE_CYCLE, STAGE_FETCH, STAGE_DECODE, STAGE_ENTITIES):
+            stats = self.stages.get(name)
+            if stats is None:
+                continue
+            row = stats.as_dict()
+            out.write(f"{name:<12} {row['count']:>7} {row['mean_ms']:>9} {row['p90_ms']:>9} {row['max_ms']:>9}\n")
+        out.write("\n")
+        try:
+            pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(REPORT_FUNCTIONS)
+        except TypeError:
+            # nothing was profiled
+            out.write("no cProfile data\n")
+        return out.getvalue()
+
+    def write(self) -> Path:
+        """Write the report and the raw stats next to it (blocking)."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(self.report(), encoding="utf-8")
+        try:
+            self._profile.dump_stats(self.path.with_suffix(".prof"))
+        except TypeError:
+            pass
+        return self.path
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "report": str(self.path),
+            "cycles": self.cycles,
+            "done": self.done,
+            "complete": self.complete,
+            "stages": {name: stats.as_dict() for name, stats in self.stages.items()},
+        }
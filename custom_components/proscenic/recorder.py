@@ -0,0 +1,128 @@
+"""
+Recording of a device's DP traffic.
+
+TrafficRecorder appends what the API sends and receives to a JSON-lines
+file, one compact array per frame:
+
+    [1718000000.123, "rx", "push", {"38": 1, "39": 87}]
+
+(epoch seconds, "rx"/"tx", the kind of frame and its DPs). Lines are
+buffered on the event loop and written from the executor every few
+seconds; past max_bytes the file is rotated to <name>.1, so a recording
+takes at most twice that on disk.
+
+replay.ReplayApi plays such a file back as a device.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Iterator, NamedTuple, Optional
+
+from .const import RECORDER_FLUSH_INTERVAL, RECORDER_MAX_BYTES
+
+_LOGGER = logging.getLogger(__name__)
+
+RX = "rx"
+TX = "tx"
+
+# frame kinds
+KIND_STATUS = "status"
+KIND_QUERY = "query"
+KIND_PUSH = "push"
+KIND_SET = "set"
+
+FORMAT_VERSION = 1
+
+
+class Frame(NamedTuple):
+    t: float
+    direction: str
+    kind: str
+    dps: dict[str, Any]
+
+
+class TrafficRecorder:
+    """Append-only, size-capped log of one device's DP frames."""
+
+    def __init__(
+        self,
+        path: Path,
+        device_id: str,
+        max_bytes: int = RECORDER_MAX_BYTES,
+        flush_interval: float = RECORDER_FLUSH_INTERVAL,
+    ) -> None:
+        self.path = path
+        self.device_id = device_id
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.frames = 0
+        self._lines: list[str] = []
+        self._flush_timer: Optional[asyncio.TimerHandle] = None
+        self._flush_lock = asyncio.Lock()
+        self._background: set[asyncio.Task[None]] = set()
+
+    def record(self, direction: str, kind: str, dps: dict[Any, Any]) -> None:
+        """Queue one frame; cheap enough for every poll and push."""
+        frame = [round(time.time(), 3), direction, kind, {str(k): v for k, v in dps.items()}]
+        self._lines.append(json.dumps(frame, separators=(",", ":")))
+        self.frames += 1
+        if self._flush_timer is None:
+            self._flush_timer = asyncio.get_running_loop().call_later(self.flush_interval, self._flush_soon)
+
+    def _flush_soon(self) -> None:
+        self._flush_timer = None
+        task = asyncio.get_running_loop().create_task(self.async_flush())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def async_flush(self) -> None:
+        async with self._flush_lock:
+            lines, self._lines = self._lines, []
+            if not lines:
+                return
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._write, lines)
+            except OSError as exc:
+                _LOGGER.warning("Proscenic: cannot write traffic recording %s: %s", self.path, exc)
+
+    def _write(self, lines: list[str]) -> None:
+        """Executor: append, rotating first if the file would grow past max_bytes."""
+        data = "".join(line + "\n" for line in lines).encode()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        size = self.path.stat().st_size if self.path.exists() else 0
+        if size and size + len(data) > self.max_bytes:
+            self.path.replace(self.path.with_name(self.path.name + ".1"))
+            size = 0
+        with self.path.open("ab") as f:
+            if not size:
+                header = {"v": FORMAT_VERSION, "device_id": self.device_id, "started": round(time.time(), 3)}
+                f.write((json.dumps(header, separators=(",", ":")) + "\n").encode())
+            f.write(data)
+
+    async def async_close(self) -> None:
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        await self.async_flush()
+
+
+def read_recording(path: Path) -> list[Frame]:
+    """Frames of a recording (blocking); the header and unreadable lines are skipped."""
+    return list(_iter_frames(path))
+
+
+def _iter_frames(path: Path) -> Iterator[Frame]:
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                item = json.loads(line)
+            except ValueError:
+                # a line cut short by a crash
+                continue
+            if isinstance(item, list) and len(item) == 4 and isinstance(item[3], dict):
+                yield Frame(float(item[0]), item[1], item[2], item[3])
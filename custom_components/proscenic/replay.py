@@ -0,0 +1,104 @@
+"""
+Replay backend: a traffic recording (see recorder.py) played back as the
+device, so the coordinator, the codec and the entities can be run against
+real traffic offline, at recorded or accelerated speed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from .api import ProscenicApi, ProscenicApiError, ProscenicConfig
+from .recorder import RX, Frame, read_recording
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ReplayApi(ProscenicApi):
+    """
+    A recording played back as the device.
+
+    The first received frame is the state the device starts in; every
+    received frame after it (status, query or push alike) is pushed at its
+    recorded pace divided by speed, and status() answers with everything
+    played so far. Writes are applied and echoed like the robot does, and
+    go nowhere. Recorded writes are not replayed: their effect is in the
+    frames the robot sent back.
+    """
+
+    def __init__(self, cfg: ProscenicConfig) -> None:
+        super().__init__(cfg)
+        self.speed = max(cfg.replay_speed, 1e-3)
+        self.finished = False
+        self._frames: Optional[list[Frame]] = None
+        self._load_lock = asyncio.Lock()
+        self._state: dict[str, Any] = {}
+        self._position = 0
+
+    @property
+    def host(self) -> str:
+        return "replay"
+
+    def update_host(self, host: str) -> None:
+        pass
+
+    async def detect_protocol_version(self) -> Optional[float]:
+        # a recording decodes in whatever version it was made with
+        return self._cfg.protocol_version
+
+    async def _load(self) -> list[Frame]:
+        async with self._load_lock:
+            if self._frames is None:
+                if not self._cfg.recording:
+                    raise ProscenicApiError("replay backend without a recording")
+                path = Path(self._cfg.recording)
+                try:
+                    frames = await asyncio.get_running_loop().run_in_executor(None, read_recording, path)
+                except OSError as exc:
+                    raise ProscenicApiError(f"cannot read recording {path}: {exc}") from exc
+                self._frames = [f for f in frames if f.direction == RX]
+                if self._frames:
+                    self._state = dict(self._frames[0].dps)
+                    self._position = 1
+                _LOGGER.info("Proscenic: replaying %d frames from %s at %gx", len(self._frames), path, self.speed)
+            return self._frames
+
+    async def status(self) -> dict[str, Any]:
+        await self._load()
+        return {"devId": self.device_id, "dps": dict(self._state)}
+
+    async def set_dps(self, dps: dict[int, Any]) -> None:
+        echo = {str(dp): value for dp, value in dps.items()}
+        self._state.update(echo)
+        self._emit(echo)
+
+    async def async_listen(
+        self,
+        on_dps: Callable[[dict[str, Any]], None],
+        on_health: Optional[Callable[[bool], None]] = None,
+    ) -> None:
+        """Push the recorded frames in order, then idle."""
+        self._on_dps = on_dps
+        frames = await self._load()
+        self._push_ok_at = time.monotonic()
+        if on_health is not None:
+            on_health(True)
+        while self._position < len(frames):
+            frame = frames[self._position]
+            delay = (frame.t - frames[self._position - 1].t) / self.speed
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._position += 1
+            self._state.update(frame.dps)
+            self._push_ok_at = time.monotonic()
+            self._emit(frame.dps)
+        self.finished = True
+        _LOGGER.info("Proscenic: replay of %s finished", self._cfg.recording)
+        await asyncio.Event().wait()
+
+    async def async_close(self) -> None:
+        pass
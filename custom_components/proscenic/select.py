@@ -6,10 +6,10 @@ from homeassistant.components.select import SelectEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity import EntityCategory
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import DOMAIN, MANUFACTURER, DP_WATER_SPEED
-from .coordinator import ProscenicCoordinator
+from .coordinator import FIELD_AVAILABLE, ProscenicCoordinator
+from .entity import ProscenicEntity
 
 
 WATER_SPEED_OPTIONS = ["small", "medium", "Big"]
@@ -21,18 +21,23 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_e
     async_add_entities([ProscenicWaterSpeed(entry, coordinator)], update_before_add=False)
 
 
-class ProscenicWaterSpeed(CoordinatorEntity[ProscenicCoordinator], SelectEntity):
+class ProscenicWaterSpeed(ProscenicEntity, SelectEntity):
     _attr_has_entity_name = True
     _attr_translation_key = "water_speed"
     _attr_entity_category = EntityCategory.CONFIG
     _attr_options = WATER_SPEED_OPTIONS
     _attr_icon = "mdi:water-percent"
+    _depends_on = frozenset({"water_speed", FIELD_AVAILABLE})
 
     def __init__(self, entry: ConfigEntry, coordinator: ProscenicCoordinator) -> None:
         super().__init__(coordinator)
         self._device_id = entry.data["device_id"]
         self._attr_unique_id = f"{self._device_id}_water_speed"
 
+    @property
+    def available(self) -> bool:
+        return self.coordinator.accepts_commands
+
     @property
     def current_option(self) -> Optional[str]:
         st = self.coordinator.data
@@ -41,8 +46,7 @@ class ProscenicWaterSpeed(CoordinatorEntity[ProscenicCoordinator], SelectEntity)
     async def async_select_option(self, option: str) -> None:
         if option not in self.options:
             raise ValueError(option)
-        await self.coordinator.api.set_dp(DP_WATER_SPEED, option)
-        await self.coordinator.async_request_refresh()
+        await self._async_write({DP_WATER_SPEED: option})
 
     @property
     def device_info(self) -> dict[str, Any]:
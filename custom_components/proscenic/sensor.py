@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+import json
 from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 from typing import Any, Callable
 
 from homeassistant.components.sensor import (
@@ -11,18 +13,25 @@ from homeassistant.components.sensor import (
 )
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import PERCENTAGE, UnitOfArea, UnitOfTime
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity import EntityCategory
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util import dt as dt_util
+
+from .breaker import STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN
+from .codec import FIELD_RAW_DPS
+from .entity import ProscenicEntity
+from .metrics import COUNT_TIMEOUT, OP_POLL, ProscenicMetrics
 
 from .const import DOMAIN, MANUFACTURER
-from .coordinator import ProscenicCoordinator, ProscenicState
+from .coordinator import FIELD_AVAILABLE, ProscenicCoordinator, ProscenicState
 
 
 @dataclass(frozen=True)
 class ProscenicSensorSpec:
     desc: SensorEntityDescription
     value_fn: Callable[[ProscenicState], Any]
+    # the ProscenicState fields value_fn reads
+    fields: frozenset[str]
 
 
 SPECS: tuple[ProscenicSensorSpec, ...] = (
@@ -35,6 +44,7 @@ SPECS: tuple[ProscenicSensorSpec, ...] = (
             state_class=SensorStateClass.MEASUREMENT,
         ),
         lambda st: st.battery,
+        frozenset({"battery"}),
     ),
     ProscenicSensorSpec(
         SensorEntityDescription(
@@ -45,6 +55,7 @@ SPECS: tuple[ProscenicSensorSpec, ...] = (
             suggested_display_precision=1,
         ),
         lambda st: st.clean_area,
+        frozenset({"clean_area"}),
     ),
     ProscenicSensorSpec(
         SensorEntityDescription(
@@ -55,6 +66,7 @@ SPECS: tuple[ProscenicSensorSpec, ...] = (
             suggested_display_precision=0,
         ),
         lambda st: (st.clean_time // 60) if st.clean_time is not None else None,
+        frozenset({"clean_time"}),
     ),
     ProscenicSensorSpec(
         SensorEntityDescription(
@@ -65,6 +77,7 @@ SPECS: tuple[ProscenicSensorSpec, ...] = (
             entity_category=EntityCategory.DIAGNOSTIC,
         ),
         lambda st: st.filter_health,
+        frozenset({"filter_health"}),
     ),
     ProscenicSensorSpec(
         SensorEntityDescription(
@@ -75,6 +88,7 @@ SPECS: tuple[ProscenicSensorSpec, ...] = (
             entity_category=EntityCategory.DIAGNOSTIC,
         ),
         lambda st: st.side_brush_health,
+        frozenset({"side_brush_health"}),
     ),
     ProscenicSensorSpec(
         SensorEntityDescription(
@@ -85,6 +99,7 @@ SPECS: tuple[ProscenicSensorSpec, ...] = (
             entity_category=EntityCategory.DIAGNOSTIC,
         ),
         lambda st: st.brush_health,
+        frozenset({"brush_health"}),
     ),
     ProscenicSensorSpec(
         SensorEntityDescription(
@@ -95,15 +110,70 @@ SPECS: tuple[ProscenicSensorSpec, ...] = (
             entity_category=EntityCategory.DIAGNOSTIC,
         ),
         lambda st: st.sensor_health,
+        frozenset({"sensor_health"}),
     ),
 )
 
+
+@dataclass(frozen=True)
+class ProscenicMetricSpec:
+    desc: SensorEntityDescription
+    value_fn: Callable[[ProscenicMetrics], Any]
+
+
+# link health, for alerting; disabled by default
+METRIC_SPECS: tuple[ProscenicMetricSpec, ...] = (
+    ProscenicMetricSpec(
+        SensorEntityDescription(
+            key="poll_latency",
+            translation_key="poll_latency",
+            native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+            state_class=SensorStateClass.MEASUREMENT,
+            suggested_display_precision=0,
+            entity_category=EntityCategory.DIAGNOSTIC,
+            entity_registry_enabled_default=False,
+        ),
+        lambda m: m.p50_ms(OP_POLL),
+    ),
+    ProscenicMetricSpec(
+        SensorEntityDescription(
+            key="last_successful_poll",
+            translation_key="last_successful_poll",
+            device_class=SensorDeviceClass.TIMESTAMP,
+            entity_category=EntityCategory.DIAGNOSTIC,
+            entity_registry_enabled_default=False,
+        ),
+        lambda m: datetime.fromtimestamp(m.last_success_at, tz=timezone.utc) if m.last_success_at else None,
+    ),
+    ProscenicMetricSpec(
+        SensorEntityDescription(
+            key="timeouts",
+            translation_key="timeouts",
+            state_class=SensorStateClass.TOTAL_INCREASING,
+            entity_category=EntityCategory.DIAGNOSTIC,
+            entity_registry_enabled_default=False,
+        ),
+        lambda m: m.counters.get(COUNT_TIMEOUT, 0),
+    ),
+)
+
+CONNECTION_DESC = SensorEntityDescription(
+    key="connection",
+    translation_key="connection",
+    device_class=SensorDeviceClass.ENUM,
+    options=[STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN],
+    entity_category=EntityCategory.DIAGNOSTIC,
+)
+
 RAW_DESC = SensorEntityDescription(
     key="raw_dps",
     translation_key="raw_dps",
     entity_category=EntityCategory.DIAGNOSTIC,
 )
 
+# longest state Home Assistant accepts
+MAX_STATE_LENGTH = 255
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities) -> None:
     data = hass.data[DOMAIN][entry.entry_id]
@@ -111,13 +181,34 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_e
     show_raw: bool = bool(data.get("show_raw_dps", False))
 
     entities: list[SensorEntity] = [ProscenicSensor(entry, coordinator, spec) for spec in SPECS]
+    entities.append(ProscenicConnection(entry, coordinator))
+    entities.extend(ProscenicMetricSensor(entry, coordinator, spec) for spec in METRIC_SPECS)
     if show_raw:
         entities.append(ProscenicRawDps(entry, coordinator))
 
     async_add_entities(entities, update_before_add=False)
 
+    if show_raw:
+        # one (disabled) sensor per DP, added as the robot first reports it
+        known: set[str] = set()
 
-class ProscenicBase(CoordinatorEntity[ProscenicCoordinator]):
+        @callback
+        def _async_add_dp_sensors() -> None:
+            st = coordinator.data
+            if st is None or FIELD_RAW_DPS not in coordinator.changed_fields:
+                return
+            new = st.raw_dps.keys() - known
+            if new:
+                known.update(new)
+                async_add_entities(
+                    ProscenicDpSensor(entry, coordinator, key) for key in sorted(new, key=lambda k: (len(k), k))
+                )
+
+        _async_add_dp_sensors()
+        entry.async_on_unload(coordinator.async_add_listener(_async_add_dp_sensors))
+
+
+class ProscenicBase(ProscenicEntity):
     _attr_has_entity_name = True
 
     def __init__(self, entry: ConfigEntry, coordinator: ProscenicCoordinator) -> None:
@@ -140,6 +231,7 @@ class ProscenicSensor(ProscenicBase, SensorEntity):
         super().__init__(entry, coordinator)
         self.entity_description = spec.desc
         self._spec = spec
+        self._depends_on = spec.fields | {FIELD_AVAILABLE}
         self._attr_unique_id = f"{self._device_id}_{spec.desc.key}"
 
     @property
@@ -150,9 +242,61 @@ class ProscenicSensor(ProscenicBase, SensorEntity):
         return self._spec.value_fn(st)
 
 
+class ProscenicMetricSensor(ProscenicBase, SensorEntity):
+    """Link metric; like the connection sensor it stays available offline."""
+
+    def __init__(self, entry: ConfigEntry, coordinator: ProscenicCoordinator, spec: ProscenicMetricSpec) -> None:
+        super().__init__(entry, coordinator)
+        self.entity_description = spec.desc
+        self._spec = spec
+        self._attr_unique_id = f"{self._device_id}_{spec.desc.key}"
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    @property
+    def native_value(self) -> Any:
+        return self._spec.value_fn(self.coordinator.api.metrics)
+
+
+class ProscenicConnection(ProscenicBase, SensorEntity):
+    """Circuit breaker state; stays available while the robot is not."""
+
+    entity_description = CONNECTION_DESC
+    _attr_icon = "mdi:lan-connect"
+
+    def __init__(self, entry: ConfigEntry, coordinator: ProscenicCoordinator) -> None:
+        super().__init__(entry, coordinator)
+        self._attr_unique_id = f"{self._device_id}_connection"
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    @property
+    def native_value(self) -> str:
+        return self.coordinator.breaker.state
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        breaker = self.coordinator.breaker
+        attrs: dict[str, Any] = {
+            "failures": breaker.failures,
+            "last_error": breaker.last_error,
+            "next_attempt": None,
+        }
+        if breaker.state == STATE_OPEN:
+            attrs["next_attempt"] = (dt_util.utcnow() + timedelta(seconds=breaker.retry_in)).isoformat()
+        return attrs
+
+
 class ProscenicRawDps(ProscenicBase, SensorEntity):
     entity_description = RAW_DESC
     _attr_icon = "mdi:code-json"
+    _depends_on = frozenset({FIELD_RAW_DPS, FIELD_AVAILABLE})
+    # a full copy on every change would bloat the history database
+    _unrecorded_attributes = frozenset({"dps"})
 
     def __init__(self, entry: ConfigEntry, coordinator: ProscenicCoordinator) -> None:
         super().__init__(entry, coordinator)
@@ -163,7 +307,47 @@ class ProscenicRawDps(ProscenicBase, SensorEntity):
         st = self.coordinator.data
         return "ok" if st and st.raw_dps else None
 
-    @property
-    def extra_state_attributes(self) -> dict[str, Any]:
+    def _build_attributes(self) -> dict[str, Any]:
         st = self.coordinator.data
-        return {"dps": st.raw_dps} if st else {}
\ No newline at end of file
+        return {"dps": st.raw_dps} if st else {}
+
+
+class ProscenicDpSensor(ProscenicBase, SensorEntity):
+    """
+    One raw DP, for debugging. Disabled by default, so nothing reaches the
+    history database until it is enabled; it only writes when its DP changes.
+    """
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_translation_key = "dp"
+    _attr_icon = "mdi:code-braces"
+    _depends_on = frozenset({FIELD_RAW_DPS, FIELD_AVAILABLE})
+
+    def __init__(self, entry: ConfigEntry, coordinator: ProscenicCoordinator, key: str) -> None:
+        super().__init__(entry, coordinator)
+        self._key = key
+        self._attr_translation_placeholders = {"dp": key}
+        self._attr_unique_id = f"{self._device_id}_dp_{key}"
+        self._written: Any = None
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        value = self._value()
+        if value == self._written and FIELD_AVAILABLE not in self.coordinator.changed_fields:
+            return
+        self._written = value
+        super()._handle_coordinator_update()
+
+    def _value(self) -> Any:
+        st = self.coordinator.data
+        value = st.raw_dps.get(self._key) if st else None
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value, separators=(",", ":"))
+        if isinstance(value, str):
+            value = value[:MAX_STATE_LENGTH]
+        return value
+
+    @property
+    def native_value(self) -> Any:
+        return self._value()
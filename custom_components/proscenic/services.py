@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.const import ATTR_CONFIG_ENTRY_ID, ATTR_ENTITY_ID, ENTITY_MATCH_ALL
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
+from homeassistant.exceptions import ServiceValidationError
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.service import async_extract_referenced_entity_ids
+
+from .coordinator import ProscenicCoordinator
+from .profiler import PollProfiler
+from .vacuum import FanSpeed, ProscenicVacuum
+from .const import (
+    DOMAIN,
+    SHARED_DATA_KEYS,
+    SERVICE_PROFILE,
+    SERVICE_FLEET_COMMAND,
+    SERVICE_DP_HISTORY,
+    ATTR_CYCLES,
+    ATTR_COMMAND,
+    ATTR_FAN_SPEED,
+    ATTR_MAX_CONCURRENCY,
+    ATTR_TIMEOUT,
+    DEFAULT_PROFILE_CYCLES,
+    MAX_PROFILE_CYCLES,
+    FLEET_COMMANDS,
+    DEFAULT_FLEET_CONCURRENCY,
+    MAX_FLEET_CONCURRENCY,
+    DEFAULT_FLEET_TIMEOUT,
+    FLEET_OK,
+    FLEET_BUFFERED,
+    FLEET_UNAVAILABLE,
+    FLEET_TIMEOUT,
+    FLEET_ERROR,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_CYCLES, default=DEFAULT_PROFILE_CYCLES): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=MAX_PROFILE_CYCLES)
+        ),
+    }
+)
+
+
+DP_HISTORY_SCHEMA = vol.Schema({vol.Required(ATTR_CONFIG_ENTRY_ID): cv.string})
+
+
+def _fan_speed_required(data: dict[str, Any]) -> dict[str, Any]:
+    if data[ATTR_COMMAND] == "set_fan_speed" and ATTR_FAN_SPEED not in data:
+        raise vol.Invalid(f"set_fan_speed needs {ATTR_FAN_SPEED}")
+    return data
+
+
+FLEET_COMMAND_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            # the target: all loaded robots when left out
+            **cv.ENTITY_SERVICE_FIELDS,
+            vol.Required(ATTR_COMMAND): vol.In(FLEET_COMMANDS),
+            vol.Optional(ATTR_FAN_SPEED): vol.In([f.value for f in FanSpeed]),
+            vol.Optional(ATTR_MAX_CONCURRENCY, default=DEFAULT_FLEET_CONCURRENCY): vol.All(
+                vol.Coerce(int), vol.Range(min=1, max=MAX_FLEET_CONCURRENCY)
+            ),
+            vol.Optional(ATTR_TIMEOUT, default=DEFAULT_FLEET_TIMEOUT): vol.All(
+                vol.Coerce(float), vol.Range(min=1, max=600)
+            ),
+        }
+    ),
+    _fan_speed_required,
+)
+
+
+def _coordinator(hass: HomeAssistant, entry_id: str) -> ProscenicCoordinator:
+    data = hass.data.get(DOMAIN, {}).get(entry_id) if entry_id not in SHARED_DATA_KEYS else None
+    if not data:
+        raise ServiceValidationError(f"{entry_id} is not a loaded Proscenic entry")
+    return data["coordinator"]
+
+
+def _fleet(hass: HomeAssistant, call: ServiceCall) -> dict[str, ProscenicVacuum]:
+    """Vacuum entity per targeted entity id (devices and areas resolved to their robots)."""
+    loaded: dict[str, ProscenicVacuum] = {
+        data["vacuum"].entity_id: data["vacuum"]
+        for key, data in hass.data.get(DOMAIN, {}).items()
+        if key not in SHARED_DATA_KEYS and "vacuum" in data
+    }
+    if call.data.get(ATTR_ENTITY_ID) == ENTITY_MATCH_ALL or not any(
+        key in call.data for key in cv.ENTITY_SERVICE_FIELDS
+    ):
+        return loaded
+    selected = async_extract_referenced_entity_ids(hass, call)
+    missing = selected.referenced - loaded.keys()
+    if missing:
+        raise ServiceValidationError(f"{', '.join(sorted(missing))}: not a loaded Proscenic robot")
+    targeted = selected.referenced | selected.indirectly_referenced
+    fleet = {entity_id: vacuum for entity_id, vacuum in loaded.items() if entity_id in targeted}
+    if not fleet:
+        raise ServiceValidationError("no loaded Proscenic robot among the targets")
+    return fleet
+
+
+async def _fleet_send(
+    vacuum: ProscenicVacuum,
+    command: str,
+    args: tuple[Any, ...],
+    limit: asyncio.Semaphore,
+    timeout: float,
+) -> dict[str, Any]:
+    """One robot's command, within its deadline once it got a slot."""
+    coordinator = vacuum.coordinator
+    result: dict[str, Any] = {"device_id": coordinator.api.device_id, "name": vacuum.name}
+    if not coordinator.accepts_commands:
+        result["result"] = FLEET_UNAVAILABLE
+        return result
+    async with limit:
+        start = time.monotonic()
+        buffered = coordinator.commands.buffered
+        try:
+            async with asyncio.timeout(timeout):
+                await getattr(vacuum, f"async_{command}")(*args)
+        except TimeoutError:
+            result["result"] = FLEET_TIMEOUT
+        except Exception as exc:
+            # reported per robot, the others go on
+            result["result"] = FLEET_ERROR
+            result["error"] = str(exc) or type(exc).__name__
+        else:
+            result["result"] = FLEET_BUFFERED if coordinator.commands.buffered > buffered else FLEET_OK
+        result["seconds"] = round(time.monotonic() - start, 2)
+    return result
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    async def async_profile(call: ServiceCall) -> ServiceResponse:
+        """Profile the next cycles of one robot; the report is written when they are done."""
+        coordinator = _coordinator(hass, call.data[ATTR_CONFIG_ENTRY_ID])
+        if coordinator.profiler is not None:
+            raise ServiceValidationError("a profile of this robot is already running")
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        path = Path(hass.config.path(DOMAIN, f"profile_{coordinator.api.device_id}_{stamp}.txt"))
+        profiler = PollProfiler(path, call.data[ATTR_CYCLES])
+        coordinator.async_start_profile(profiler)
+        if call.return_response:
+            return {"report": str(path), "cycles": profiler.cycles}
+        return None
+
+    async def async_fleet_command(call: ServiceCall) -> ServiceResponse:
+        """Send one command to many robots at once, each with its own deadline."""
+        fleet = _fleet(hass, call)
+        command = call.data[ATTR_COMMAND]
+        args = (call.data[ATTR_FAN_SPEED],) if command == "set_fan_speed" else ()
+        limit = asyncio.Semaphore(call.data[ATTR_MAX_CONCURRENCY])
+        results = await asyncio.gather(
+            *(_fleet_send(vacuum, command, args, limit, call.data[ATTR_TIMEOUT]) for vacuum in fleet.values())
+        )
+        by_entity = dict(zip(fleet, results))
+        failed = [r["device_id"] for r in results if r["result"] not in (FLEET_OK, FLEET_BUFFERED)]
+        if failed:
+            _LOGGER.warning("Proscenic: %s not delivered to %s", command, ", ".join(failed))
+        if call.return_response:
+            return {"results": by_entity}
+        return None
+
+    async def async_dp_history(call: ServiceCall) -> ServiceResponse:
+        """The robot's raw DPs and the changes it reported lately."""
+        coordinator = _coordinator(hass, call.data[ATTR_CONFIG_ENTRY_ID])
+        if coordinator.dp_history is None:
+            raise ServiceValidationError("turn on the show_raw_dps option to capture DP changes")
+        return {
+            "raw_dps": dict(coordinator.data.raw_dps) if coordinator.data else {},
+            "history": coordinator.dp_history_as_list(),
+        }
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_DP_HISTORY,
+        async_dp_history,
+        schema=DP_HISTORY_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_FLEET_COMMAND,
+        async_fleet_command,
+        schema=FLEET_COMMAND_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE,
+        async_profile,
+        schema=PROFILE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
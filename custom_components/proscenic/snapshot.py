@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from typing import Any, Optional, TypedDict
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .codec import FIELD_RAW_DPS
+from .coordinator import ProscenicCoordinator
+from .const import DOMAIN, SNAPSHOT_SAVE_DELAY
+
+STORAGE_VERSION = 1
+
+
+class SnapshotData(TypedDict):
+    raw_dps: dict[str, Any]
+    saved_at: str
+
+
+class ProscenicSnapshot:
+    """
+    Last known raw DPs of one robot, in .storage.
+
+    Setup restores the state from it so the entities come up before the
+    robot answered. The host is not kept here: the entry's data has the
+    one last discovered, saved right away. Saves are coalesced: at most one per
+    SNAPSHOT_SAVE_DELAY, plus the final write when Home Assistant stops.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        self._store: Store[SnapshotData] = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}")
+        self._coordinator: Optional[ProscenicCoordinator] = None
+        self._pending = False
+
+    async def async_load(self) -> Optional[SnapshotData]:
+        data = await self._store.async_load()
+        if not data or not data.get("raw_dps"):
+            return None
+        return data
+
+    @callback
+    def async_attach(self, coordinator: ProscenicCoordinator) -> CALLBACK_TYPE:
+        """Keep saving what coordinator reports; returns the unsubscribe callback."""
+        self._coordinator = coordinator
+        return coordinator.async_add_listener(self._async_changed)
+
+    @callback
+    def _async_changed(self) -> None:
+        coordinator = self._coordinator
+        assert coordinator is not None
+        if coordinator.stale or coordinator.data is None or not coordinator.last_update_success:
+            return
+        if FIELD_RAW_DPS not in coordinator.changed_fields:
+            return
+        if not self._pending:
+            self._pending = True
+            self._store.async_delay_save(self._data, SNAPSHOT_SAVE_DELAY)
+
+    def _data(self) -> SnapshotData:
+        self._pending = False
+        coordinator = self._coordinator
+        assert coordinator is not None and coordinator.data is not None
+        return {
+            "raw_dps": dict(coordinator.data.raw_dps),
+            "saved_at": dt_util.utcnow().isoformat(),
+        }
+
+    async def async_remove(self) -> None:
+        await self._store.async_remove()
@@ -0,0 +1,403 @@
+"""
+Minimal asyncio client for the Tuya LAN protocol 3.3.
+
+Only what the Proscenic vacuums need: DP query, control (one or more DPs),
+DP refresh requests, heartbeats, unsolicited status frames and the UDP
+discovery broadcasts. Framing, CRC and AES-ECB are handled here on the event
+loop, so no call blocks a thread.
+
+This module only depends on the standard library and cryptography, so the
+fake device in scripts/ can reuse the codec.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import binascii
+import hashlib
+import json
+import logging
+import struct
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+_LOGGER = logging.getLogger(__name__)
+
+TUYA_PORT = 6668
+# devices announce themselves with UDP broadcasts: plain JSON on 6666 (3.1),
+# encrypted with a well-known key on 6667 (3.3 and later)
+BROADCAST_PORTS = (6666, 6667)
+UDP_KEY = hashlib.md5(b"yGAdlopoPVldABfn").digest()
+
+PREFIX = 0x000055AA
+SUFFIX = 0x0000AA55
+_PREFIX_BIN = struct.pack(">I", PREFIX)
+_HEADER = struct.Struct(">4I")  # prefix, seq, cmd, length
+_TRAILER = struct.Struct(">2I")  # crc, suffix
+_RETCODE = struct.Struct(">I")
+
+VERSION_33 = b"3.3"
+VERSION_33_HEADER = VERSION_33 + b"\x00" * 12
+
+# command codes
+CMD_CONTROL = 0x07
+CMD_STATUS = 0x08
+CMD_HEART_BEAT = 0x09
+CMD_DP_QUERY = 0x0A
+CMD_UPDATEDPS = 0x12
+CMD_BROADCAST = 0x13
+
+# commands sent without the "3.3" version header
+_NO_VERSION_HEADER = frozenset({CMD_DP_QUERY, CMD_UPDATEDPS, CMD_HEART_BEAT})
+
+# refuse frames claiming more than this, the stream is most likely desynced
+_MAX_PAYLOAD = 64 * 1024
+
+
+class TuyaProtocolError(Exception):
+    """Raised on malformed frames, device errors or a lost connection."""
+
+
+class TuyaTimeoutError(TuyaProtocolError):
+    """The device did not answer (or accept the connection) in time."""
+
+
+class TuyaDecodeError(TuyaProtocolError):
+    """A reply that does not decrypt or parse: wrong local key or protocol version."""
+
+
+@dataclass(frozen=True)
+class TuyaFrame:
+    seq: int
+    cmd: int
+    retcode: Optional[int]
+    payload: bytes
+
+
+class TuyaCipher:
+    """AES-128-ECB with PKCS7 padding, keyed with the device local key."""
+
+    def __init__(self, key: bytes) -> None:
+        self._cipher = Cipher(algorithms.AES(key), modes.ECB())
+
+    def encrypt(self, data: bytes) -> bytes:
+        padder = padding.PKCS7(128).padder()
+        enc = self._cipher.encryptor()
+        return enc.update(padder.update(data) + padder.finalize()) + enc.finalize()
+
+    def decrypt(self, data: bytes) -> bytes:
+        dec = self._cipher.decryptor()
+        unpadder = padding.PKCS7(128).unpadder()
+        return unpadder.update(dec.update(data) + dec.finalize()) + unpadder.finalize()
+
+
+def pack_frame(seq: int, cmd: int, payload: bytes, retcode: Optional[int] = None) -> bytes:
+    """Build a 55AA frame; devices put a return code in front of the payload."""
+    if retcode is not None:
+        payload = _RETCODE.pack(retcode) + payload
+    body = _HEADER.pack(PREFIX, seq, cmd, len(payload) + _TRAILER.size) + payload
+    return body + _TRAILER.pack(binascii.crc32(body) & 0xFFFFFFFF, SUFFIX)
+
+
+class FrameReader:
+    """Reassemble frames from a TCP byte stream."""
+
+    def __init__(self, with_retcode: bool = True) -> None:
+        self._buf = bytearray()
+        self._with_retcode = with_retcode
+
+    def feed(self, data: bytes) -> list[TuyaFrame]:
+        self._buf += data
+        frames: list[TuyaFrame] = []
+        buf = self._buf
+        while True:
+            start = buf.find(_PREFIX_BIN)
+            if start < 0:
+                # keep a partial prefix that may complete with the next chunk
+                del buf[: max(0, len(buf) - len(_PREFIX_BIN) + 1)]
+                return frames
+            if start:
+                del buf[:start]
+            if len(buf) < _HEADER.size:
+                return frames
+
+            _, seq, cmd, length = _HEADER.unpack_from(buf)
+            if length < _TRAILER.size or length > _MAX_PAYLOAD:
+                # not a real header: skip this prefix and resync
+                del buf[: len(_PREFIX_BIN)]
+                continue
+            total = _HEADER.size + length
+            if len(buf) < total:
+                return frames
+
+            crc, suffix = _TRAILER.unpack_from(buf, total - _TRAILER.size)
+            body = bytes(buf[: total - _TRAILER.size])
+            del buf[:total]
+            if suffix != SUFFIX or crc != binascii.crc32(body) & 0xFFFFFFFF:
+                _LOGGER.debug("Dropping Tuya frame with bad CRC/suffix (cmd %s)", cmd)
+                continue
+
+            payload = body[_HEADER.size :]
+            retcode = None
+            if self._with_retcode and len(payload) >= _RETCODE.size:
+                (retcode,) = _RETCODE.unpack_from(payload)
+                payload = payload[_RETCODE.size :]
+            frames.append(TuyaFrame(seq, cmd, retcode, payload))
+
+
+def encode_payload(cipher: TuyaCipher, cmd: int, data: dict[str, Any]) -> bytes:
+    """JSON-encode, encrypt and (where the command wants it) add the 3.3 header."""
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    enc = cipher.encrypt(raw)
+    if cmd in _NO_VERSION_HEADER:
+        return enc
+    return VERSION_33_HEADER + enc
+
+
+def decode_payload(cipher: TuyaCipher, payload: bytes) -> Optional[dict[str, Any]]:
+    """Inverse of encode_payload. Empty payloads (plain acks) decode to None."""
+    if not payload:
+        return None
+    if payload.startswith(VERSION_33):
+        payload = payload[len(VERSION_33_HEADER) :]
+    try:
+        raw = cipher.decrypt(payload)
+    except ValueError as exc:
+        raise TuyaDecodeError(f"cannot decrypt payload ({len(payload)} bytes)") from exc
+    try:
+        return json.loads(raw)
+    except ValueError as exc:
+        raise TuyaDecodeError(f"invalid JSON payload: {raw[:64]!r}") from exc
+
+
+_UDP_CIPHER = TuyaCipher(UDP_KEY)
+
+
+def decode_broadcast(datagram: bytes) -> Optional[dict[str, Any]]:
+    """
+    Decode a discovery broadcast into its JSON ({"ip", "gwId", "version", ...}).
+
+    Returns None for anything that is not a well-formed announcement.
+    """
+    for frame in FrameReader(with_retcode=True).feed(datagram):
+        payload = frame.payload
+        try:
+            if payload.startswith(b"{"):
+                data = json.loads(payload)
+            else:
+                data = decode_payload(_UDP_CIPHER, payload)
+        except (TuyaProtocolError, ValueError):
+            return None
+        return data if isinstance(data, dict) and data.get("gwId") else None
+    return None
+
+
+def pack_broadcast(data: dict[str, Any], encrypted: bool = True) -> bytes:
+    """Build a discovery broadcast the way devices send it (used by the fake device)."""
+    payload = json.dumps(data, separators=(",", ":")).encode()
+    if encrypted:
+        payload = _UDP_CIPHER.encrypt(payload)
+    return pack_frame(0, CMD_BROADCAST, payload, retcode=0)
+
+
+class _ClientProtocol(asyncio.Protocol):
+    def __init__(self, client: TuyaClient) -> None:
+        self._client = client
+        self._reader = FrameReader(with_retcode=True)
+        self.transport: Optional[asyncio.BaseTransport] = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = transport
+
+    def data_received(self, data: bytes) -> None:
+        for frame in self._reader.feed(data):
+            self._client._frame_received(frame)
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self._client._connection_lost(self.transport, exc)
+
+
+class TuyaClient:
+    """
+    One persistent connection to a 3.3 device.
+
+    Requests are serialized and matched to replies by command code; status
+    frames the device sends on its own are handed to on_dps. The connection
+    is opened lazily and reopened by the next request after a drop.
+    """
+
+    def __init__(
+        self,
+        device_id: str,
+        local_key: str,
+        host: str,
+        port: int = TUYA_PORT,
+        on_dps: Optional[Callable[[dict[str, Any]], None]] = None,
+        timeout: float = 5.0,
+        on_connect: Optional[Callable[[float], None]] = None,
+    ) -> None:
+        self.device_id = device_id
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.on_dps = on_dps
+        # called with the seconds each new connection took
+        self.on_connect = on_connect
+        self._cipher = TuyaCipher(local_key.encode("latin1"))
+        self._seq = 1
+        self._lock = asyncio.Lock()
+        self._transport: Optional[asyncio.Transport] = None
+        self._waiters: dict[int, deque[asyncio.Future[TuyaFrame]]] = {}
+        # UPDATEDPS queries collecting the status frames that answer them
+        self._collectors: list[Callable[[dict[str, Any]], None]] = []
+        self.last_frame_at: Optional[float] = None
+
+    @property
+    def connected(self) -> bool:
+        return self._transport is not None and not self._transport.is_closing()
+
+    async def _ensure_connected(self, timeout: float) -> asyncio.Transport:
+        if self.connected:
+            return self._transport  # type: ignore[return-value]
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        try:
+            async with asyncio.timeout(timeout):
+                transport, _ = await loop.create_connection(
+                    lambda: _ClientProtocol(self), self.host, self.port
+                )
+        except TimeoutError:
+            raise TuyaTimeoutError(f"connection to {self.host} timed out") from None
+        if self.on_connect is not None:
+            self.on_connect(time.monotonic() - start)
+        self._transport = transport  # type: ignore[assignment]
+        return self._transport  # type: ignore[return-value]
+
+    def _frame_received(self, frame: TuyaFrame) -> None:
+        self.last_frame_at = time.monotonic()
+        waiters = self._waiters.get(frame.cmd)
+        while waiters:
+            fut = waiters.popleft()
+            if not fut.done():
+                fut.set_result(frame)
+                break
+
+        if frame.cmd == CMD_STATUS and (self.on_dps is not None or self._collectors):
+            try:
+                data = decode_payload(self._cipher, frame.payload)
+            except TuyaProtocolError as exc:
+                _LOGGER.debug("Ignoring undecodable status frame: %s", exc)
+                return
+            dps = (data or {}).get("dps")
+            if dps:
+                for collect in list(self._collectors):
+                    collect(dps)
+                if self.on_dps is not None:
+                    self.on_dps(dps)
+
+    def _connection_lost(self, transport: Optional[asyncio.BaseTransport], exc: Optional[Exception]) -> None:
+        if transport is not self._transport:
+            # an old connection we already replaced
+            return
+        self._transport = None
+        self._fail_waiters(TuyaProtocolError(f"connection to {self.host} lost: {exc}"))
+
+    def _fail_waiters(self, err: Exception) -> None:
+        for waiters in self._waiters.values():
+            while waiters:
+                fut = waiters.popleft()
+                if not fut.done():
+                    fut.set_exception(err)
+
+    async def _request(
+        self, cmd: int, data: dict[str, Any], timeout: Optional[float] = None
+    ) -> Optional[dict[str, Any]]:
+        """
+        Send one command and wait for the device's reply (same command code).
+
+        timeout (default: self.timeout) bounds the connect and the wait for the
+        reply separately.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        async with self._lock:
+            transport = await self._ensure_connected(timeout)
+            fut: asyncio.Future[TuyaFrame] = asyncio.get_running_loop().create_future()
+            self._waiters.setdefault(cmd, deque()).append(fut)
+            transport.write(pack_frame(self._seq, cmd, encode_payload(self._cipher, cmd, data)))
+            self._seq += 1
+            try:
+                async with asyncio.timeout(timeout):
+                    frame = await fut
+            except TimeoutError:
+                # a silent device: drop the connection so the next call starts clean
+                self.close()
+                raise TuyaTimeoutError(f"no reply from {self.host} to command {cmd:#x}") from None
+            except asyncio.CancelledError:
+                # given up by the caller: a late reply must not answer the next request
+                self.close()
+                raise
+            finally:
+                waiters = self._waiters.get(cmd)
+                if waiters and fut in waiters:
+                    waiters.remove(fut)
+
+        if frame.retcode:
+            raise TuyaProtocolError(f"device returned code {frame.retcode} for command {cmd:#x}")
+        return decode_payload(self._cipher, frame.payload)
+
+    def _stamp(self, **extra: Any) -> dict[str, Any]:
+        return {"devId": self.device_id, "uid": self.device_id, "t": str(int(time.time())), **extra}
+
+    async def status(self, timeout: Optional[float] = None) -> dict[str, Any]:
+        data = await self._request(CMD_DP_QUERY, self._stamp(gwId=self.device_id), timeout)
+        return data or {}
+
+    async def set_dps(self, dps: dict[Any, Any], timeout: Optional[float] = None) -> None:
+        """Write one or more DPs in a single CONTROL frame."""
+        await self._request(CMD_CONTROL, self._stamp(dps={str(k): v for k, v in dps.items()}), timeout)
+
+    async def update_dps(self, dps: list[int], timeout: Optional[float] = None) -> None:
+        """Ask the device to push fresh values of dps as status frames."""
+        await self._request(CMD_UPDATEDPS, {"dpId": list(dps)}, timeout)
+
+    async def query_dps(self, dps: list[int], timeout: Optional[float] = None) -> dict[str, Any]:
+        """
+        Read only dps: send UPDATEDPS and collect the status frames it triggers.
+
+        DPs the device does not report within the timeout are left out; if it
+        reports none of them a TuyaProtocolError is raised.
+        """
+        wanted = {str(dp) for dp in dps}
+        got: dict[str, Any] = {}
+        done: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+
+        def collect(frame_dps: dict[str, Any]) -> None:
+            got.update((k, v) for k, v in frame_dps.items() if k in wanted)
+            if not done.done() and wanted <= got.keys():
+                done.set_result(None)
+
+        self._collectors.append(collect)
+        try:
+            await self.update_dps(list(dps), timeout)
+            async with asyncio.timeout(self.timeout if timeout is None else timeout):
+                await done
+        except TimeoutError:
+            if not got:
+                raise TuyaTimeoutError(f"{self.host} did not report DPs {sorted(wanted)}") from None
+        finally:
+            self._collectors.remove(collect)
+        return got
+
+    async def heartbeat(self, timeout: Optional[float] = None) -> None:
+        await self._request(CMD_HEART_BEAT, {"gwId": self.device_id, "devId": self.device_id}, timeout)
+
+    def close(self) -> None:
+        transport, self._transport = self._transport, None
+        if transport is not None:
+            transport.close()
+        self._fail_waiters(TuyaProtocolError(f"connection to {self.host} closed"))
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import asyncio
+import logging
 from enum import Enum, IntFlag
 from typing import Any, Optional
 
@@ -11,7 +12,7 @@ from homeassistant.components.vacuum import (
 )
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.exceptions import HomeAssistantError
 
 from .const import (
     DOMAIN,
@@ -19,9 +20,14 @@ from .const import (
     DP_CLEANING_MODE,
     DP_DIRECTION_CONTROL,
     DP_FAN_SPEED,
-    REMEMBER_FAN_SPEED_DELAY,
+    REMEMBER_FAN_SPEED_ECHO_TIMEOUT,
 )
-from .coordinator import ProscenicCoordinator, ProscenicState
+from .api import ProscenicApiError
+from .codec import FIELD_RAW_DPS
+from .coordinator import FIELD_AVAILABLE, FIELD_BUFFER, FIELD_STALE, ProscenicCoordinator, ProscenicState
+from .entity import ProscenicEntity
+
+_LOGGER = logging.getLogger(__name__)
 
 
 class Fault(IntFlag):
@@ -109,15 +115,43 @@ SUPPORTED = (
     | VacuumEntityFeature.CLEAN_SPOT
 )
 
+# what the vacuum shows: its state and attributes (not water_speed, not the model)
+VACUUM_FIELDS = frozenset(
+    {
+        "fault",
+        "current_state",
+        "battery",
+        "fan_speed",
+        "clean_area",
+        "clean_time",
+        "mop_equipped",
+        "sensor_health",
+        "filter_health",
+        "side_brush_health",
+        "brush_health",
+        "reset_filter",
+        FIELD_AVAILABLE,
+        FIELD_BUFFER,
+        FIELD_STALE,
+    }
+)
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities) -> None:
     data = hass.data[DOMAIN][entry.entry_id]
     coordinator: ProscenicCoordinator = data["coordinator"]
-    async_add_entities([ProscenicVacuum(coordinator, entry)], update_before_add=False)
+    entity = ProscenicVacuum(coordinator, entry)
+    # proscenic.fleet_command goes through the entity, like vacuum.* services
+    data["vacuum"] = entity
+    async_add_entities([entity], update_before_add=False)
 
 
-class ProscenicVacuum(CoordinatorEntity[ProscenicCoordinator], StateVacuumEntity):
+class ProscenicVacuum(ProscenicEntity, StateVacuumEntity):
     _attr_supported_features = SUPPORTED
+    # raw_dps is shown while the show_raw_dps option is on, which can change at any time
+    _depends_on = VACUUM_FIELDS | {FIELD_RAW_DPS}
+    # show_raw_dps is for looking at, not for the history database
+    _unrecorded_attributes = frozenset({"raw_dps"})
 
     def __init__(self, coordinator: ProscenicCoordinator, entry: ConfigEntry) -> None:
         super().__init__(coordinator)
@@ -125,8 +159,6 @@ class ProscenicVacuum(CoordinatorEntity[ProscenicCoordinator], StateVacuumEntity
         self._device_id: str = entry.data["device_id"]
         self._name: str = entry.title
 
-        self._cmd_lock = asyncio.Lock()
-
         self._last_cleaning_mode: Optional[str] = None
         self._stored_fan_speed: Optional[str] = None
 
@@ -144,6 +176,11 @@ class ProscenicVacuum(CoordinatorEntity[ProscenicCoordinator], StateVacuumEntity
             "model": model,
         }
 
+    @property
+    def available(self) -> bool:
+        # with the offline buffer on, commands are still taken while the robot is away
+        return self.coordinator.accepts_commands
+
     @property
     def activity(self) -> Optional[VacuumActivity]:
         st: ProscenicState = self.coordinator.data
@@ -169,8 +206,7 @@ class ProscenicVacuum(CoordinatorEntity[ProscenicCoordinator], StateVacuumEntity
     def fan_speed_list(self) -> list[str]:
         return [f.value for f in FanSpeed]
 
-    @property
-    def extra_state_attributes(self) -> dict[str, Any]:
+    def _build_attributes(self) -> dict[str, Any]:
         st: ProscenicState = self.coordinator.data
         if not st:
             return {}
@@ -211,68 +247,85 @@ class ProscenicVacuum(CoordinatorEntity[ProscenicCoordinator], StateVacuumEntity
         if domain_data.get("show_raw_dps", False):
             attrs["raw_dps"] = st.raw_dps
 
+        if self.coordinator.commands.buffered:
+            attrs["buffered_commands"] = self.coordinator.commands.buffered
+        if self.coordinator.stale:
+            # restored at startup, the robot has not answered yet
+            attrs["stale"] = True
+
         return attrs
 
     async def async_start(self) -> None:
-        async with self._cmd_lock:
-            st: ProscenicState = self.coordinator.data
-            if st and st.current_state == CurrentState.PAUSE.value and self._last_cleaning_mode:
-                mode = self._last_cleaning_mode
-            else:
-                mode = CleaningMode.SMART.value
-                self._last_cleaning_mode = mode
-
-            await self.coordinator.api.set_dp(DP_CLEANING_MODE, mode)
-            await self._maybe_restore_fan_speed_after_mode_change()
-            await self.coordinator.async_request_refresh()
+        st: ProscenicState = self.coordinator.data
+        if st and st.current_state == CurrentState.PAUSE.value and self._last_cleaning_mode:
+            mode = self._last_cleaning_mode
+        else:
+            mode = CleaningMode.SMART.value
+            self._last_cleaning_mode = mode
+
+        await self._set_cleaning_mode(mode)
 
     async def async_pause(self) -> None:
         # Per la tua logica originale: “pause” reinvia la modalità per togglare
-        async with self._cmd_lock:
-            if self._last_cleaning_mode:
-                await self.coordinator.api.set_dp(DP_CLEANING_MODE, self._last_cleaning_mode)
-                await self.coordinator.async_request_refresh()
+        if self._last_cleaning_mode:
+            await self._async_write({DP_CLEANING_MODE: self._last_cleaning_mode})
 
     async def async_stop(self, **kwargs) -> None:
-        async with self._cmd_lock:
-            await self.coordinator.api.set_dp(DP_DIRECTION_CONTROL, DirectionControl.STOP.value)
-            self._last_cleaning_mode = None
-            await self.coordinator.async_request_refresh()
+        self._last_cleaning_mode = None
+        await self._async_write({DP_DIRECTION_CONTROL: DirectionControl.STOP.value})
 
     async def async_return_to_base(self, **kwargs) -> None:
-        async with self._cmd_lock:
-            self._last_cleaning_mode = CleaningMode.CHARGE_GO.value
-            await self.coordinator.api.set_dp(DP_CLEANING_MODE, self._last_cleaning_mode)
-            await self._maybe_restore_fan_speed_after_mode_change()
-            await self.coordinator.async_request_refresh()
+        self._last_cleaning_mode = CleaningMode.CHARGE_GO.value
+        await self._set_cleaning_mode(self._last_cleaning_mode)
 
     async def async_clean_spot(self, **kwargs) -> None:
-        async with self._cmd_lock:
-            self._last_cleaning_mode = CleaningMode.SPRIAL.value
-            await self.coordinator.api.set_dp(DP_CLEANING_MODE, self._last_cleaning_mode)
-            await self._maybe_restore_fan_speed_after_mode_change()
-            await self.coordinator.async_request_refresh()
+        self._last_cleaning_mode = CleaningMode.SPRIAL.value
+        await self._set_cleaning_mode(self._last_cleaning_mode)
 
     async def async_set_fan_speed(self, fan_speed: str, **kwargs) -> None:
-        async with self._cmd_lock:
-            # validate
-            try:
-                _ = FanSpeed(fan_speed)
-            except Exception:
-                raise ValueError(f"Fan speed non valida: {fan_speed}")
-
-            await self.coordinator.api.set_dp(DP_FAN_SPEED, fan_speed)
-            self._stored_fan_speed = fan_speed
-            await self.coordinator.async_request_refresh()
-
-    async def _maybe_restore_fan_speed_after_mode_change(self) -> None:
+        # validate
+        try:
+            _ = FanSpeed(fan_speed)
+        except Exception:
+            raise ValueError(f"Fan speed non valida: {fan_speed}")
+
+        self._stored_fan_speed = fan_speed
+        await self._async_write({DP_FAN_SPEED: fan_speed})
+
+    async def _set_cleaning_mode(self, mode: str) -> None:
+        """
+        Change cleaning mode, carrying the remembered fan speed in the same frame.
+
+        The firmware may apply its default suction once it switches mode, so
+        the fan speed is sent again once the device reported the new mode
+        (pushed, or read back by the refresh that follows an action without
+        pushes), or after REMEMBER_FAN_SPEED_ECHO_TIMEOUT. The report may come
+        before the default suction is applied, so the re-send bypasses the
+        command queue's no-op filter.
+        """
         domain_data = self.hass.data.get(DOMAIN, {}).get(self._entry.entry_id, {})
         remember = bool(domain_data.get("remember_fan_speed", False))
-        if not remember or not self._stored_fan_speed:
+        fan = self._stored_fan_speed if remember else None
+        if not fan:
+            await self._async_write({DP_CLEANING_MODE: mode})
             return
 
-        async def _job():
-            await asyncio.sleep(REMEMBER_FAN_SPEED_DELAY)
-            await self.coordinator.api.set_dp(DP_FAN_SPEED, self._stored_fan_speed)
-
-        self.hass.async_create_task(_job())
\ No newline at end of file
+        echo = self.coordinator.async_dp_echo(DP_CLEANING_MODE, mode)
+        try:
+            await self._async_write({DP_CLEANING_MODE: mode, DP_FAN_SPEED: fan})
+            try:
+                await asyncio.wait_for(echo, REMEMBER_FAN_SPEED_ECHO_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+        finally:
+            echo.cancel()
+        await self._reassert_fan_speed(fan)
+
+    async def _reassert_fan_speed(self, fan: str) -> None:
+        if self._stored_fan_speed != fan:
+            # changed in the meantime: that write wins
+            return
+        try:
+            await self._async_write({DP_FAN_SPEED: fan}, force=True)
+        except (HomeAssistantError, ProscenicApiError) as exc:
+            _LOGGER.debug("Proscenic: fan speed not re-asserted: %s", exc)
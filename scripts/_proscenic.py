@@ -0,0 +1,32 @@
+"""
+Load the integration modules that do not need Home Assistant.
+
+The transport and data modules (api, tuya, const, codec, breaker, hub,
+metrics, recorder, replay, profiler, importer) and the command queue
+(commands) import nothing from Home Assistant, so that the scripts here
+and the tests can load them; keep it that way.
+
+They are imported as submodules of a synthetic package pointing at the
+component directory: putting that directory on sys.path would let its
+select.py shadow the stdlib module, and the package keeps their relative
+imports working.
+"""
+
+from __future__ import annotations
+
+import importlib
+import sys
+from pathlib import Path
+from types import ModuleType
+
+PKG_DIR = Path(__file__).resolve().parent.parent / "custom_components" / "proscenic"
+PKG_NAME = "_proscenic_pkg"
+
+
+def load(name: str) -> ModuleType:
+    if PKG_NAME not in sys.modules:
+        # an empty package: the real __init__ needs Home Assistant
+        pkg = ModuleType(PKG_NAME)
+        pkg.__path__ = [str(PKG_DIR)]
+        sys.modules[PKG_NAME] = pkg
+    return importlib.import_module(f"{PKG_NAME}.{name}")
@@ -0,0 +1,320 @@
+"""
+Offline benchmark of the device API against simulated 850T robots.
+
+The fake devices run in a separate process (scripts/fake_device.py), so the
+CPU figures only cover the client side: ProscenicApi calls on the shared
+hub plus DP decoding, i.e. what the coordinator does per poll. Measured per
+backend:
+
+  * poll latency percentiles, throughput and CPU per poll for 1..N devices
+    polled concurrently,
+  * command-to-echo latency (set_dps until the pushed value arrives),
+  * allocations per poll (tracemalloc),
+
+plus decode cost of the DP codec. The result is JSON; with --baseline the
+run is compared against a previous result and exits with 1 on regressions.
+
+    python scripts/benchmark.py --devices 1,10,100 --output bench.json
+    python scripts/benchmark.py --baseline bench.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import threading
+import time
+import timeit
+import tracemalloc
+from pathlib import Path
+from typing import Any, Optional
+
+from _proscenic import load
+from fake_device import DEFAULT_LOCAL_KEY, default_dps
+
+api_mod = load("api")
+codec = load("codec")
+const = load("const")
+hub_mod = load("hub")
+
+FAKE_DEVICE = Path(__file__).resolve().parent / "fake_device.py"
+
+
+def _summary(samples: list[float]) -> dict[str, float]:
+    if not samples:
+        return {"n": 0}
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 3)
+
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": pct(0.50),
+        "p90_ms": pct(0.90),
+        "p99_ms": pct(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+class FakeFleet:
+    """N fake devices in a child process; yields (device_id, port) pairs."""
+
+    def __init__(self, count: int, latency: float) -> None:
+        self.count = count
+        self.latency = latency
+        self.devices: list[tuple[str, int]] = []
+        self._proc: Optional[asyncio.subprocess.Process] = None
+
+    async def __aenter__(self) -> FakeFleet:
+        self._proc = await asyncio.create_subprocess_exec(
+            sys.executable, str(FAKE_DEVICE),
+            "--count", str(self.count),
+            "--latency", str(self.latency),
+            stdout=asyncio.subprocess.PIPE,
+        )
+        assert self._proc.stdout is not None
+        for _ in range(self.count):
+            # "<device_id> <host>:<port> key=<local_key>"
+            line = (await self._proc.stdout.readline()).decode().split()
+            self.devices.append((line[0], int(line[1].rsplit(":", 1)[1])))
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        if self._proc is not None:
+            self._proc.terminate()
+            await self._proc.wait()
+
+
+def _make_apis(backend: str, devices: list[tuple[str, int]], hub: Any) -> list[Any]:
+    return [
+        api_mod.create_api(
+            api_mod.ProscenicConfig(device_id, DEFAULT_LOCAL_KEY, "127.0.0.1", backend=backend, port=port),
+            hub.lane(device_id),
+        )
+        for device_id, port in devices
+    ]
+
+
+async def _poll(api: Any, previous: Any) -> Any:
+    """One coordinator poll: status() merged into and decoded against the last state."""
+    payload = await api.status()
+    dps = (payload or {}).get("dps") or {}
+    raw = {**previous.raw_dps, **dps} if previous is not None else dps
+    return codec.decode_dps(raw, previous)
+
+
+async def bench_scaling(backend: str, count: int, polls: int, latency: float, workers: int) -> dict[str, Any]:
+    async with FakeFleet(count, latency) as fleet:
+        hub = hub_mod.ProscenicHub(max_workers=workers)
+        apis = _make_apis(backend, fleet.devices, hub)
+        states: list[Any] = [None] * count
+        samples: list[float] = []
+        try:
+            # connect and fill the state first, like the first refresh does
+            states = await asyncio.gather(*(_poll(api, None) for api in apis))
+
+            async def run(i: int) -> None:
+                for _ in range(polls):
+                    t0 = time.perf_counter()
+                    states[i] = await _poll(apis[i], states[i])
+                    samples.append(time.perf_counter() - t0)
+
+            cpu0, wall0 = time.process_time(), time.perf_counter()
+            await asyncio.gather(*(run(i) for i in range(count)))
+            cpu, wall = time.process_time() - cpu0, time.perf_counter() - wall0
+            threads = threading.active_count()
+            fleet_stats = hub.stats()
+        finally:
+            for api in apis:
+                await api.async_close()
+            hub.shutdown()
+
+    return {
+        "devices": count,
+        "latency": _summary(samples),
+        "polls_per_s": round(len(samples) / wall, 1),
+        "cpu_ms_per_poll": round(cpu / len(samples) * 1000, 4),
+        "threads": threads,
+        "hub_wait_max_ms": fleet_stats["wait_max_ms"],
+        "hub_utilization": fleet_stats["utilization"],
+    }
+
+
+async def bench_echo(backend: str, iterations: int, latency: float) -> dict[str, Any]:
+    """set_dps until the device's push of the new value reaches the listener."""
+    async with FakeFleet(1, latency) as fleet:
+        hub = hub_mod.ProscenicHub(max_workers=1)
+        (api,) = _make_apis(backend, fleet.devices, hub)
+        key = str(const.DP_FAN_SPEED)
+        expected: dict[str, Any] = {}
+        arrived = asyncio.Event()
+
+        def on_dps(dps: dict[str, Any]) -> None:
+            if key in dps and dps[key] == expected.get(key):
+                arrived.set()
+
+        await api.status()
+        listener = asyncio.create_task(api.async_listen(on_dps))
+        samples: list[float] = []
+        lost = 0
+        try:
+            # wait for the push channel, the tinytuya loop starts in retry mode
+            for _ in range(100):
+                if api.push_healthy:
+                    break
+                await asyncio.sleep(0.1)
+            for i in range(iterations):
+                value = "strong" if i % 2 else "normal"
+                expected[key] = value
+                arrived.clear()
+                t0 = time.perf_counter()
+                await api.set_dps({const.DP_FAN_SPEED: value})
+                try:
+                    async with asyncio.timeout(2):
+                        await arrived.wait()
+                except TimeoutError:
+                    lost += 1
+                    continue
+                samples.append(time.perf_counter() - t0)
+        finally:
+            listener.cancel()
+            await api.async_close()
+            hub.shutdown()
+    return {"latency": _summary(samples), "lost": lost}
+
+
+async def bench_alloc(backend: str, polls: int) -> dict[str, Any]:
+    async with FakeFleet(1, 0.0) as fleet:
+        hub = hub_mod.ProscenicHub(max_workers=1)
+        (api,) = _make_apis(backend, fleet.devices, hub)
+        try:
+            st = await _poll(api, None)
+            tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+            for _ in range(polls):
+                st = await _poll(api, st)
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        finally:
+            await api.async_close()
+            hub.shutdown()
+    stats = after.compare_to(before, "filename")
+    return {
+        "polls": polls,
+        "retained_bytes_per_poll": round(sum(s.size_diff for s in stats) / polls, 1),
+        "retained_blocks_per_poll": round(sum(s.count_diff for s in stats) / polls, 2),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def bench_codec(number: int = 20000) -> dict[str, float]:
+    raw = default_dps()
+    st = codec.decode_dps(raw)
+    changed = {**raw, str(const.DP_BATTERY): 80}
+    same = dict(raw)
+
+    def us(fn: Any) -> float:
+        return round(timeit.timeit(fn, number=number) / number * 1e6, 3)
+
+    return {
+        "full_decode_us": us(lambda: codec.decode_dps(raw)),
+        "one_dp_changed_us": us(lambda: codec.decode_dps(changed, st)),
+        "unchanged_us": us(lambda: codec.decode_dps(same, st)),
+    }
+
+
+def compare(result: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    """Metrics that got worse than baseline by more than tolerance (relative)."""
+    regressions: list[str] = []
+
+    def check(name: str, new: Optional[float], old: Optional[float]) -> None:
+        # ignore sub-0.05 ms / µs noise on tiny figures
+        if new is None or old is None or new <= 0.05:
+            return
+        if new > old * (1 + tolerance):
+            regressions.append(f"{name}: {old} -> {new}")
+
+    for key in ("full_decode_us", "one_dp_changed_us", "unchanged_us"):
+        check(f"codec.{key}", result["codec"].get(key), baseline.get("codec", {}).get(key))
+    for backend, res in result["backends"].items():
+        base = baseline.get("backends", {}).get(backend)
+        if not base:
+            continue
+        base_scaling = {row["devices"]: row for row in base.get("scaling", [])}
+        for row in res["scaling"]:
+            old = base_scaling.get(row["devices"])
+            if not old:
+                continue
+            prefix = f"{backend}.scaling[{row['devices']}]"
+            check(f"{prefix}.p50_ms", row["latency"].get("p50_ms"), old["latency"].get("p50_ms"))
+            check(f"{prefix}.p99_ms", row["latency"].get("p99_ms"), old["latency"].get("p99_ms"))
+            check(f"{prefix}.cpu_ms_per_poll", row["cpu_ms_per_poll"], old["cpu_ms_per_poll"])
+        if "echo" in res and "echo" in base:
+            check(f"{backend}.echo.p50_ms", res["echo"]["latency"].get("p50_ms"), base["echo"]["latency"].get("p50_ms"))
+        if "alloc" in res and "alloc" in base:
+            check(
+                f"{backend}.alloc.retained_bytes_per_poll",
+                res["alloc"]["retained_bytes_per_poll"],
+                base["alloc"]["retained_bytes_per_poll"],
+            )
+    return regressions
+
+
+async def _main(args: argparse.Namespace) -> int:
+    counts = [int(c) for c in args.devices.split(",")]
+    result: dict[str, Any] = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "args": vars(args),
+        },
+        "codec": bench_codec(),
+        "backends": {},
+    }
+    for backend in args.backends.split(","):
+        res: dict[str, Any] = {"scaling": []}
+        for count in counts:
+            print(f"{backend}: {count} device(s)", file=sys.stderr)
+            res["scaling"].append(await bench_scaling(backend, count, args.polls, args.latency, args.workers))
+        if args.echo_iterations:
+            res["echo"] = await bench_echo(backend, args.echo_iterations, args.latency)
+        if args.alloc_polls:
+            res["alloc"] = await bench_alloc(backend, args.alloc_polls)
+        result["backends"][backend] = res
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        regressions = compare(result, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backends", default=f"{const.BACKEND_NATIVE},{const.BACKEND_TINYTUYA}")
+    parser.add_argument("--devices", default="1,10,50,100", help="comma-separated fleet sizes")
+    parser.add_argument("--polls", type=int, default=20, help="polls per device and fleet size")
+    parser.add_argument("--echo-iterations", type=int, default=50)
+    parser.add_argument("--alloc-polls", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0, help="fake device reply delay (s)")
+    parser.add_argument("--workers", type=int, default=const.HUB_MAX_WORKERS, help="hub pool size")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    parser.add_argument("--baseline", help="previous JSON result to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
@@ -0,0 +1,211 @@
+"""
+Fake Proscenic 850T speaking Tuya protocol 3.3 on localhost.
+
+Answers DP queries, applies CONTROL writes (acking them and pushing the
+changed DPs back, like the real robot), serves UPDATEDPS refreshes and
+heartbeats, can push arbitrary DP changes on demand and announces itself
+with discovery broadcasts. With --write-loss it ignores a share of the
+CONTROL writes after acking them, like a robot on a weak Wi-Fi link.
+Used to exercise and benchmark the backends without a robot:
+
+    python scripts/fake_device.py --port 6668 --count 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from typing import Any, Optional
+
+from _proscenic import load
+
+const = load("const")
+tuya = load("tuya")
+
+DEFAULT_DEVICE_ID = "bf0123456789abcdef0000"
+DEFAULT_LOCAL_KEY = "0123456789abcdef"
+
+# DP_CLEANING_MODE value -> DP_CURRENT_STATE the robot reports once it obeys
+_MODE_TO_STATE = {
+    "smart": 1,
+    "mop": 2,
+    "wallfollow": 3,
+    "chargego": 4,
+    "sprial": 8,
+    "single": 8,
+}
+
+
+def default_dps() -> dict[str, Any]:
+    """The 850T DP set from const.py, docked and fully charged."""
+    return {
+        str(const.DP_POWER): True,
+        str(const.DP_FAULT): 0,
+        str(const.DP_CLEANING_MODE): "smart",
+        str(const.DP_DIRECTION_CONTROL): "stop",
+        str(const.DP_FAN_SPEED): "normal",
+        str(const.DP_CURRENT_STATE): 5,
+        str(const.DP_BATTERY): 100,
+        str(const.DP_CLEAN_RECORD): "",
+        str(const.DP_CLEAN_AREA): 0,
+        str(const.DP_CLEAN_TIME): 0,
+        str(const.DP_SENSOR_HEALTH): 100,
+        str(const.DP_FILTER_HEALTH): 100,
+        str(const.DP_SIDE_BRUSH_HEALTH): 100,
+        str(const.DP_BRUSH_HEALTH): 100,
+        str(const.DP_SWEEP_OR_MOP): "sweep",
+        str(const.DP_RESET_FILTER): False,
+        str(const.DP_DEVICE_MODEL): "850T",
+        str(const.DP_WATER_SPEED): "medium",
+    }
+
+
+class _DeviceProtocol(asyncio.Protocol):
+    def __init__(self, device: FakeDevice) -> None:
+        self._device = device
+        self._reader = tuya.FrameReader(with_retcode=False)
+        self.transport: Optional[asyncio.Transport] = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = transport  # type: ignore[assignment]
+        self._device.connections.add(self)
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self._device.connections.discard(self)
+
+    def data_received(self, data: bytes) -> None:
+        for frame in self._reader.feed(data):
+            if self._device.latency:
+                asyncio.get_running_loop().call_later(
+                    self._device.latency, self._device.handle, self, frame
+                )
+            else:
+                self._device.handle(self, frame)
+
+    def send(self, seq: int, cmd: int, payload: bytes) -> None:
+        if self.transport is not None and not self.transport.is_closing():
+            self.transport.write(tuya.pack_frame(seq, cmd, payload, retcode=0))
+
+
+class FakeDevice:
+    """One simulated robot listening on its own TCP port."""
+
+    def __init__(
+        self,
+        device_id: str = DEFAULT_DEVICE_ID,
+        local_key: str = DEFAULT_LOCAL_KEY,
+        dps: Optional[dict[str, Any]] = None,
+        latency: float = 0.0,
+        write_loss: float = 0.0,
+    ) -> None:
+        self.device_id = device_id
+        self.dps = default_dps() if dps is None else dps
+        self.latency = latency
+        self.write_loss = write_loss
+        self.connections: set[_DeviceProtocol] = set()
+        self.frames_received = 0
+        # DPs of every CONTROL frame received, lost ones included
+        self.writes: list[dict[str, Any]] = []
+        self._cipher = tuya.TuyaCipher(local_key.encode("latin1"))
+        self._server: Optional[asyncio.base_events.Server] = None
+        self.port = 0
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        loop = asyncio.get_running_loop()
+        self._server = await loop.create_server(lambda: _DeviceProtocol(self), host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self) -> None:
+        for conn in list(self.connections):
+            if conn.transport is not None:
+                conn.transport.close()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def _encode(self, cmd: int, data: dict[str, Any]) -> bytes:
+        return tuya.encode_payload(self._cipher, cmd, data)
+
+    def push(self, dps: dict[str, Any]) -> None:
+        """Change DPs and announce them to every client, as the robot does."""
+        self.dps.update(dps)
+        payload = self._encode(
+            tuya.CMD_STATUS, {"devId": self.device_id, "dps": dps, "t": int(time.time())}
+        )
+        for conn in list(self.connections):
+            conn.send(0, tuya.CMD_STATUS, payload)
+
+    def announcement(self, ip: str = "127.0.0.1") -> bytes:
+        """The UDP broadcast a 3.3 device sends on port 6667 every few seconds."""
+        return tuya.pack_broadcast(
+            {"ip": ip, "gwId": self.device_id, "active": 2, "ability": 0, "mode": 0,
+             "encrypt": True, "productKey": "fake", "version": "3.3"}
+        )
+
+    def handle(self, conn: _DeviceProtocol, frame: Any) -> None:
+        self.frames_received += 1
+        if frame.cmd == tuya.CMD_DP_QUERY:
+            conn.send(
+                frame.seq,
+                tuya.CMD_DP_QUERY,
+                self._encode(tuya.CMD_DP_QUERY, {"devId": self.device_id, "dps": dict(self.dps)}),
+            )
+        elif frame.cmd == tuya.CMD_HEART_BEAT:
+            conn.send(frame.seq, tuya.CMD_HEART_BEAT, b"")
+        elif frame.cmd == tuya.CMD_CONTROL:
+            data = tuya.decode_payload(self._cipher, frame.payload) or {}
+            changed = {str(k): v for k, v in (data.get("dps") or {}).items()}
+            self.writes.append(dict(changed))
+            conn.send(frame.seq, tuya.CMD_CONTROL, b"")
+            if self.write_loss and random.random() < self.write_loss:
+                return
+            mode = changed.get(str(const.DP_CLEANING_MODE))
+            if mode in _MODE_TO_STATE:
+                changed[str(const.DP_CURRENT_STATE)] = _MODE_TO_STATE[mode]
+            if changed:
+                self.push(changed)
+        elif frame.cmd == tuya.CMD_UPDATEDPS:
+            data = tuya.decode_payload(self._cipher, frame.payload) or {}
+            conn.send(frame.seq, tuya.CMD_UPDATEDPS, b"")
+            wanted = {str(dp) for dp in data.get("dpId") or ()}
+            self.push({dp: v for dp, v in self.dps.items() if dp in wanted})
+
+
+async def _main(args: argparse.Namespace) -> None:
+    devices = []
+    for i in range(args.count):
+        device_id = args.device_id if args.count == 1 else f"{args.device_id[:-4]}{i:04d}"
+        dev = FakeDevice(device_id, args.local_key, latency=args.latency, write_loss=args.write_loss)
+        port = await dev.start(args.host, args.port + i if args.port else 0)
+        print(f"{device_id} {args.host}:{port} key={args.local_key}", flush=True)
+        devices.append(dev)
+    if not args.broadcast:
+        await asyncio.Event().wait()
+
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(
+        asyncio.DatagramProtocol, local_addr=("0.0.0.0", 0), allow_broadcast=True
+    )
+    while True:
+        for dev in devices:
+            transport.sendto(dev.announcement(args.host), (args.broadcast, tuya.BROADCAST_PORTS[1]))
+        await asyncio.sleep(5)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="first port (0 = pick free ports)")
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--device-id", default=DEFAULT_DEVICE_ID)
+    parser.add_argument("--local-key", default=DEFAULT_LOCAL_KEY)
+    parser.add_argument("--latency", type=float, default=0.0, help="reply delay in seconds")
+    parser.add_argument("--write-loss", type=float, default=0.0, help="share of CONTROL writes ignored (0..1)")
+    parser.add_argument("--broadcast", metavar="ADDR", help="announce the devices to ADDR (e.g. 255.255.255.255)")
+    try:
+        asyncio.run(_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
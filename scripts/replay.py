@@ -0,0 +1,142 @@
+"""
+Decode a traffic recording offline, for codec regressions and benchmarks.
+
+The frames the robot sent (see recorder.py, "record_traffic" option) are
+merged and decoded in order, like the coordinator does on every poll and
+push. Reported: decode cost per frame and how many frames changed the
+decoded state. --dump writes the sequence of decoded changes, --expect
+compares against such a dump and exits with 1 if the decode differs, so a
+recording of a firmware quirk becomes a regression test. With --speed the
+recording is played through the replay backend instead, in real time
+divided by the speed.
+
+    python scripts/replay.py robot.jsonl --dump robot.expected.jsonl
+    python scripts/replay.py robot.jsonl --expect robot.expected.jsonl
+    python scripts/replay.py robot.jsonl --speed 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from _proscenic import load
+
+api_mod = load("api")
+codec = load("codec")
+const = load("const")
+recorder = load("recorder")
+
+
+def _changes(previous: Optional[Any], st: Any) -> dict[str, Any]:
+    return {
+        name: getattr(st, name)
+        for name in sorted(codec.STATE_FIELDS)
+        if previous is None or getattr(previous, name) != getattr(st, name)
+    }
+
+
+def decode(frames: list[Any], repeat: int) -> tuple[list[list[Any]], list[float]]:
+    """Decoded changes per state-changing frame, and decode seconds per frame (best of repeat)."""
+    changes: list[list[Any]] = []
+    best = [float("inf")] * len(frames)
+    for run in range(repeat):
+        st = None
+        for i, frame in enumerate(frames):
+            t0 = time.perf_counter()
+            raw = {**st.raw_dps, **frame.dps} if st is not None else dict(frame.dps)
+            new = codec.decode_dps(raw, st)
+            best[i] = min(best[i], time.perf_counter() - t0)
+            if run == 0:
+                diff = _changes(st, new)
+                if diff:
+                    changes.append([i, frame.kind, diff])
+            st = new
+    return changes, best
+
+
+async def play(path: Path, speed: float) -> list[list[Any]]:
+    """The recording pushed by the replay backend, decoded as it arrives."""
+    cfg = api_mod.ProscenicConfig(
+        "replay", "", "", backend=const.BACKEND_REPLAY, recording=str(path), replay_speed=speed
+    )
+    api = api_mod.create_api(cfg)
+    changes: list[list[Any]] = []
+    state: dict[str, Any] = {"st": None, "n": 0}
+
+    def on_dps(dps: dict[str, Any]) -> None:
+        st = state["st"]
+        new = codec.decode_dps({**st.raw_dps, **dps}, st)
+        state["n"] += 1
+        diff = _changes(st, new)
+        if diff:
+            changes.append([state["n"], recorder.KIND_PUSH, diff])
+        state["st"] = new
+
+    state["st"] = codec.decode_dps((await api.status())["dps"])
+    changes.append([0, recorder.KIND_STATUS, _changes(None, state["st"])])
+    listener = asyncio.create_task(api.async_listen(on_dps))
+    try:
+        while not api.finished and not listener.done():
+            await asyncio.sleep(0.05)
+    finally:
+        listener.cancel()
+        await api.async_close()
+    return changes
+
+
+def _main(args: argparse.Namespace) -> int:
+    path = Path(args.recording)
+    frames = [f for f in recorder.read_recording(path) if f.direction == recorder.RX]
+    if not frames:
+        print(f"{path}: no frames received from the device", file=sys.stderr)
+        return 1
+
+    if args.speed:
+        t0 = time.perf_counter()
+        changes = asyncio.run(play(path, args.speed))
+        summary: dict[str, Any] = {"frames": len(frames), "seconds": round(time.perf_counter() - t0, 2)}
+    else:
+        changes, seconds = decode(frames, args.repeat)
+        us = sorted(s * 1e6 for s in seconds)
+        summary = {
+            "frames": len(frames),
+            "recorded_seconds": round(frames[-1].t - frames[0].t, 1),
+            "decode_us_mean": round(statistics.fmean(us), 3),
+            "decode_us_p99": round(us[min(len(us) - 1, int(len(us) * 0.99))], 3),
+            "decode_us_max": round(us[-1], 3),
+        }
+    summary["state_changes"] = len(changes)
+    print(json.dumps(summary, indent=2))
+
+    if args.dump:
+        Path(args.dump).write_text("".join(json.dumps(c) + "\n" for c in changes))
+    if args.expect:
+        # compared on the decoded values only, frame numbering differs between the two modes
+        expected = [json.loads(line)[2] for line in Path(args.expect).read_text().splitlines() if line]
+        got = [json.loads(json.dumps(c[2])) for c in changes]
+        if got != expected:
+            for n, (old, new) in enumerate(zip(expected, got)):
+                if old != new:
+                    print(f"MISMATCH change #{n}: expected {old}, got {new}", file=sys.stderr)
+                    break
+            else:
+                print(f"MISMATCH {len(expected)} changes expected, got {len(got)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("recording", help="a <device_id>.jsonl written by the record_traffic option")
+    parser.add_argument("--repeat", type=int, default=20, help="decode passes, the fastest one is reported")
+    parser.add_argument("--speed", type=float, help="play through the replay backend at this speed instead")
+    parser.add_argument("--dump", help="write the decoded state changes here (JSON lines)")
+    parser.add_argument("--expect", help="a previous --dump to compare against")
+    sys.exit(_main(parser.parse_args()))
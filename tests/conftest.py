@@ -0,0 +1,89 @@
+"""
+The tests load the integration modules like the scripts do (see
+scripts/_proscenic.py) and use scripts/fake_device.py as the robot.
+
+Fixtures run on a private event loop (`loop`), so async scenarios are
+driven with loop.run_until_complete() and need no pytest plugin.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from _proscenic import load  # noqa: E402
+from fake_device import DEFAULT_LOCAL_KEY, FakeDevice  # noqa: E402
+
+api_mod = load("api")
+hub_mod = load("hub")
+tuya = load("tuya")
+
+
+@pytest.fixture
+def loop() -> Iterator[asyncio.AbstractEventLoop]:
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        yield loop
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def _serve(loop: asyncio.AbstractEventLoop, port: int) -> Iterator[FakeDevice]:
+    # latency and write_loss can be changed while it runs
+    device = FakeDevice()
+    loop.run_until_complete(device.start(port=port))
+    try:
+        yield device
+    finally:
+        loop.run_until_complete(device.stop())
+
+
+@pytest.fixture
+def fake_device(loop: asyncio.AbstractEventLoop) -> Iterator[FakeDevice]:
+    """A fake 850T on a free port of 127.0.0.1."""
+    yield from _serve(loop, 0)
+
+
+@pytest.fixture
+def fake_device_on_tuya_port(loop: asyncio.AbstractEventLoop) -> Iterator[FakeDevice]:
+    """A fake 850T on the standard Tuya port, for code that does not take a port."""
+    try:
+        yield from _serve(loop, tuya.TUYA_PORT)
+    except OSError:
+        pytest.skip(f"port {tuya.TUYA_PORT} is in use")
+
+
+@pytest.fixture
+def fake_config(fake_device: FakeDevice) -> api_mod.ProscenicConfig:
+    """The config of an entry for fake_device (default backend)."""
+    return api_mod.ProscenicConfig(fake_device.device_id, DEFAULT_LOCAL_KEY, "127.0.0.1", port=fake_device.port)
+
+
+@pytest.fixture
+def hub() -> Iterator[hub_mod.ProscenicHub]:
+    hub = hub_mod.ProscenicHub(max_workers=1)
+    try:
+        yield hub
+    finally:
+        hub.shutdown()
+
+
+@pytest.fixture
+def native_api(
+    loop: asyncio.AbstractEventLoop, fake_config: api_mod.ProscenicConfig
+) -> Iterator[api_mod.NativeApi]:
+    """The native backend talking to fake_device."""
+    api = api_mod.NativeApi(fake_config)
+    try:
+        yield api
+    finally:
+        loop.run_until_complete(api.async_close())
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from _proscenic import load
+from fake_device import FakeDevice
+
+api_mod = load("api")
+breaker_mod = load("breaker")
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> _Clock:
+    clock = _Clock()
+    monkeypatch.setattr(breaker_mod, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def _breaker() -> breaker_mod.CircuitBreaker:
+    return breaker_mod.CircuitBreaker(threshold=3, base_delay=10, max_delay=40, jitter=0)
+
+
+def test_opens_after_threshold_failures(clock: _Clock) -> None:
+    breaker = _breaker()
+    assert not breaker.record_failure("timeout")
+    assert not breaker.record_failure("timeout")
+    assert breaker.allow()
+    assert breaker.record_failure("timeout")
+    assert breaker.state == breaker_mod.STATE_OPEN
+    assert not breaker.allow()
+    assert breaker.retry_in == 10
+    assert breaker.as_dict()["last_error"] == "timeout"
+
+
+def test_success_resets_the_failure_count(clock: _Clock) -> None:
+    breaker = _breaker()
+    breaker.record_failure("timeout")
+    breaker.record_failure("timeout")
+    assert not breaker.record_success()
+    assert not breaker.record_failure("timeout")
+    assert breaker.state == breaker_mod.STATE_CLOSED
+
+
+def test_half_open_probe_closes_or_reopens_with_backoff(clock: _Clock) -> None:
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record_failure("timeout")
+
+    clock.now += 10
+    assert breaker.allow()
+    assert breaker.state == breaker_mod.STATE_HALF_OPEN
+    # one failed probe is enough to reopen, for twice as long
+    assert breaker.record_failure("timeout")
+    assert breaker.retry_in == 20
+
+    clock.now += 20
+    assert breaker.allow()
+    assert breaker.record_failure("timeout")
+    clock.now += 40
+    assert breaker.allow()
+    assert breaker.record_failure("timeout")
+    # capped at max_delay
+    assert breaker.retry_in == 40
+
+    clock.now += 40
+    assert breaker.allow()
+    assert breaker.record_success()
+    assert breaker.as_dict() == {
+        "state": breaker_mod.STATE_CLOSED,
+        "failures": 0,
+        "trips": 0,
+        "retry_in": 0.0,
+        "last_error": None,
+    }
+
+
+def test_jitter_stays_within_bounds(clock: _Clock) -> None:
+    breaker = breaker_mod.CircuitBreaker(threshold=1, base_delay=10, max_delay=40, jitter=0.2)
+    breaker.record_failure("timeout")
+    assert 8 <= breaker.retry_in <= 12
+
+
+def test_gates_polls_of_a_robot_that_went_away(
+    loop: asyncio.AbstractEventLoop, fake_device: FakeDevice, native_api
+) -> None:
+    breaker = breaker_mod.CircuitBreaker(threshold=2, base_delay=0.2, jitter=0)
+    states = []
+
+    async def poll() -> None:
+        if not breaker.allow():
+            states.append("refused")
+            return
+        try:
+            await native_api.status()
+        except api_mod.ProscenicApiError as exc:
+            breaker.record_failure(exc)
+        else:
+            breaker.record_success()
+        states.append(breaker.state)
+
+    async def scenario() -> None:
+        await poll()
+        port = fake_device.port
+        await fake_device.stop()
+        await poll()
+        await poll()
+        await poll()
+        await asyncio.sleep(0.2)
+        await fake_device.start(port=port)
+        await poll()
+
+    loop.run_until_complete(scenario())
+    assert states == [
+        breaker_mod.STATE_CLOSED,
+        breaker_mod.STATE_CLOSED,
+        breaker_mod.STATE_OPEN,
+        "refused",
+        breaker_mod.STATE_CLOSED,
+    ]
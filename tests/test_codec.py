@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import asyncio
+
+from _proscenic import load
+from fake_device import default_dps
+
+codec = load("codec")
+const = load("const")
+
+
+def _dp(dp: int) -> str:
+    return str(dp)
+
+
+def test_decode_default_dps() -> None:
+    st = codec.decode_dps(default_dps())
+    assert st.battery == 100
+    assert st.current_state == 5
+    assert st.fan_speed == "normal"
+    assert st.mop_equipped is False
+    assert st.device_model == "850T"
+    assert st.clean_area == 0.0
+
+
+def test_update_reuses_previous_state_when_nothing_changed() -> None:
+    raw = default_dps()
+    st = codec.codec_for("850T").decode(raw)
+    assert codec.codec_for("850T").update(st, dict(raw)) is st
+
+
+def test_update_converts_only_changed_dps() -> None:
+    dpc = codec.codec_for("850T")
+    previous = dpc.decode(default_dps())
+    raw = {**default_dps(), _dp(const.DP_BATTERY): 57, _dp(const.DP_CLEAN_AREA): 123}
+    st = dpc.update(previous, raw)
+    assert st is not previous
+    assert st.raw_dps is raw
+    assert (st.battery, st.clean_area) == (57, 12.3)
+    assert st.fan_speed == previous.fan_speed
+    # previous is left alone
+    assert previous.battery == 100
+
+
+def test_update_clears_a_dp_the_device_stopped_reporting() -> None:
+    dpc = codec.codec_for("850T")
+    previous = dpc.decode(default_dps())
+    raw = default_dps()
+    del raw[_dp(const.DP_FAN_SPEED)]
+    assert dpc.update(previous, raw).fan_speed is None
+
+
+def test_update_matches_a_full_decode() -> None:
+    dpc = codec.codec_for("850T")
+    previous = dpc.decode(default_dps())
+    raw = {**default_dps(), _dp(const.DP_SWEEP_OR_MOP): "mop", _dp(const.DP_CLEAN_TIME): 3}
+    assert dpc.update(previous, raw) == dpc.decode(raw)
+
+
+def test_undecodable_value_becomes_none() -> None:
+    st = codec.decode_dps({**default_dps(), _dp(const.DP_BATTERY): "full"})
+    assert st.battery is None
+
+
+def test_unknown_model_uses_the_850t_table() -> None:
+    raw = {**default_dps(), _dp(const.DP_DEVICE_MODEL): "990X"}
+    assert codec.decode_dps(raw).battery == 100
+
+
+def test_changed_fields() -> None:
+    old = codec.decode_dps(default_dps())
+    assert codec.changed_fields(old, old) == frozenset()
+    assert codec.changed_fields(None, old) == codec.ALL_FIELDS
+    assert codec.changed_fields(old, None) == codec.ALL_FIELDS
+
+    new = codec.decode_dps({**default_dps(), _dp(const.DP_BATTERY): 99}, old)
+    assert codec.changed_fields(old, new) == {"battery", codec.FIELD_RAW_DPS}
+
+    # a DP without a field only changes raw_dps
+    new = codec.decode_dps({**default_dps(), _dp(const.DP_POWER): False}, old)
+    assert codec.changed_fields(old, new) == {codec.FIELD_RAW_DPS}
+
+
+def test_changed_fields_of_a_pushed_frame(loop: asyncio.AbstractEventLoop, fake_device, native_api) -> None:
+    pushed: asyncio.Queue[dict] = asyncio.Queue()
+    native_api._on_dps = pushed.put_nowait
+
+    async def scenario() -> tuple[object, object]:
+        old = codec.decode_dps((await native_api.status())["dps"])
+        fake_device.push({_dp(const.DP_CURRENT_STATE): 1, _dp(const.DP_BATTERY): 98})
+        raw = {**old.raw_dps, **await asyncio.wait_for(pushed.get(), 5)}
+        return old, codec.decode_dps(raw, old)
+
+    old, new = loop.run_until_complete(scenario())
+    assert codec.changed_fields(old, new) == {"battery", "current_state", codec.FIELD_RAW_DPS}
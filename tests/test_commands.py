@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Iterator
+
+import pytest
+from _proscenic import load
+from fake_device import FakeDevice
+
+api_mod = load("api")
+breaker_mod = load("breaker")
+codec = load("codec")
+commands = load("commands")
+const = load("const")
+
+
+class _Coordinator:
+    """What the queue uses of ProscenicCoordinator, around a real API."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, api: Any, raw: dict[str, Any]) -> None:
+        self.events: list[dict[str, Any]] = []
+        self.hass = SimpleNamespace(
+            loop=loop,
+            async_create_task=loop.create_task,
+            bus=SimpleNamespace(async_fire=lambda event, data: self.events.append(data)),
+        )
+        self.api = api
+        self.data = codec.decode_dps(raw)
+        self.push_active = True
+        self.ack_writes = False
+        self.buffer_commands = False
+        self.breaker = breaker_mod.CircuitBreaker(threshold=1)
+        self.optimistic: list[dict[int, Any]] = []
+        self.rolled_back: list[dict[int, Any]] = []
+        self.refreshed: list[set[int]] = []
+
+    def async_apply_optimistic(self, dps: dict[int, Any]) -> None:
+        self.optimistic.append(dict(dps))
+
+    def async_rollback_optimistic(self, dps: dict[int, Any]) -> None:
+        self.rolled_back.append(dict(dps))
+
+    def async_merge_reported(self, dps: dict[str, Any]) -> None:
+        pass
+
+    async def async_refresh_dps(self, dps: Any) -> None:
+        self.refreshed.append(set(dps))
+
+
+@pytest.fixture
+def coordinator(loop: asyncio.AbstractEventLoop, native_api: Any) -> _Coordinator:
+    return _Coordinator(loop, native_api, loop.run_until_complete(native_api.status())["dps"])
+
+
+@pytest.fixture
+def queue(coordinator: _Coordinator) -> Iterator[Any]:
+    queue = commands.ProscenicCommandQueue(coordinator)
+    yield queue
+    queue.async_shutdown()
+
+
+def _run(loop: asyncio.AbstractEventLoop, scenario: Callable[[], Awaitable[None]]) -> None:
+    loop.run_until_complete(scenario())
+
+
+def test_effective_drops_settings_the_device_already_reports(queue: Any) -> None:
+    batch = {
+        const.DP_FAN_SPEED: "normal",  # reported
+        const.DP_WATER_SPEED: "high",
+        const.DP_CLEANING_MODE: "smart",  # reported, but an action
+        const.DP_DIRECTION_CONTROL: "stop",
+    }
+    assert queue._effective(batch) == {
+        const.DP_WATER_SPEED: "high",
+        const.DP_CLEANING_MODE: "smart",
+        const.DP_DIRECTION_CONTROL: "stop",
+    }
+    assert queue._effective(batch, {const.DP_FAN_SPEED}) == batch
+    assert const.DP_CLEANING_MODE in const.TRIGGER_DPS
+
+
+def test_writes_of_one_loop_iteration_go_out_in_one_frame(
+    loop: asyncio.AbstractEventLoop, fake_device: FakeDevice, coordinator: _Coordinator, queue: Any
+) -> None:
+    async def scenario() -> None:
+        await asyncio.gather(
+            queue.async_write({const.DP_FAN_SPEED: "max"}),
+            queue.async_write({const.DP_WATER_SPEED: "high"}),
+            queue.async_write({const.DP_FAN_SPEED: "quiet"}),
+        )
+
+    _run(loop, scenario)
+    # last value per DP wins
+    assert fake_device.writes == [{str(const.DP_FAN_SPEED): "quiet", str(const.DP_WATER_SPEED): "high"}]
+    assert coordinator.optimistic == [{const.DP_FAN_SPEED: "quiet", const.DP_WATER_SPEED: "high"}]
+
+
+def test_writes_during_a_flush_make_the_next_batch(
+    loop: asyncio.AbstractEventLoop, fake_device: FakeDevice, queue: Any
+) -> None:
+    fake_device.latency = 0.2
+
+    async def scenario() -> None:
+        first = asyncio.ensure_future(queue.async_write({const.DP_FAN_SPEED: "max"}))
+        await asyncio.sleep(0.05)
+        await asyncio.gather(
+            queue.async_write({const.DP_WATER_SPEED: "low"}),
+            queue.async_write({const.DP_WATER_SPEED: "high"}),
+        )
+        await first
+
+    _run(loop, scenario)
+    assert fake_device.writes == [{str(const.DP_FAN_SPEED): "max"}, {str(const.DP_WATER_SPEED): "high"}]
+
+
+def test_no_op_setting_write_is_dropped_unless_forced(
+    loop: asyncio.AbstractEventLoop, fake_device: FakeDevice, queue: Any
+) -> None:
+    _run(loop, lambda: queue.async_write({const.DP_FAN_SPEED: "normal"}))
+    assert fake_device.writes == []
+    _run(loop, lambda: queue.async_write({const.DP_FAN_SPEED: "normal"}, force=True))
+    assert fake_device.writes == [{str(const.DP_FAN_SPEED): "normal"}]
+    # forcing is per write
+    _run(loop, lambda: queue.async_write({const.DP_FAN_SPEED: "normal"}))
+    assert len(fake_device.writes) == 1
+
+
+def test_trigger_is_always_sent_and_refreshed_without_push(
+    loop: asyncio.AbstractEventLoop, fake_device: FakeDevice, coordinator: _Coordinator, queue: Any
+) -> None:
+    _run(loop, lambda: queue.async_write({const.DP_CLEANING_MODE: "smart"}))
+    assert fake_device.writes == [{str(const.DP_CLEANING_MODE): "smart"}]
+    assert coordinator.refreshed == []
+
+    coordinator.push_active = False
+    _run(loop, lambda: queue.async_write({const.DP_CLEANING_MODE: "chargego"}))
+    assert coordinator.refreshed == [{*const.COMMAND_REFRESH_DPS, const.DP_CLEANING_MODE}]
+    # a setting needs no refresh
+    _run(loop, lambda: queue.async_write({const.DP_FAN_SPEED: "max"}))
+    assert len(coordinator.refreshed) == 1
+
+
+def test_failed_batch_fails_every_waiter_and_rolls_back(
+    loop: asyncio.AbstractEventLoop, fake_device: FakeDevice, coordinator: _Coordinator, queue: Any
+) -> None:
+    async def scenario() -> list[Any]:
+        await fake_device.stop()
+        return await asyncio.gather(
+            queue.async_write({const.DP_FAN_SPEED: "max"}),
+            queue.async_write({const.DP_WATER_SPEED: "high"}),
+            return_exceptions=True,
+        )
+
+    results = loop.run_until_complete(scenario())
+    assert all(isinstance(r, api_mod.ProscenicApiError) for r in results)
+    assert coordinator.rolled_back == [{const.DP_FAN_SPEED: "max", const.DP_WATER_SPEED: "high"}]
+
+
+def test_offline_robot_gets_its_commands_on_reconnect(
+    loop: asyncio.AbstractEventLoop, fake_device: FakeDevice, coordinator: _Coordinator, queue: Any
+) -> None:
+    coordinator.buffer_commands = True
+    port = fake_device.port
+
+    async def scenario() -> None:
+        await fake_device.stop()
+        await queue.async_write({const.DP_FAN_SPEED: "max"})
+        coordinator.breaker.record_failure("unreachable")
+        # known offline: buffered without trying, the newer value supersedes
+        await queue.async_write({const.DP_WATER_SPEED: "low"})
+        await queue.async_write({const.DP_WATER_SPEED: "high"})
+        assert queue.buffered == 2
+
+        await fake_device.start(port=port)
+        coordinator.breaker.record_success()
+        queue.async_device_available()
+        await queue._replay_task
+
+    _run(loop, scenario)
+    assert queue.buffered == 0
+    assert fake_device.writes == [{str(const.DP_FAN_SPEED): "max"}, {str(const.DP_WATER_SPEED): "high"}]
+    assert [e["result"] for e in coordinator.events] == [
+        const.COMMAND_BUFFERED,
+        const.COMMAND_BUFFERED,
+        const.COMMAND_SUPERSEDED,
+        const.COMMAND_BUFFERED,
+        const.COMMAND_REPLAYED,
+        const.COMMAND_REPLAYED,
+    ]
+
+
+def test_unconfirmed_write_is_not_buffered(
+    monkeypatch: pytest.MonkeyPatch,
+    loop: asyncio.AbstractEventLoop,
+    fake_device: FakeDevice,
+    coordinator: _Coordinator,
+    queue: Any,
+) -> None:
+    # acked and lost: delivered but never echoed, so sending it again could repeat it
+    api = coordinator.api
+    monkeypatch.setattr(api, "set_dps_acked", functools.partial(type(api).set_dps_acked, api, timeout=0.2))
+    coordinator.ack_writes = True
+    coordinator.buffer_commands = True
+    fake_device.write_loss = 1.0
+    with pytest.raises(api_mod.ProscenicAckError):
+        _run(loop, lambda: queue.async_write({const.DP_FAN_SPEED: "max"}))
+    assert queue.buffered == 0
+    assert coordinator.rolled_back == [{const.DP_FAN_SPEED: "max"}]
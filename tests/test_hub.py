@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import threading
+import time
+from typing import Any
+
+import pytest
+from _proscenic import load
+from fake_device import FakeDevice
+
+api_mod = load("api")
+const = load("const")
+hub_mod = load("hub")
+metrics = load("metrics")
+
+
+def test_calls_of_a_lane_run_one_at_a_time() -> None:
+    async def scenario() -> list[str]:
+        hub = hub_mod.ProscenicHub(max_workers=4)
+        lane = hub.lane("robot")
+        log = []
+
+        def call(name: str) -> str:
+            log.append(f"{name} start")
+            time.sleep(0.05)
+            log.append(f"{name} end")
+            return name
+
+        try:
+            assert await asyncio.gather(lane.run_sync(call, "a"), lane.run_sync(call, "b")) == ["a", "b"]
+        finally:
+            hub.shutdown()
+        assert lane.stats()["calls"] == 2
+        return log
+
+    assert asyncio.run(scenario()) == ["a start", "a end", "b start", "b end"]
+
+
+def test_deadline_while_running_abandons_the_call_but_keeps_the_lane() -> None:
+    async def scenario() -> None:
+        hub = hub_mod.ProscenicHub(max_workers=1)
+        lane = hub.lane("robot")
+        other = hub.lane("other")
+        unblock = threading.Event()
+        abandoned = []
+
+        try:
+            with pytest.raises(TimeoutError):
+                await lane.run_sync(unblock.wait, deadline=0.1, on_abandon=lambda: abandoned.append(True))
+            assert abandoned == [True]
+            assert lane.stats()["abandoned"] == 1
+            assert hub.stats()["abandoned"] == 1
+
+            # the worker is still blocked: the device's next call and the
+            # pool's only slot both wait for it
+            following = asyncio.ensure_future(lane.run_sync(lambda: "next"))
+            elsewhere = asyncio.ensure_future(other.run_sync(lambda: "other"))
+            await asyncio.sleep(0.1)
+            assert not following.done() and not elsewhere.done()
+
+            unblock.set()
+            assert await following == "next"
+            assert await elsewhere == "other"
+            assert lane.stats()["abandoned"] == 0
+            assert lane.stats()["abandoned_total"] == 1
+        finally:
+            unblock.set()
+            hub.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_deadline_while_queued_never_runs_the_call() -> None:
+    async def scenario() -> None:
+        hub = hub_mod.ProscenicHub(max_workers=1)
+        lane = hub.lane("robot")
+        unblock = threading.Event()
+        ran = []
+
+        try:
+            busy = asyncio.ensure_future(lane.run_sync(unblock.wait))
+            await asyncio.sleep(0)
+            with pytest.raises(TimeoutError):
+                await lane.run_sync(ran.append, True, deadline=0.1)
+            assert lane.stats()["queued"] == 0
+            assert lane.stats()["abandoned_total"] == 0
+
+            unblock.set()
+            assert await busy is True
+            # the lane is free again
+            assert await lane.run_sync(lambda: "free", deadline=1) == "free"
+            assert ran == []
+        finally:
+            unblock.set()
+            hub.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_tinytuya_call_abandoned_at_its_deadline_frees_the_worker(
+    monkeypatch: pytest.MonkeyPatch,
+    loop: asyncio.AbstractEventLoop,
+    fake_device: FakeDevice,
+    fake_config: Any,
+    hub: Any,
+) -> None:
+    # the socket timeout alone would hold the worker for 3s
+    monkeypatch.setitem(api_mod.IO_BUDGETS, metrics.OP_STATUS, api_mod.IoBudget(3.0, 1, 0.3))
+    fake_device.latency = 5
+    lane = hub.lane(fake_device.device_id)
+    api = api_mod.create_api(dataclasses.replace(fake_config, backend=const.BACKEND_TINYTUYA), lane)
+    assert isinstance(api, api_mod.TinyTuyaApi)
+
+    async def scenario() -> tuple[float, float]:
+        started = time.monotonic()
+        with pytest.raises(api_mod.ProscenicTimeoutError):
+            await api.status()
+        raised = time.monotonic() - started
+        # the abort shut the socket down: the worker comes back right away
+        await lane.run_sync(lambda: None, deadline=1)
+        return raised, time.monotonic() - started
+
+    try:
+        raised, freed = loop.run_until_complete(scenario())
+    finally:
+        loop.run_until_complete(api.async_close())
+    assert raised < 0.5
+    assert freed < 1.0
+    assert lane.stats()["abandoned_total"] == 1
+    assert lane.stats()["abandoned"] == 0
+    assert api.metrics.counters[f"{metrics.OP_STATUS}.{metrics.COUNT_ABANDONED}"] == 1
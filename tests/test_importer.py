@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+from _proscenic import load
+from fake_device import DEFAULT_LOCAL_KEY, FakeDevice
+
+api_mod = load("api")
+const = load("const")
+importer = load("importer")
+
+WIZARD_EXPORT = [
+    {
+        "name": "Salotto",
+        "id": "bf0123456789abcdef0000",
+        "key": DEFAULT_LOCAL_KEY,
+        "category": "sd",
+        "product_name": "Proscenic 850T",
+        "ip": "192.168.1.40",
+        "version": "3.3",
+    },
+    {"name": "Presa", "id": "bf0000000000000000plug", "key": "aaaaaaaaaaaaaaaa", "category": "cz"},
+    {"name": "Camera", "id": "bf0123456789abcdef0001", "key": "", "category": "sd"},
+]
+
+
+def test_parse_export_of_the_tinytuya_wizard() -> None:
+    assert importer.parse_export(json.dumps(WIZARD_EXPORT)) == WIZARD_EXPORT
+
+
+@pytest.mark.parametrize("wrapper", ["devices", "result"])
+def test_parse_export_unwraps_the_device_list(wrapper: str) -> None:
+    records = importer.parse_export(json.dumps({wrapper: [*WIZARD_EXPORT, "junk", 3]}))
+    assert records == WIZARD_EXPORT
+
+
+@pytest.mark.parametrize("text", ['{"devices": {}}', '"devices"', "{}", "[{"])
+def test_parse_export_rejects_other_json(text: str) -> None:
+    with pytest.raises(ValueError):
+        importer.parse_export(text)
+
+
+def test_devices_from_export_keeps_robots_with_a_key() -> None:
+    (device,) = importer.devices_from_export(WIZARD_EXPORT)
+    assert device == importer.ImportedDevice(
+        "bf0123456789abcdef0000", DEFAULT_LOCAL_KEY, "Salotto", host="192.168.1.40", version=3.3
+    )
+
+
+def test_devices_from_export_of_tuya_uncover() -> None:
+    records = [
+        {"devId": "bf01", "localKey": "k1", "productName": "Proscenic M8", "ver": 3.1},
+        {"gwId": "bf02", "local_key": "k2", "model": "proscenic 850T", "version": "9.9"},
+        # listed twice: kept once
+        {"device_id": "bf01", "local_key": "k3", "category": "sd"},
+    ]
+    devices = importer.devices_from_export(records)
+    assert [(d.device_id, d.local_key, d.name, d.host, d.version) for d in devices] == [
+        ("bf01", "k1", "Proscenic M8", None, 3.1),
+        # unknown protocol versions are dropped, the name falls back to the brand
+        ("bf02", "k2", const.MANUFACTURER, None, None),
+    ]
+
+
+def test_set_announced_keeps_the_exported_version_over_an_unknown_one() -> None:
+    (device,) = importer.devices_from_export(WIZARD_EXPORT)
+    importer.set_announced(device, "192.168.1.41", "2.0")
+    assert (device.host, device.version) == ("192.168.1.41", 3.3)
+    importer.set_announced(device, "192.168.1.42", "3.4")
+    assert (device.host, device.version) == ("192.168.1.42", 3.4)
+
+
+def test_async_verify_against_the_fake_device(
+    monkeypatch: pytest.MonkeyPatch, loop: asyncio.AbstractEventLoop, fake_device_on_tuya_port: FakeDevice
+) -> None:
+    # a wrong key shows as a timeout in every protocol version: keep those short
+    monkeypatch.setattr(api_mod, "IO_SOCKET_TIMEOUT", 0.5)
+    device_id = fake_device_on_tuya_port.device_id
+    devices = [
+        importer.ImportedDevice(device_id, DEFAULT_LOCAL_KEY, "ok", "127.0.0.1", version=3.4),
+        importer.ImportedDevice(device_id, "ffffffffffffffff", "wrong key", "127.0.0.1"),
+        importer.ImportedDevice("bf0123456789abcdef0001", DEFAULT_LOCAL_KEY, "not on the LAN"),
+        # nothing listens there
+        importer.ImportedDevice("bf0123456789abcdef0002", DEFAULT_LOCAL_KEY, "gone", "127.0.0.2"),
+    ]
+    loop.run_until_complete(importer.async_verify(devices))
+    assert [(d.result, d.version) for d in devices] == [
+        (const.IMPORT_OK, 3.3),
+        (const.IMPORT_INVALID_KEY, None),
+        (const.IMPORT_NOT_FOUND, None),
+        (const.IMPORT_UNREACHABLE, None),
+    ]
+
+
+def test_async_verify_gives_up_at_the_deadline(
+    loop: asyncio.AbstractEventLoop, fake_device_on_tuya_port: FakeDevice
+) -> None:
+    fake_device_on_tuya_port.latency = 5
+    imported = importer.ImportedDevice(fake_device_on_tuya_port.device_id, DEFAULT_LOCAL_KEY, "slow", "127.0.0.1")
+    loop.run_until_complete(asyncio.wait_for(importer.async_verify([imported], deadline=0.3), 2))
+    assert imported.result == const.IMPORT_UNREACHABLE